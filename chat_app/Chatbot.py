@@ -1,19 +1,30 @@
 from groq import Groq
 import os 
 from dotenv import load_dotenv
+from .scheduling import llm_limiter, current_tenant
+from .tracing import span, traced
+import time
 
 class Chatbot:
-    def __init__(self, context_file=None, model="llama-3.3-70b-versatile"):
+    def __init__(self, context_file=None, model="llama-3.3-70b-versatile", context_text=None, general=False,
+                 client=None):
         """
         Initialize the chatbot with optional static context and a model to use for responses.
 
         Args:
             context_file (str, optional): Path to the file containing static context
             model (str): The ID of the model to use for chat (default: "llama-3.3-70b-versatile")
+            context_text (str, optional): Static context already read (e.g. from storage);
+                used instead of context_file
+            general (bool): Whether the summary is a general CSV profile rather than
+                limo company bookings
+            client (Groq, optional): Client to reuse, e.g. one shared by the threads of a batch
         """
-        # Initialize Groq client
-        load_dotenv()
-        self.client = Groq(api_key= os.getenv('GROQ_API_KEY'))
+        # Initialize Groq client; GROQ_BASE_URL points it at another server, e.g. the groq_stub command
+        if client is None:
+            load_dotenv()
+            client = Groq(api_key= os.getenv('GROQ_API_KEY'), base_url=os.getenv('GROQ_BASE_URL') or None)
+        self.client = client
         self.model = model
         
         prompt = """
@@ -37,14 +48,31 @@ Example: "Looking at the summary, Driver A completed 45 trips in June, averaging
 
 Remember: You explain existing data rather than calculating new insights.
                 """
+        if general:
+            prompt = """
+                You are an assistant that explains CSV summary data. You help users understand a dataset of any kind based on a pre-calculated profile: the role of each column, numeric statistics, date ranges and the most common values.
+
+Rules:
+- Use simple language
+- Be concise
+- Only reference data shown in the profile
+- Don't perform new calculations
+- Explain when data isn't available
+                """
         # Load static context from file if provided
-        self.context = prompt + self._load_context_file(context_file) if context_file else "You are a helpful assistant."
+        if context_text is not None:
+            self.context = prompt + context_text.strip()
+        elif context_file:
+            self.context = prompt + self._load_context_file(context_file)
+        else:
+            self.context = "You are a helpful assistant."
 
         # Initialize conversation history with context
         self.messages = [
             {"role": "system", "content": self.context}
         ]
 
+    @traced('Chatbot.load_context_file')
     def _load_context_file(self, filename):
         """Load static context from a file."""
         try:
@@ -69,21 +97,46 @@ Remember: You explain existing data rather than calculating new insights.
         self.messages.append({"role": "user", "content": user_input})
 
         try:
-            # Send the conversation to the Groq API
-            completion = self.client.chat.completions.create(
-                model=self.model,
-                messages=self.messages,
-                temperature=1,
-                max_tokens=1024,
-                top_p=1,
-                stream=True,
-                stop=None,
-            )
-
-            # Collect and return the response from Groq API
-            response = ""
-            for chunk in completion:
-                response += chunk.choices[0].delta.content or ""
+            with span('llm.chat_completion', model=self.model, messages=len(self.messages)) as llm_span:
+                # Wait for a free LLM slot; tenants waiting for one are served in fair order
+                waiting = time.perf_counter()
+                with llm_limiter().slot(current_tenant.get()):
+                    start = time.perf_counter()
+                    # Send the conversation to the Groq API
+                    completion = self.client.chat.completions.create(
+                        model=self.model,
+                        messages=self.messages,
+                        temperature=1,
+                        max_tokens=1024,
+                        top_p=1,
+                        stream=True,
+                        stop=None,
+                    )
+
+                    # Collect and return the response from Groq API
+                    response = ""
+                    first_token = None
+                    usage = None
+                    for chunk in completion:
+                        if first_token is None:
+                            first_token = time.perf_counter()
+                        if chunk.choices:
+                            response += chunk.choices[0].delta.content or ""
+                        # Groq reports token usage on the last chunk
+                        usage = getattr(getattr(chunk, 'x_groq', None), 'usage', None) or usage
+
+                if llm_span is not None:
+                    # Token counts from the API, estimated if it reported none (imported here: it pulls in pandas)
+                    from .prompt_encoding import estimate_tokens
+                    llm_span.set(
+                        slot_wait_ms=round((start - waiting) * 1000, 1),
+                        first_token_ms=round(((first_token or time.perf_counter()) - start) * 1000, 1),
+                        prompt_tokens=getattr(usage, 'prompt_tokens', None) or sum(
+                            estimate_tokens(message['content']) for message in self.messages
+                        ),
+                        completion_tokens=getattr(usage, 'completion_tokens', None) or estimate_tokens(response),
+                        tokens_estimated=usage is None,
+                    )
 
             # Add assistant's response to conversation history
             self.messages.append({"role": "assistant", "content": response})
@@ -1,12 +1,33 @@
 from django.contrib import admin
-from .models import UploadedCSV , CustomUser
+from .models import UploadedCSV , CustomUser, OutboundEmail, ChunkedUpload, TenantUsage
+from .quotas import available, bucket_limits
 from django.contrib.auth.admin import UserAdmin
-from django.utils.html import format_html
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
 
 @admin.register(UploadedCSV)
 class UploadedCSVAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'uploaded_at', 'is_processed', 'view_raw_csv', 'view_processed_csv')
     list_filter = ('is_processed', 'uploaded_at', 'user')
+    readonly_fields = ('data_quality',)
+
+    @admin.display(description='Data quality issues')
+    def data_quality(self, obj):
+        # The issues table found by the validation stage at ingest (see validation.py)
+        from .aggregates import load_aggregates
+
+        issues = load_aggregates(obj).get('issues')
+        if issues is None or issues.empty:
+            return 'No issues found' if obj.aggregates else 'Not validated'
+        rows = format_html_join(
+            '', '<tr><td>{}</td><td>{}</td><td>{}</td><td>{}%</td><td>{}</td><td>{}</td></tr>',
+            issues[['rule', 'severity', 'rows', 'pct', 'examples', 'description']].itertuples(index=False),
+        )
+        return format_html(
+            '<table><tr><th>Rule</th><th>Severity</th><th>Rows</th><th>Share</th><th>Examples</th>'
+            '<th>Description</th></tr>{}</table>',
+            rows,
+        )
     
     def view_raw_csv(self, obj):
         if obj.raw_csv:
@@ -36,4 +57,44 @@ class CustomUserAdmin(UserAdmin):
             'classes': ('wide',),
             'fields': ('email', 'password1', 'password2', 'company_name', 'is_approved'),
         }),
-    )
\ No newline at end of file
+    )
+
+@admin.register(ChunkedUpload)
+class ChunkedUploadAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'user', 'status', 'received_bytes', 'total_size', 'row_count', 'created_at')
+    list_filter = ('status', 'created_at')
+    readonly_fields = ('sha256', 'header', 'delimiter', 'row_count', 'uploaded_csv')
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status', 'created_at')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+    actions = ['retry_emails']
+
+    @admin.action(description='Retry selected emails')
+    def retry_emails(self, request, queryset):
+        # Put the emails back in the queue; the send_outbox worker will pick them up
+        updated = queryset.exclude(status=OutboundEmail.STATUS_SENT).update(
+            status=OutboundEmail.STATUS_PENDING, attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f"{updated} email(s) queued for another attempt.")
+
+@admin.register(TenantUsage)
+class TenantUsageAdmin(admin.ModelAdmin):
+    list_display = ('key', 'scope', 'kind', 'available_now', 'capacity', 'used', 'rejected', 'last_used_at')
+    list_filter = ('kind', 'scope')
+    search_fields = ('key',)
+    ordering = ('-last_used_at',)
+    readonly_fields = ('kind', 'scope', 'key', 'used', 'rejected', 'last_used_at')
+
+    @admin.display(description='Available now')
+    def available_now(self, obj):
+        # The stored level plus what the bucket refilled since
+        tokens = available(obj)
+        return 'unlimited' if tokens is None else f"{tokens:.1f}"
+
+    @admin.display(description='Capacity')
+    def capacity(self, obj):
+        limits = bucket_limits(obj.kind, obj.scope)
+        return 'unlimited' if limits is None else f"{limits[0]:.0f} (+{limits[1] * 3600:.0f}/hour)"
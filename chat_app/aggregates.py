@@ -0,0 +1,188 @@
+# aggregates.py
+
+import json
+from functools import lru_cache
+
+import pandas as pd
+from django.core.files.base import ContentFile
+
+from .storage import read_text
+from .locations import LocationIndex, location_aggregates
+from .anomalies import price_anomalies
+
+# Day names in calendar order, used to sort the weekday aggregate
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Number of highest and lowest priced rides kept per chauffeur
+EXTREME_RIDES_K = 5
+
+# Ride columns kept in the extreme rides table, when present
+RIDE_COLUMNS = ['Booking', 'Date', 'PAX', 'Pickup', 'Dropoff', 'Price']
+
+
+def parse_dates(series):
+    """
+    Parse a Date column, turning anything unparseable into NaT. Dates with
+    different UTC offsets are all converted to UTC.
+    """
+    try:
+        return pd.to_datetime(series, errors='coerce', format='mixed')
+    except ValueError:  # Mixed offsets (or offsets and naive dates) need a common timezone
+        return pd.to_datetime(series, errors='coerce', format='mixed', utc=True)
+
+
+def extreme_rides(df, price, k=EXTREME_RIDES_K):
+    """
+    The k highest and k lowest priced rides of every chauffeur, in one grouped pass.
+
+    Rides are sorted once by chauffeur and price; each ride's position within its
+    chauffeur (from the top and from the bottom) then selects the rows, so there
+    is no loop over chauffeurs.
+
+    Returns:
+        DataFrame: chauffeur, kind ('top' or 'bottom'), rank and the ride columns
+    """
+    columns = [col for col in RIDE_COLUMNS if col in df.columns and col != 'Price']
+    rides = df[columns].assign(Price=price, chauffeur=df['Chauffer'])
+    rides = rides[rides['Price'].notna() & rides['chauffeur'].notna()]
+
+    ordered = rides.sort_values(['chauffeur', 'Price'], ascending=[True, False], kind='stable')
+    groups = ordered.groupby('chauffeur', sort=False)
+    from_top = groups.cumcount()
+    from_bottom = groups['Price'].transform('size') - 1 - from_top
+
+    top = ordered[from_top < k].assign(kind='top', rank=from_top[from_top < k] + 1)
+    bottom = ordered[from_bottom < k].assign(kind='bottom', rank=from_bottom[from_bottom < k] + 1)
+    bottom = bottom.sort_values(['chauffeur', 'rank'], kind='stable')
+
+    result = pd.concat([top, bottom], ignore_index=True)
+    return result[['chauffeur', 'kind', 'rank'] + columns + ['Price']]
+
+
+def chauffeur_months(chauffeurs, dates, price):
+    """
+    Rides and revenue of every chauffeur in each month they drove.
+
+    Returns:
+        DataFrame: chauffeur, month ('2024-03'), month_label ('March 2024'), rides and revenue
+    """
+    months = dates.dt.to_period('M')
+    table = price.groupby([chauffeurs, months]).agg(['count', 'sum'])
+    table.columns = ['rides', 'revenue']
+    table = table.rename_axis(['chauffeur', 'month']).reset_index()
+    table.insert(2, 'month_label', table['month'].dt.strftime('%B %Y'))
+    table['month'] = table['month'].dt.strftime('%Y-%m')
+    return table
+
+
+def build_aggregates(df):
+    """
+    Compute the small per-dataset aggregate tables that charts and APIs are built
+    from, so they never have to touch the raw rows again.
+
+    Only the tables whose columns exist in the (standardized) DataFrame are built.
+
+    Args:
+        df (DataFrame): The loaded dataset with standardized column names
+
+    Returns:
+        dict: Table name -> DataFrame
+    """
+    aggregates = {}
+    if 'Price' not in df.columns:
+        return aggregates
+    price = pd.to_numeric(df['Price'], errors='coerce')
+
+    if 'Chauffer' in df.columns:
+        chauffeurs = price.groupby(df['Chauffer']).agg(['count', 'sum', 'mean'])
+        chauffeurs.columns = ['rides', 'revenue', 'avg_price']
+        aggregates['chauffeurs'] = (
+            chauffeurs.sort_values('revenue', ascending=False)
+            .rename_axis('chauffeur')
+            .reset_index()
+        )
+        aggregates['extreme_rides'] = extreme_rides(df, price)
+
+    locations = None
+    if 'Pickup' in df.columns and 'Dropoff' in df.columns:
+        locations = LocationIndex(df['Pickup'], df['Dropoff'])
+        aggregates.update(location_aggregates(locations, price))
+
+    anomalies, anomaly_counts = price_anomalies(df, price, locations, columns=['Chauffer', *RIDE_COLUMNS])
+    if not anomaly_counts.empty:
+        aggregates['anomalies'] = anomalies
+        aggregates['anomaly_counts'] = anomaly_counts
+
+    if 'Date' in df.columns:
+        dates = parse_dates(df['Date'])
+        valid = dates.notna()
+        if valid.any():
+            days = dates[valid].dt.normalize()
+            daily = price[valid].groupby(days).agg(['count', 'sum'])
+            daily.columns = ['rides', 'revenue']
+            daily = daily.rename_axis('date').reset_index()
+            daily['date'] = daily['date'].dt.strftime('%Y-%m-%d')
+            aggregates['daily'] = daily
+
+            weekday = price[valid].groupby(dates[valid].dt.day_name()).agg(['count', 'sum'])
+            weekday.columns = ['rides', 'revenue']
+            aggregates['weekday'] = (
+                weekday.reindex(WEEKDAYS, fill_value=0)
+                .rename_axis('day')
+                .reset_index()
+            )
+
+            if 'Chauffer' in df.columns:
+                aggregates['chauffeur_months'] = chauffeur_months(df['Chauffer'][valid], dates[valid], price[valid])
+
+    return aggregates
+
+
+def dumps(aggregates):
+    """Serialize aggregate tables to JSON text."""
+    return json.dumps(
+        {name: table.to_dict(orient='split', index=False) for name, table in aggregates.items()},
+        default=str,
+    )
+
+
+def loads(text):
+    """Inverse of dumps."""
+    return {
+        name: pd.DataFrame(table['data'], columns=table['columns'])
+        for name, table in json.loads(text).items()
+    }
+
+
+def save_aggregates(csv_file, aggregates):
+    """
+    Store the aggregate tables of an upload as a JSON artifact (aggregates/aggregates_<id>.json).
+    The caller saves the model.
+    """
+    csv_file.aggregates.save(
+        f'aggregates_{csv_file.id}.json',
+        ContentFile(dumps(aggregates).encode('utf-8')),
+        save=False,
+    )
+
+
+@lru_cache(maxsize=32)
+def load_aggregates_file(name):
+    """Load aggregate tables by storage name, memoized per process."""
+    return loads(read_text(name))
+
+
+def load_aggregates(csv_file):
+    """
+    Load the aggregate tables of an upload.
+
+    Artifacts are never rewritten under the same name, so parsed tables are
+    memoized per process by storage name. Callers must not modify the returned
+    DataFrames.
+
+    Returns:
+        dict: Table name -> DataFrame (empty if the upload has no aggregates)
+    """
+    if not csv_file.aggregates:
+        return {}
+    return load_aggregates_file(csv_file.aggregates.name)
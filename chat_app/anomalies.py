@@ -0,0 +1,134 @@
+# anomalies.py
+
+import numpy as np
+import pandas as pd
+
+# |robust z| at or above which a ride is flagged (Iglewicz and Hoaglin's cutoff)
+SCORE_THRESHOLD = 3.5
+
+# Groups with fewer priced rides than this have no baseline of their own
+MIN_GROUP_RIDES = 5
+
+# Most flagged rides kept in the anomalies aggregate
+MAX_ANOMALIES = 100
+
+# Scale factors that turn a median / mean absolute deviation into a standard deviation estimate
+MAD_SCALE = 1.4826
+MEAN_AD_SCALE = 1.2533
+
+
+def robust_scores(price, keys, min_rides=MIN_GROUP_RIDES):
+    """
+    Robust z-score of every price against the baseline of its group.
+
+    Prices are compared on a log scale, where a fare ten times too high and one
+    ten times too low are equally far from normal and the long right tail of
+    fares doesn't drown out the low ones. The baseline is the group's median
+    and its spread the median absolute deviation (MAD), so the outliers being
+    looked for barely move either. Both are grouped transforms, with no loop
+    over groups or rows. Groups whose MAD is 0 (most prices identical) fall
+    back to the mean absolute deviation.
+
+    Args:
+        price (Series): Ride prices (NaN when unknown; prices <= 0 are not scored)
+        keys (Series): Group of every ride (NaN when unknown)
+        min_rides (int): Smallest group that gets a baseline
+
+    Returns:
+        tuple: (scores, group median prices), Series aligned with price; NaN where there is no baseline
+    """
+    log_price = np.log(price.where(price > 0))
+    grouped = log_price.groupby(keys)
+    median = grouped.transform('median')
+    deviation = (log_price - median).abs()
+    deviations = deviation.groupby(keys)
+
+    spread = MAD_SCALE * deviations.transform('median')
+    spread = spread.where(spread > 0, MEAN_AD_SCALE * deviations.transform('mean'))
+    scores = (log_price - median) / spread.where(spread > 0)
+    return scores.where(grouped.transform('count') >= min_rides), np.exp(median)
+
+
+def price_anomalies(df, price, locations=None, columns=(), threshold=SCORE_THRESHOLD, top=MAX_ANOMALIES):
+    """
+    Rides priced far from what the same chauffeur or the same route usually charges.
+
+    Every ride is scored against its chauffeur and its route; the score that
+    deviates most is kept, with the baseline (median price) it was measured
+    against.
+
+    Args:
+        df (DataFrame): Rides with standardized columns
+        price (Series): Numeric ride prices aligned with df
+        locations (LocationIndex, optional): Normalized pickups and dropoffs, for route baselines
+        columns (sequence): Ride columns copied into the table
+        threshold (float): Smallest |score| that is flagged
+        top (int): Most rides kept, strongest first
+
+    Returns:
+        tuple: (flagged rides DataFrame, flagged ride counts per chauffeur DataFrame)
+    """
+    scores, baselines, bases = [], [], []
+    if 'Chauffer' in df.columns:
+        score, median = robust_scores(price, df['Chauffer'])
+        scores.append(score.to_numpy())
+        baselines.append(median.to_numpy())
+        bases.append('chauffeur')
+    if locations is not None:
+        route_keys = pd.Series(locations.route_codes(), index=price.index)
+        score, median = robust_scores(price, route_keys.where(route_keys >= 0))
+        scores.append(score.to_numpy())
+        baselines.append(median.to_numpy())
+        bases.append('route')
+    if not scores:
+        return pd.DataFrame(), pd.DataFrame()
+
+    scores = np.vstack(scores)
+    strength = np.nan_to_num(np.abs(scores), nan=-1.0)
+    strongest = strength.argmax(axis=0)
+    rows = np.arange(scores.shape[1])
+    score = scores[strongest, rows]
+    flagged = np.abs(np.nan_to_num(score)) >= threshold
+
+    table = df.loc[flagged, [col for col in columns if col in df.columns and col != 'Price']].copy()
+    if locations is not None:
+        table['route'] = locations.route_labels(flagged)
+    table['Price'] = price[flagged].to_numpy()
+    table['expected'] = np.vstack(baselines)[strongest, rows][flagged].round(2)
+    table['score'] = score[flagged].round(1)
+    table['basis'] = np.array(bases)[strongest[flagged]]
+    table['direction'] = np.where(table['score'] > 0, 'high', 'low')
+
+    # Flagged rides per chauffeur, counted before the table is cut to the strongest ones
+    group = table['Chauffer'] if 'Chauffer' in table.columns else pd.Series('all', index=table.index)
+    counts = pd.crosstab(group.rename('chauffeur'), table['direction'])
+    counts = counts.reindex(columns=['high', 'low'], fill_value=0)
+    counts.insert(0, 'flagged', counts.sum(axis=1))
+    counts = counts.sort_values('flagged', ascending=False).reset_index()
+    counts.columns.name = None
+
+    table = table.iloc[np.argsort(-np.abs(table['score'].to_numpy()), kind='stable')]
+    return table.head(top).reset_index(drop=True), counts
+
+
+def query_anomalies(table, min_score=SCORE_THRESHOLD, chauffeur=None, direction=None, limit=20):
+    """
+    Filter the stored anomalies table for the API and the chat layer.
+
+    Args:
+        table (DataFrame): The 'anomalies' aggregate
+        min_score (float): Smallest |score| returned
+        chauffeur (str, optional): Only this chauffeur's rides (case-insensitive)
+        direction (str, optional): 'high' or 'low'
+        limit (int): Most rides returned
+
+    Returns:
+        list: JSON-safe dicts, strongest first
+    """
+    keep = table['score'].abs() >= min_score
+    if chauffeur and 'Chauffer' in table.columns:
+        keep &= table['Chauffer'].astype(str).str.lower() == chauffeur.lower()
+    if direction:
+        keep &= table['direction'] == direction
+    rows = table[keep].head(limit)
+    return rows.astype(object).where(rows.notna(), None).to_dict(orient='records')
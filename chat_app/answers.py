@@ -0,0 +1,351 @@
+# answers.py
+
+import re
+import time
+from functools import lru_cache
+
+import pandas as pd
+from django.conf import settings
+
+from .aggregates import load_aggregates_file
+from .tracing import span
+
+# How a template picks the row it answers from (see AnswerTemplate)
+PICKS = ('max', 'min', 'latest')
+
+# Placeholder for the key value in a template's patterns, e.g. "how many rides did {key} complete"
+KEY_PLACEHOLDER = '{key}'
+
+# Words people put before a name that aren't part of it ("chauffeur Driver 3")
+_KEY_TITLE = r'(?P<title>(?:chauffeur|chauffer|driver) )?(?P<key>.+?)'
+
+# Politeness around a question that doesn't change what it asks
+_LEADING_FILLER = re.compile(
+    r"^(?:(?:hey|hi|ok|okay|so|please) )*"
+    r"(?:(?:can|could|would) you (?:please )?(?:tell me |show me |let me know )?|(?:please )?tell me |i want to know )?"
+)
+_TRAILING_FILLER = re.compile(r"(?: please| thanks| thank you)+$")
+
+
+def normalize(text):
+    """Lowercase words separated by single spaces, without punctuation or apostrophes."""
+    return ' '.join(re.findall(r"\w+", text.lower().replace("'", '').replace('’', '')))
+
+
+def normalize_question(question):
+    """A question as normalize() writes it, without 'please', 'can you tell me' and the like."""
+    text = _LEADING_FILLER.sub('', normalize(question), count=1)
+    return _TRAILING_FILLER.sub('', text)
+
+
+class AnswerTemplate:
+    """
+    A common question and how to answer it exactly from one aggregate table.
+
+    Answers are computed at ingest for every value of the key column, so
+    answering a matching question in chat is a dictionary lookup.
+    """
+
+    def __init__(self, name, patterns, table, answer, key=None, pick=None):
+        """
+        Args:
+            name (str): Short identifier, stored with each precomputed answer
+            patterns (sequence): Regular expressions a whole question must match once
+                normalized (see normalize_question); keyed templates put {key} where
+                the question names the key value
+            table (str): Aggregate table the answer is read from (see build_aggregates)
+            answer (str): str.format template filled in with the answering row's columns
+            key (str, optional): Column whose value the question names (e.g. 'chauffeur');
+                one answer is precomputed per value
+            pick (str, optional): Which row answers: 'max:<column>' or 'min:<column>'
+                (per key value for keyed templates), or 'latest:<column>' (the rows with
+                the table's largest value, e.g. the last month); the first row by default
+
+        Raises:
+            ValueError: If pick is malformed or the patterns don't match the key
+        """
+        if pick is not None and (':' not in pick or pick.split(':', 1)[0] not in PICKS):
+            raise ValueError(f"Answer template {name}: pick must be <{'|'.join(PICKS)}>:<column>")
+        if any((KEY_PLACEHOLDER in pattern) != bool(key) for pattern in patterns):
+            raise ValueError(f"Answer template {name}: every pattern needs {KEY_PLACEHOLDER} exactly when a key is set")
+        self.name = name
+        self.patterns = [re.compile(pattern.replace(KEY_PLACEHOLDER, _KEY_TITLE)) for pattern in patterns]
+        self.table = table
+        self.answer = answer
+        self.key = key
+        self.pick = pick
+
+    def rows(self, aggregates):
+        """The rows answers are written from: one per key value, or one."""
+        rows = aggregates.get(self.table)
+        if rows is None or rows.empty:
+            return None
+        if self.pick is not None:
+            how, column = self.pick.split(':', 1)
+            if how == 'latest':
+                rows = rows[rows[column] == rows[column].max()]
+            else:
+                rows = rows.sort_values(column, ascending=how == 'min', kind='stable')
+        if self.key is None:
+            return rows.head(1)
+        rows = rows[rows[self.key].notna()]
+        return rows.drop_duplicates(self.key)
+
+    def precompute(self, aggregates):
+        """(normalized key value, answer) for every answerable question; the key is '' without one."""
+        rows = self.rows(aggregates)
+        if rows is None:
+            return []
+        answers = []
+        for row in rows.to_dict('records'):
+            key = normalize(str(row[self.key])) if self.key else ''
+            if self.key and not key:
+                continue
+            answers.append((key, self.answer.format(**row)))
+        return answers
+
+    def lookup(self, question, answers):
+        """
+        The precomputed answer to a normalized question, or None if the question isn't this template's.
+
+        Args:
+            question (str): The question, normalized with normalize_question
+            answers (dict): This template's precomputed answers by key value
+        """
+        for pattern in self.patterns:
+            match = pattern.fullmatch(question)
+            if match is None:
+                continue
+            if self.key is None:
+                return answers.get('')
+            title, key = match.group('title'), match.group('key')
+            # "Driver 3" may be the name itself or a title before the name "3"
+            for candidate in ((title or '') + key, key):
+                if candidate in answers:
+                    return answers[candidate]
+        return None
+
+
+BUILTIN_TEMPLATES = [
+    AnswerTemplate(
+        'top_earner',
+        [
+            r"(?:who|which (?:chauffeur|driver)) (?:made|earned|makes|earns|brought in|generated) the most"
+            r"(?: money| revenue)?(?: overall| in total)?",
+            r"(?:who is|whos|which (?:chauffeur|driver) is) the (?:top|highest|best|biggest) "
+            r"(?:earner|earning (?:chauffeur|driver)|paid (?:chauffeur|driver))",
+        ],
+        'chauffeurs',
+        "{chauffeur} made the most money: ${revenue:,.2f} from {rides:,.0f} rides.",
+        pick='max:revenue',
+    ),
+    AnswerTemplate(
+        'most_rides',
+        [
+            r"(?:who|which (?:chauffeur|driver)) (?:did|completed|drove|had|has done|has completed|has driven) "
+            r"the most (?:rides|trips|bookings|jobs)",
+            r"(?:who|which (?:chauffeur|driver)) (?:is|was) the busiest(?: chauffeur| driver)?",
+        ],
+        'chauffeurs',
+        "{chauffeur} completed the most rides: {rides:,.0f}, for ${revenue:,.2f}.",
+        pick='max:rides',
+    ),
+    AnswerTemplate(
+        'chauffeur_rides_last_month',
+        [
+            r"how many (?:rides|trips|bookings|jobs) (?:did|has) {key} "
+            r"(?:complete|completed|do|done|drive|driven|make|made|have|had) last month",
+            r"how many (?:rides|trips|bookings|jobs) (?:did )?{key} (?:completed |did |drove |made |had )?last month",
+        ],
+        'chauffeur_months',
+        "{chauffeur} completed {rides:,.0f} rides in {month_label}, the last month in the data, for ${revenue:,.2f}.",
+        key='chauffeur', pick='latest:month',
+    ),
+    AnswerTemplate(
+        'chauffeur_rides',
+        [
+            r"how many (?:rides|trips|bookings|jobs) (?:did|has|does) {key} "
+            r"(?:complete|completed|do|done|drive|driven|make|made|have|had)(?: in total| overall| so far)?",
+            r"(?:what is |whats )?(?:the )?(?:total )?number of (?:rides|trips|bookings|jobs) (?:for|of|by) {key}",
+        ],
+        'chauffeurs',
+        "{chauffeur} completed {rides:,.0f} rides in total.",
+        key='chauffeur',
+    ),
+    AnswerTemplate(
+        'chauffeur_revenue',
+        [
+            r"(?:what is|whats|what are) (?:the )?(?:total )?(?:earnings|revenue|income|money made) (?:for|of|by) {key}",
+            r"how much (?:money |revenue )?(?:did|has|does) {key} "
+            r"(?:make|made|earn|earned|bring in|brought in|generate|generated)(?: in total| overall| so far)?",
+        ],
+        'chauffeurs',
+        "{chauffeur} earned ${revenue:,.2f} in total from {rides:,.0f} rides (${avg_price:,.2f} per ride on average).",
+        key='chauffeur',
+    ),
+    AnswerTemplate(
+        'chauffeur_avg_price',
+        [
+            r"(?:what is|whats) (?:the )?(?:average|avg|mean) (?:price|fare|ride price|price per ride) (?:for|of) {key}",
+        ],
+        'chauffeurs',
+        "{chauffeur}'s rides cost ${avg_price:,.2f} on average, over {rides:,.0f} rides.",
+        key='chauffeur',
+    ),
+    AnswerTemplate(
+        'busiest_weekday',
+        [
+            r"(?:what|which) (?:is|was) the busiest (?:day|day of the week|weekday)",
+            r"(?:what|which) (?:day|day of the week|weekday) (?:is|was|has|had) the most (?:rides|trips|bookings)",
+        ],
+        'weekday',
+        "{day} is the busiest day of the week, with {rides:,.0f} rides for ${revenue:,.2f}.",
+        pick='max:rides',
+    ),
+    AnswerTemplate(
+        'busiest_route',
+        [
+            r"(?:what|which) (?:is|was) the (?:busiest|most popular|most common) (?:route|trip)",
+        ],
+        'routes',
+        "The busiest route is {pickup} to {dropoff}, with {rides:,.0f} rides for ${revenue:,.2f}.",
+        pick='max:rides',
+    ),
+]
+
+# Templates added in code with register_template
+_registered_templates = []
+
+
+def register_template(template):
+    """Add a template to every ingest and chat (e.g. from an AppConfig.ready)."""
+    _registered_templates.append(template)
+
+
+def template_from_spec(spec):
+    """
+    Build a template from a declarative spec, as listed in settings.PRECOMPUTED_ANSWER_TEMPLATES.
+
+    Example: {"name": "chauffeur_top_ride", "patterns": ["what was the most expensive ride of {key}"],
+    "table": "chauffeurs", "key": "chauffeur", "answer": "..."}; pick is optional.
+
+    Raises:
+        ValueError: If the spec is incomplete or invalid
+    """
+    try:
+        name, patterns, table, answer = str(spec['name']), spec['patterns'], spec['table'], spec['answer']
+    except (KeyError, TypeError):
+        raise ValueError(f"Answer template needs name, patterns, table and answer: {spec!r}")
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    return AnswerTemplate(name, patterns, table, answer, key=spec.get('key'), pick=spec.get('pick'))
+
+
+def active_templates():
+    """The built-in templates, those registered in code and those declared in settings, in that order."""
+    return BUILTIN_TEMPLATES + _registered_templates + [
+        template_from_spec(spec) for spec in settings.PRECOMPUTED_ANSWER_TEMPLATES
+    ]
+
+
+def precompute_answers(aggregates, templates=None):
+    """
+    Answer every template question for every key value, from an upload's aggregates.
+
+    Args:
+        aggregates (dict): Table name -> DataFrame, as built at ingest
+        templates (list, optional): Templates to answer; active_templates() by default
+
+    Returns:
+        DataFrame: template, key (normalized key value, '' for templates without one) and answer
+    """
+    records = []
+    for template in active_templates() if templates is None else templates:
+        try:
+            records.extend(
+                {'template': template.name, 'key': key, 'answer': answer}
+                for key, answer in template.precompute(aggregates)
+            )
+        except (KeyError, ValueError, TypeError, IndexError) as e:
+            # A template naming a column its table doesn't have, or an answer that doesn't format
+            print(f"Precomputing answers for {template.name} failed: {e}")
+    return pd.DataFrame(records, columns=['template', 'key', 'answer'])
+
+
+@lru_cache(maxsize=32)
+def answer_index(name):
+    """Precomputed answers of an aggregates artifact by template and key, memoized per process."""
+    index = {}
+    answers = load_aggregates_file(name).get('answers')
+    if answers is not None:
+        for template, key, answer in answers.itertuples(index=False):
+            index.setdefault(template, {})[key] = answer
+    return index
+
+
+def match_answer(question, index, templates=None):
+    """
+    Find the precomputed answer to a question.
+
+    Args:
+        question (str): The user's question
+        index (dict): Template name -> {key value: answer} (see answer_index)
+        templates (list, optional): Templates to try in order; active_templates() by default
+
+    Returns:
+        tuple: (template name, answer), or None if no template matches
+    """
+    text = normalize_question(question)
+    for template in active_templates() if templates is None else templates:
+        answers = index.get(template.name)
+        if not answers:
+            continue
+        answer = template.lookup(text, answers)
+        if answer is not None:
+            return template.name, answer
+    return None
+
+
+def phrase_answer(question, answer, client=None):
+    """Have the small model word an exact answer as a reply; the answer itself if the call fails."""
+    from .Chatbot import Chatbot
+
+    writer = Chatbot(model=settings.ROUTER_SMALL_MODEL, client=client)
+    prompt = f"""Answer the question in one or two short, friendly sentences using only the fact below.
+                Keep every name and number exactly as written and add no other figures.
+                Question: {question}
+                Fact: {answer}"""
+    reply = writer.generate_response(prompt).strip()
+    return answer if not reply or reply.startswith('Error: ') else reply
+
+
+def precomputed_answer(csv_file, question, client=None):
+    """
+    Answer a chat question from the answers precomputed at ingest, if it is one of the templates.
+
+    With settings.PRECOMPUTED_ANSWER_PHRASING the small model words the answer;
+    otherwise it is returned as written by the template.
+
+    Args:
+        csv_file (UploadedCSV): A processed upload
+        question (str): The user's question
+        client (Groq, optional): Client to reuse for phrasing
+
+    Returns:
+        str: The answer, or None if the question has no precomputed answer
+    """
+    if not settings.PRECOMPUTED_ANSWERS or not csv_file.aggregates:
+        return None
+    start = time.perf_counter()
+    with span('answers.match') as match_span:
+        found = match_answer(question, answer_index(csv_file.aggregates.name))
+        if match_span is not None:
+            match_span.set(template=found[0] if found else None)
+    if found is None:
+        return None
+
+    template, answer = found
+    print(f"Answered from precomputed {template} in {(time.perf_counter() - start) * 1000:.1f} ms")
+    if settings.PRECOMPUTED_ANSWER_PHRASING:
+        answer = phrase_answer(question, answer, client)
+    return answer
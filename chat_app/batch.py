@@ -0,0 +1,152 @@
+# batch.py
+
+import contextvars
+import re
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from .storage import read_text, save_artifact
+
+# Storage directory the batch reports are written to
+REPORT_DIRECTORY = 'reports'
+
+# Seconds a client polling for a report is asked to wait between polls
+REPORT_POLL_SECONDS = 2
+
+# report_<upload id>_<UTC submission time>_<random token>.md
+_REPORT_NAME = re.compile(r'^report_\d+_(\d{8}-\d{6})_[0-9a-f]+\.md$')
+
+
+def parse_questions(text):
+    """One question per non-empty line; lines starting with # are comments."""
+    lines = (line.strip() for line in text.splitlines())
+    return [line for line in lines if line and not line.startswith('#')]
+
+
+def answer_questions(csv_file, questions, max_workers=None):
+    """
+    Ask the chatbot every question about an upload, several at a time.
+
+    The summary is read once and every question gets its own conversation with
+    that same context, so answers don't depend on each other. Each question is
+    answered like a chat message: from the precomputed answers if it is a
+    common question, else on the model routing.ask picks. All threads share
+    one API client (and its connection pool). With enough workers the batch
+    takes about as long as its slowest question.
+
+    Args:
+        csv_file (UploadedCSV): A processed upload
+        questions (list): Questions to ask
+        max_workers (int, optional): Questions in flight at once,
+            settings.BATCH_QUESTION_WORKERS by default
+
+    Returns:
+        dict: 'results' (question, answer, ok and seconds, in question order),
+            'seconds' (wall time of the batch)
+    """
+    from .Chatbot import Chatbot  # groq is only needed once a batch runs
+    from .answers import precomputed_answer
+    from .routing import ask
+
+    context = read_text(csv_file.processed_csv.name, csv_file.processed_csv.storage)
+    general = csv_file.analysis_mode == 'general'
+    client = Chatbot(context_text=context, general=general).client
+
+    def answer_one(question):
+        start = time.perf_counter()
+        answer = precomputed_answer(csv_file, question, client)
+        if answer is None:
+            answer = ask(context, question, general=general, client=client)
+        return {
+            'question': question,
+            'answer': answer,
+            # generate_response reports API failures as text instead of raising
+            'ok': not answer.startswith('Error: '),
+            'seconds': round(time.perf_counter() - start, 2),
+        }
+
+    workers = max(1, min(max_workers or settings.BATCH_QUESTION_WORKERS, len(questions) or 1))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch-question') as executor:
+        # Each question runs in a copy of the caller's context, so its LLM call counts for the caller's tenant
+        futures = [executor.submit(contextvars.copy_context().run, answer_one, question) for question in questions]
+        results = [future.result() for future in futures]
+    return {'results': results, 'seconds': round(time.perf_counter() - start, 2)}
+
+
+def render_report(csv_file, batch):
+    """Format the answers of a batch as a Markdown report."""
+    results = batch['results']
+    answered = sum(result['ok'] for result in results)
+    slowest = max((result['seconds'] for result in results), default=0)
+    total = sum(result['seconds'] for result in results)
+
+    lines = [
+        f"# Batch report: {csv_file.raw_csv.name}",
+        f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        f"Questions: {len(results)} ({answered} answered, {len(results) - answered} failed)",
+        f"Time: {batch['seconds']:.1f}s (slowest question {slowest:.1f}s, {total:.1f}s if asked one by one)",
+    ]
+    if not csv_file.summary_is_exact:
+        lines.append("Note: answered from the preview summary, so figures are estimates.")
+    for number, result in enumerate(results, start=1):
+        lines.append(f"\n## {number}. {result['question']}\n")
+        lines.append(result['answer'].strip())
+    return '\n'.join(lines) + '\n'
+
+
+def report_name(csv_file):
+    """A new storage name for a batch report of an upload, unique even for batches sent the same second."""
+    submitted = timezone.now().strftime('%Y%m%d-%H%M%S')
+    return f"{REPORT_DIRECTORY}/report_{csv_file.id}_{submitted}_{secrets.token_hex(4)}.md"
+
+
+def report_submitted_at(name):
+    """When the batch of a report (file name, as from report_name) was submitted, or None for other names."""
+    match = _REPORT_NAME.match(name)
+    if match is None:
+        return None
+    return datetime.strptime(match.group(1), '%Y%m%d-%H%M%S').replace(tzinfo=dt_timezone.utc)
+
+
+def run_batch(csv_file, questions, max_workers=None, name=None):
+    """
+    Answer a list of questions about an upload and store the consolidated report.
+
+    Args:
+        name (str, optional): Storage name of the report, report_name(csv_file) by default
+
+    Returns:
+        dict: The batch (see answer_questions) plus 'report', the storage name
+            of the report (reports/report_<id>_<timestamp>_<token>.md)
+    """
+    batch = answer_questions(csv_file, questions, max_workers)
+    batch['report'] = save_artifact(name or report_name(csv_file), render_report(csv_file, batch))
+    return batch
+
+
+def batch_job(csv_file_id, questions, name):
+    """
+    Background job: answer a batch sent from the app and store its report under name.
+
+    Clients poll for the report, so a batch that fails, or whose upload is
+    gone, still stores one, saying why, rather than leaving them to wait for a
+    file that never comes.
+    """
+    from .models import UploadedCSV
+
+    csv_file = UploadedCSV.objects.filter(id=csv_file_id, is_processed=True).first()
+    if csv_file is None:
+        # Deleted (chat ended) before the batch started
+        save_artifact(name, f"# Batch report: upload {csv_file_id}\n\nThe batch failed: the upload was deleted\n")
+        return None
+    try:
+        return run_batch(csv_file, questions, name=name)
+    except Exception as e:
+        save_artifact(name, f"# Batch report: {csv_file.raw_csv.name}\n\nThe batch failed: {e}\n")
+        raise
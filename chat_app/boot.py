@@ -0,0 +1,127 @@
+# boot.py
+
+import gc
+import glob
+import importlib
+import os
+import re
+import subprocess
+import sys
+
+# Third-party packages that are slow to import and only needed by some views
+HEAVY_PACKAGES = ('pandas', 'numpy', 'pyarrow', 'groq', 'httpx', 'pydantic')
+
+# Modules imported in the gunicorn master under preload_app, so workers share them
+PRELOAD_MODULES = (
+    'chat_app.data_processor',
+    'chat_app.Chatbot',
+    'chat_app.routing',
+    'chat_app.answers',
+    'chat_app.charts',
+    'chat_app.leaderboard',
+    'chat_app.anomalies',
+    'chat_app.frames',
+)
+
+_IMPORTTIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def parse_importtime(text):
+    """
+    Parse the stderr of `python -X importtime`.
+
+    Returns:
+        list: One dict per import in the order Python finished them: module,
+            self_ms, cumulative_ms, and importers (the chain of modules that
+            caused the import, outermost first)
+    """
+    rows = []
+    for line in text.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append({
+                'module': module,
+                'self_ms': int(self_us) / 1000,
+                'cumulative_ms': int(cumulative_us) / 1000,
+                'level': len(indent) // 2,
+            })
+
+    # A module is listed after everything it imported, one level further out
+    stack = []
+    for row in reversed(rows):
+        del stack[row['level']:]
+        row['importers'] = list(stack)
+        stack.append(row['module'])
+    return rows
+
+
+def profile_imports(modules=()):
+    """
+    Boot the app in a fresh interpreter and time every import.
+
+    Loads the WSGI application and the URLconf, like a worker before its first
+    request, then imports any extra modules given.
+
+    Args:
+        modules (sequence): Extra modules to import after boot
+
+    Returns:
+        dict: 'imports' (see parse_importtime) and 'heavy' (heavy package -> importer chain)
+    """
+    code = (
+        'from django.core.wsgi import get_wsgi_application\n'
+        'from django.conf import settings\n'
+        'import importlib\n'
+        'get_wsgi_application()\n'
+        'importlib.import_module(settings.ROOT_URLCONF)\n'
+        f'for module in {list(modules)!r}:\n'
+        '    importlib.import_module(module)\n'
+    )
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'chatbot_project.settings')
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        env=env, capture_output=True, text=True, check=False,
+    )
+    if completed.returncode != 0:
+        errors = [line for line in completed.stderr.splitlines() if not line.startswith('import time:')]
+        raise RuntimeError('\n'.join(errors[-20:]))
+
+    imports = parse_importtime(completed.stderr)
+    heavy = {}
+    for row in imports:
+        if row['module'] in HEAVY_PACKAGES:
+            heavy[row['module']] = row['importers']
+    return {'imports': imports, 'heavy': heavy}
+
+
+def preload():
+    """
+    Initialize shared, read-only state once in the gunicorn master (preload_app).
+
+    Imports the analysis and LLM stacks, builds the URL resolver and compiles
+    the templates, then moves everything alive into the permanent GC
+    generation (gc.freeze). Forked workers start with all of it already in
+    memory, and because the collector no longer touches those objects their
+    pages stay shared copy-on-write instead of being copied into every worker.
+
+    Nothing that holds a socket, a thread or a database connection may be
+    created here: those must not be shared across a fork.
+    """
+    from django.db import connections
+    from django.template import engines
+    from django.urls import get_resolver
+
+    for module in PRELOAD_MODULES:
+        importlib.import_module(module)
+    get_resolver().reverse_dict  # Imports the URLconf and every view module, and indexes the routes
+
+    for engine in engines.all():
+        for directory in engine.template_dirs:
+            for path in glob.glob(os.path.join(directory, '**', '*.html'), recursive=True):
+                engine.get_template(os.path.relpath(path, directory))
+
+    connections.close_all()
+    gc.collect()
+    gc.freeze()
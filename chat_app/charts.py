@@ -0,0 +1,185 @@
+# charts.py
+
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+from django.core.cache import caches
+
+from .aggregates import load_aggregates
+
+# Most points drawn for a time series; longer series are downsampled with LTTB
+DEFAULT_MAX_POINTS = 500
+
+# Most bars drawn in the per-chauffeur chart
+DEFAULT_BAR_LIMIT = 25
+
+# Cache alias holding rendered charts, shared by all workers (settings.CACHES)
+CHART_CACHE = 'charts'
+
+# How long a rendered chart stays in the cache, in seconds
+CHART_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+class ChartUnavailable(Exception):
+    """The upload has no aggregate the requested chart can be built from."""
+
+
+def lttb(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Keeps the first and last point, and from every bucket in between the point
+    that forms the largest triangle with the previously kept point and the
+    average of the next bucket. Peaks and dips survive, unlike with plain
+    decimation or averaging.
+
+    Args:
+        x (ndarray): Increasing x values as floats
+        y (ndarray): y values
+        threshold (int): Number of points to keep
+
+    Returns:
+        ndarray: Indices of the points to keep, in order
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    bucket_size = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third corner of the triangle
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        indices[i + 1] = a
+    indices[-1] = n - 1
+    return indices
+
+
+def _earnings_over_time(aggregates, spec):
+    daily = aggregates.get('daily')
+    if daily is None or daily.empty:
+        raise ChartUnavailable("No dated rides to chart")
+
+    x = pd.to_datetime(daily['date']).astype('int64').to_numpy(dtype=float)
+    y = daily['revenue'].to_numpy(dtype=float)
+    keep = lttb(x, y, spec['points'])
+    series = daily.iloc[keep]
+
+    return {
+        'data': [{
+            'type': 'scatter',
+            'mode': 'lines',
+            'name': 'Revenue',
+            'x': series['date'].tolist(),
+            'y': series['revenue'].round(2).tolist(),
+        }],
+        'layout': {
+            'title': {'text': 'Earnings over time'},
+            'xaxis': {'title': {'text': 'Date'}},
+            'yaxis': {'title': {'text': 'Revenue ($)'}},
+        },
+    }
+
+
+def _chauffeur_earnings(aggregates, spec):
+    chauffeurs = aggregates.get('chauffeurs')
+    if chauffeurs is None or chauffeurs.empty:
+        raise ChartUnavailable("No chauffeur earnings to chart")
+
+    top = chauffeurs.head(spec['limit'])
+    return {
+        'data': [{
+            'type': 'bar',
+            'name': 'Revenue',
+            'x': top['chauffeur'].astype(str).tolist(),
+            'y': top['revenue'].round(2).tolist(),
+            'customdata': top['rides'].tolist(),
+            'hovertemplate': '%{x}<br>$%{y:,.2f} from %{customdata} rides<extra></extra>',
+        }],
+        'layout': {
+            'title': {'text': f"Earnings per chauffeur (top {len(top)} of {len(chauffeurs)})"},
+            'yaxis': {'title': {'text': 'Revenue ($)'}},
+        },
+    }
+
+
+def _day_of_week(aggregates, spec):
+    weekday = aggregates.get('weekday')
+    if weekday is None or weekday.empty:
+        raise ChartUnavailable("No dated rides to chart")
+
+    return {
+        'data': [
+            {'type': 'bar', 'name': 'Rides', 'x': weekday['day'].tolist(), 'y': weekday['rides'].tolist()},
+            {
+                'type': 'scatter', 'mode': 'lines+markers', 'name': 'Revenue', 'yaxis': 'y2',
+                'x': weekday['day'].tolist(), 'y': weekday['revenue'].round(2).tolist(),
+            },
+        ],
+        'layout': {
+            'title': {'text': 'Rides and earnings by day of week'},
+            'yaxis': {'title': {'text': 'Rides'}},
+            'yaxis2': {'title': {'text': 'Revenue ($)'}, 'overlaying': 'y', 'side': 'right'},
+        },
+    }
+
+
+# Chart kind -> builder. Each builder takes the aggregate tables and a spec dict.
+CHARTS = {
+    'earnings-over-time': _earnings_over_time,
+    'chauffeur-earnings': _chauffeur_earnings,
+    'day-of-week': _day_of_week,
+}
+
+
+def chart_spec(kind, points=None, limit=None):
+    """Normalize the parameters of a chart request; the result is part of the cache key."""
+    return {
+        'kind': kind,
+        'points': max(3, min(int(points or DEFAULT_MAX_POINTS), 5000)),
+        'limit': max(1, min(int(limit or DEFAULT_BAR_LIMIT), 200)),
+    }
+
+
+def render_chart(csv_file, spec):
+    """
+    Return a Plotly figure (as a JSON-serializable dict) for an upload.
+
+    Figures are built from the upload's precomputed aggregates and cached per
+    upload and chart spec in the shared 'charts' cache, so repeated page views
+    do not recompute them, whichever worker serves them.
+
+    Args:
+        csv_file (UploadedCSV): A processed upload
+        spec (dict): Output of chart_spec
+
+    Raises:
+        KeyError: If the chart kind is unknown
+        ChartUnavailable: If the upload lacks the data for this chart
+    """
+    builder = CHARTS[spec['kind']]
+    spec_hash = hashlib.sha1(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+    # The aggregates file name changes whenever an upload is reprocessed
+    key = f"chart:{csv_file.id}:{csv_file.aggregates.name}:{spec_hash}"
+
+    cache = caches[CHART_CACHE]
+    figure = cache.get(key)
+    if figure is None:
+        figure = builder(load_aggregates(csv_file), spec)
+        cache.set(key, figure, CHART_CACHE_TIMEOUT)
+    return figure
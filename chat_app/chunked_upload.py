@@ -0,0 +1,319 @@
+# chunked_upload.py
+
+import csv
+import hashlib
+import io
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from .models import ChunkedUpload, UploadedCSV
+from .storage import delete_artifact
+
+# Size of the pieces read from the request body and written out
+READ_SIZE = 64 * 1024
+
+# A chunk is buffered in memory up to this size, then spills to a temporary file on disk
+SPOOL_SIZE = 1024 * 1024
+
+# How much of the first chunk is used to sniff the delimiter and check the first rows
+SNIFF_SIZE = 64 * 1024
+SNIFF_ROWS = 20
+
+
+class UploadError(Exception):
+    """A chunk or upload was rejected; status is the HTTP status to answer with."""
+    status = 400
+
+
+class UploadStateError(UploadError):
+    """The upload can't take chunks any more (finished or failed); the data itself may be fine."""
+    status = 409
+
+
+class AlreadyComplete(UploadStateError):
+    """The final chunk was sent again after the upload completed, e.g. by a client that lost the response."""
+    status = 200
+
+
+class AssemblyError(UploadStateError):
+    """Every chunk arrived but the file could not be assembled; finalizing can be retried."""
+    status = 503
+
+
+class OffsetMismatch(UploadError):
+    """The chunk does not start where the committed data ends."""
+    status = 409
+
+    def __init__(self, expected):
+        super().__init__(f"Chunk must start at byte {expected}")
+        self.expected = expected
+
+
+class _PartStream(io.RawIOBase):
+    """
+    Reads the stored chunk objects of an upload one after the other as a single
+    stream, so the assembled file can be saved without holding it in memory.
+    The bytes read are fed to hasher, if given.
+    """
+
+    def __init__(self, names, storage, hasher=None):
+        super().__init__()
+        self._names = iter(names)
+        self._storage = storage
+        self._hasher = hasher
+        self._current = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while True:
+            if self._current is None:
+                name = next(self._names, None)
+                if name is None:
+                    return 0
+                self._current = self._storage.open(name, 'rb')
+            data = self._current.read(len(buffer))
+            if data:
+                buffer[:len(data)] = data
+                if self._hasher is not None:
+                    self._hasher.update(data)
+                return len(data)
+            self._current.close()
+            self._current = None
+
+    def close(self):
+        if self._current is not None:
+            self._current.close()
+            self._current = None
+        super().close()
+
+
+def parts_directory(upload):
+    """Storage directory holding the chunks of an upload."""
+    return f'chunked_uploads/{upload.id}'
+
+
+def part_name(upload, offset):
+    """Storage name of the chunk starting at offset; zero padded so names sort by offset."""
+    return f'{parts_directory(upload)}/{offset:015d}.part'
+
+
+def committed_parts(upload, storage=None):
+    """Storage names of the chunks below the committed offset, in file order."""
+    storage = storage or default_storage
+    try:
+        _, files = storage.listdir(parts_directory(upload))
+    except FileNotFoundError:
+        return []
+    offsets = sorted(int(f.split('.')[0]) for f in files if f.endswith('.part'))
+    return [part_name(upload, offset) for offset in offsets if offset < upload.received_bytes]
+
+
+def _drained_length(stream):
+    """Read a request body to its end (up to twice the chunk size) and return its length."""
+    length = 0
+    for block in iter(lambda: stream.read(READ_SIZE), b''):
+        length += len(block)
+        if length > settings.CHUNKED_UPLOAD_CHUNK_SIZE * 2:
+            break
+    return length
+
+
+def sniff_header(upload, first_block):
+    """
+    Check that the start of the file looks like a CSV and record its header.
+
+    The encoding and delimiter are detected the way the summarizer detects them
+    (readers.sniff_format). Excel workbooks can only be read once complete, so
+    they are not checked here.
+
+    Args:
+        upload (ChunkedUpload): The upload being sniffed
+        first_block (bytes): The first bytes of the file
+
+    Raises:
+        UploadError: If the data does not look like a delimited text file
+    """
+    from .readers import detect_encoding, first_lines, is_excel, sniff_delimiter
+
+    if is_excel(upload.filename, first_block):
+        upload.header = None
+        upload.delimiter = ''
+        return
+
+    sample = first_block[:SNIFF_SIZE]
+    encoding = detect_encoding(sample)
+    # The last line may be cut off by the block boundary unless the whole file is here
+    lines = first_lines(sample, encoding, complete=len(first_block) >= upload.total_size)
+    if not lines:
+        raise UploadError("Could not find a header row in the first chunk")
+
+    delimiter = sniff_delimiter(lines[:SNIFF_ROWS])
+    rows = list(csv.reader(lines[:SNIFF_ROWS + 1], delimiter=delimiter))
+    header = [name.strip() for name in rows[0]]
+    if len(header) < 2 or not any(header):
+        raise UploadError("The file does not look like a CSV: the header has fewer than two columns")
+
+    # Short rows are fine (pandas fills them with NaN); extra fields mean a wrong delimiter or broken quoting
+    for line_number, row in enumerate(rows[1:], start=2):
+        if len(row) > len(header):
+            raise UploadError(
+                f"Row {line_number} has {len(row)} fields but the header has {len(header)}"
+            )
+
+    upload.header = header
+    upload.delimiter = delimiter
+
+
+def write_chunk(upload, offset, stream, storage=None):
+    """
+    Stream one chunk from the request body into storage.
+
+    Each chunk is stored as its own object, so any dyno can accept the next chunk
+    and object stores that cannot append still work. The caller must hold a lock
+    on the upload row (select_for_update) so two requests cannot write the same
+    range. The line count and header sniff are updated as the bytes go by; the
+    content hash is taken once, in finalize.
+
+    A resent final chunk of an upload that has every byte but was never
+    assembled (finalize failed) is read and dropped, so the caller can retry
+    finalize.
+
+    Args:
+        upload (ChunkedUpload): The locked upload row
+        offset (int): Byte position the client says this chunk starts at
+        stream: File-like object to read the chunk from (the request)
+        storage (Storage, optional): Where chunks are kept, default_storage by default
+
+    Raises:
+        AlreadyComplete: If this is a retry of the final chunk of a completed upload
+        UploadStateError: If the upload is no longer taking chunks
+        OffsetMismatch: If offset is not the number of bytes committed so far
+        UploadError: If the chunk is too large or the data is not a CSV
+    """
+    storage = storage or default_storage
+    if upload.status == ChunkedUpload.STATUS_COMPLETE:
+        # Drain the body to tell a resent final chunk from a stray one
+        if offset + _drained_length(stream) == upload.total_size:
+            raise AlreadyComplete("Upload is already complete")
+        raise UploadStateError("Upload is already complete")
+    if upload.status != ChunkedUpload.STATUS_UPLOADING:
+        raise UploadStateError(f"Upload is already {upload.status}")
+    if upload.is_complete:
+        if offset + _drained_length(stream) == upload.total_size:
+            return
+        raise OffsetMismatch(upload.received_bytes)
+    if offset != upload.received_bytes:
+        raise OffsetMismatch(upload.received_bytes)
+
+    from .readers import is_excel
+
+    name = part_name(upload, offset)
+    # Workbooks are binary zip files; their rows can't be counted from newlines
+    workbook = is_excel(upload.filename)
+
+    written = 0
+    newlines = 0
+    max_chunk = settings.CHUNKED_UPLOAD_CHUNK_SIZE * 2
+    first_block = b''
+    last_byte = b''
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as buffer:
+        while True:
+            block = stream.read(READ_SIZE)
+            if not block:
+                break
+            written += len(block)
+            if written > max_chunk or offset + written > upload.total_size:
+                raise UploadError("Chunk is larger than allowed")
+            if b'\x00' in block and not workbook:
+                raise UploadError("The file contains binary data and is not a CSV")
+            if offset == 0 and len(first_block) < SNIFF_SIZE:
+                first_block += block[:SNIFF_SIZE - len(first_block)]
+            if not workbook:
+                newlines += block.count(b'\n')
+            last_byte = block[-1:]
+            buffer.write(block)
+
+        if offset == 0:
+            sniff_header(upload, first_block)
+
+        # A part at this offset can only be left over from a request that never committed
+        if storage.exists(name):
+            storage.delete(name)
+        buffer.seek(0)
+        storage.save(name, File(buffer, name=name))
+
+    upload.received_bytes = offset + written
+    upload.row_count += newlines
+
+    if upload.is_complete:
+        # row_count counted newlines; the header is not a row, and the last row may lack a newline
+        if not workbook:
+            upload.row_count = max(upload.row_count - 1 + (0 if last_byte == b'\n' else 1), 0)
+
+
+def finalize(upload, storage=None):
+    """
+    Turn a fully received upload into an UploadedCSV.
+
+    The chunks are streamed into the final file one after the other and then
+    removed. The content hash is computed from that same stream, so every byte
+    is read from storage once, whichever dynos took the chunks.
+
+    Args:
+        upload (ChunkedUpload): An upload whose last chunk has been committed
+        storage (Storage, optional): Where chunks are kept, default_storage by default
+
+    Returns:
+        UploadedCSV: The new, not yet processed, upload record
+
+    Raises:
+        UploadError: If the content hash does not match the one the client sent
+        AssemblyError: If the file could not be written; the chunks are kept for a retry
+    """
+    storage = storage or default_storage
+    hasher = hashlib.sha256()
+    csv_file = UploadedCSV(user=upload.user, analysis_mode=upload.analysis_mode)
+    try:
+        parts = committed_parts(upload, storage)
+        with io.BufferedReader(_PartStream(parts, storage, hasher), READ_SIZE) as assembled:
+            content = File(assembled, name=upload.filename)
+            content.size = upload.total_size
+            csv_file.raw_csv.save(os.path.basename(upload.filename), content, save=False)
+    except Exception as e:
+        print(f"Could not assemble upload {upload.id}: {e}")
+        raise AssemblyError("The file could not be assembled; resend the last chunk to retry") from e
+
+    upload.sha256 = hasher.hexdigest()
+    if upload.expected_sha256 and upload.expected_sha256.lower() != upload.sha256:
+        delete_artifact(csv_file.raw_csv.name, csv_file.raw_csv.storage)
+        upload.status = ChunkedUpload.STATUS_FAILED
+        upload.error = "Content hash does not match the one sent by the client"
+        upload.save()
+        discard(upload, storage)
+        raise UploadError(upload.error)
+
+    csv_file.content_hash = upload.sha256
+    csv_file.save()
+
+    upload.uploaded_csv = csv_file
+    upload.status = ChunkedUpload.STATUS_COMPLETE
+    upload.save()
+    discard(upload, storage)
+    return csv_file
+
+
+def discard(upload, storage=None):
+    """Remove the stored chunks of an upload that is finished or will not be completed."""
+    storage = storage or default_storage
+    try:
+        _, files = storage.listdir(parts_directory(upload))
+    except FileNotFoundError:
+        return
+    for f in files:
+        storage.delete(f'{parts_directory(upload)}/{f}')
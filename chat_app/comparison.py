@@ -0,0 +1,290 @@
+# comparison.py
+
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .aggregates import load_aggregates_file, WEEKDAYS
+from .prompt_encoding import CompactPromptRenderer, PromptTable, DEFAULT_TOKEN_BUDGET
+
+# Metrics that add up (a missing row means zero); averages are left missing instead
+ADDITIVE_METRICS = {'rides', 'revenue'}
+
+# Tables a comparison holds, in the order the API and the summary list them
+COMPARISON_TABLES = ['totals', 'chauffeurs', 'routes', 'weekday', 'daily']
+
+# Rows per table in the comparison summary
+SUMMARY_ROWS = 10
+
+
+def compare_tables(before, after, keys, metrics):
+    """
+    Join one aggregate table of two periods and compute the change of every metric.
+
+    One outer merge on the keys; everything after it is column arithmetic.
+    For each metric the result has <metric>_before, <metric>_after, <metric>_delta
+    (after - before) and <metric>_growth (percent change, missing when the
+    before value is 0 or missing).
+
+    Args:
+        before (DataFrame): The table of the earlier period
+        after (DataFrame): The same table of the later period
+        keys (list): Columns identifying a row (e.g. ['chauffeur'])
+        metrics (list): Numeric columns to compare
+
+    Returns:
+        DataFrame: keys, status ('both', 'new' or 'gone') and the metric columns
+    """
+    merged = pd.merge(
+        before[keys + metrics], after[keys + metrics],
+        on=keys, how='outer', suffixes=('_before', '_after'), indicator=True, sort=False,
+    )
+    status = np.select(
+        [merged['_merge'] == 'left_only', merged['_merge'] == 'right_only'],
+        ['gone', 'new'],
+        default='both',
+    )
+    columns = {key: merged[key] for key in keys}
+    columns['status'] = status
+    for metric in metrics:
+        b = pd.to_numeric(merged[f'{metric}_before'], errors='coerce')
+        a = pd.to_numeric(merged[f'{metric}_after'], errors='coerce')
+        if metric in ADDITIVE_METRICS:
+            b, a = b.fillna(0), a.fillna(0)
+            if pd.api.types.is_integer_dtype(before[metric]) and pd.api.types.is_integer_dtype(after[metric]):
+                b, a = b.astype('int64'), a.astype('int64')
+        delta = a - b
+        columns[f'{metric}_before'] = b
+        columns[f'{metric}_after'] = a
+        columns[f'{metric}_delta'] = delta
+        columns[f'{metric}_growth'] = delta / b.where(b != 0) * 100
+    return pd.DataFrame(columns)
+
+
+def _aligned_daily(daily):
+    """The daily table keyed by day of the period (1 = first day with rides), so two months line up."""
+    dates = pd.to_datetime(daily['date'])
+    return daily.assign(day=(dates - dates.min()).dt.days + 1)
+
+
+def _totals(aggregates):
+    """Period-wide figures of one dataset, from its chauffeur or daily table."""
+    base = aggregates.get('chauffeurs')
+    if base is None:
+        base = aggregates.get('daily')
+    if base is None:
+        return None
+    rides = float(base['rides'].sum())
+    revenue = float(base['revenue'].sum())
+    totals = {
+        'rides': rides,
+        'revenue': revenue,
+        'avg_price': revenue / rides if rides else np.nan,
+    }
+    if 'chauffeurs' in aggregates:
+        totals['chauffeurs'] = float(len(aggregates['chauffeurs']))
+    daily = aggregates.get('daily')
+    if daily is not None and len(daily):
+        totals['active_days'] = float(len(daily))
+        totals['revenue_per_day'] = revenue / len(daily)
+    return totals
+
+
+def period_label(aggregates, fallback):
+    """First and last ride date of a dataset (e.g. '2024-01-01 to 2024-01-31'), else the fallback."""
+    daily = aggregates.get('daily')
+    if daily is None or daily.empty:
+        return fallback
+    return f"{daily['date'].min()} to {daily['date'].max()}"
+
+
+@lru_cache(maxsize=32)
+def _compare(before_name, after_name):
+    """
+    Compare the aggregate artifacts of two uploads.
+
+    Only the small tables stored at ingest are read, never the raw CSVs, and
+    the result is memoized per pair of artifacts.
+    """
+    before = load_aggregates_file(before_name)
+    after = load_aggregates_file(after_name)
+    tables = {}
+
+    before_totals, after_totals = _totals(before), _totals(after)
+    if before_totals is not None and after_totals is not None:
+        metrics = [metric for metric in before_totals if metric in after_totals]
+        totals = pd.DataFrame({
+            'metric': metrics,
+            'before': [before_totals[metric] for metric in metrics],
+            'after': [after_totals[metric] for metric in metrics],
+        })
+        totals['delta'] = totals['after'] - totals['before']
+        totals['growth'] = totals['delta'] / totals['before'].where(totals['before'] != 0) * 100
+        tables['totals'] = totals
+
+    if 'chauffeurs' in before and 'chauffeurs' in after:
+        chauffeurs = compare_tables(before['chauffeurs'], after['chauffeurs'], ['chauffeur'], ['rides', 'revenue', 'avg_price'])
+        tables['chauffeurs'] = chauffeurs.sort_values('revenue_delta', ascending=False, kind='stable').reset_index(drop=True)
+
+    if 'routes' in before and 'routes' in after:
+        routes = compare_tables(before['routes'], after['routes'], ['pickup', 'dropoff'], ['rides', 'revenue', 'avg_price'])
+        tables['routes'] = routes.sort_values('rides_delta', ascending=False, kind='stable').reset_index(drop=True)
+
+    if 'weekday' in before and 'weekday' in after:
+        weekday = compare_tables(before['weekday'], after['weekday'], ['day'], ['rides', 'revenue'])
+        # The outer merge sorts the keys; put the days back in calendar order
+        order = weekday['day'].map({day: position for position, day in enumerate(WEEKDAYS)})
+        tables['weekday'] = weekday.iloc[order.argsort(kind='stable')].reset_index(drop=True)
+
+    if 'daily' in before and 'daily' in after and len(before['daily']) and len(after['daily']):
+        daily = compare_tables(
+            _aligned_daily(before['daily']), _aligned_daily(after['daily']), ['day'], ['rides', 'revenue'],
+        )
+        # Dates each period day falls on, for reference
+        dates_before = _aligned_daily(before['daily']).set_index('day')['date']
+        dates_after = _aligned_daily(after['daily']).set_index('day')['date']
+        daily.insert(1, 'date_before', daily['day'].map(dates_before))
+        daily.insert(2, 'date_after', daily['day'].map(dates_after))
+        tables['daily'] = daily.sort_values('day', kind='stable').reset_index(drop=True)
+
+    return tables
+
+
+def compare(before_file, after_file):
+    """
+    Period-over-period comparison of two processed uploads.
+
+    Tables (only those both uploads have aggregates for):
+    - totals: rides, revenue, average price, chauffeurs and active days of each period
+    - chauffeurs: per chauffeur, most improved revenue first; 'new' and 'gone' mark
+      chauffeurs who only appear in one period
+    - routes: per pickup -> dropoff route, biggest growth in rides first. Only the
+      busiest routes of each upload are stored, so 'new'/'gone' may also mean a
+      route fell outside the other period's top routes
+    - weekday: per day of week
+    - daily: day 1, 2, ... of each period side by side
+
+    Args:
+        before_file (UploadedCSV): The earlier period
+        after_file (UploadedCSV): The later period
+
+    Returns:
+        dict: Table name -> DataFrame. Callers must not modify the DataFrames.
+    """
+    if not before_file.aggregates or not after_file.aggregates:
+        return {}
+    return _compare(before_file.aggregates.name, after_file.aggregates.name)
+
+
+def comparison_records(tables, names, limit):
+    """
+    Comparison tables as JSON-safe dicts (NaN becomes None), for the API.
+
+    Args:
+        tables (dict): The result of compare
+        names (list): Tables to include, in COMPARISON_TABLES order
+        limit (int): Rows per table
+
+    Returns:
+        dict: Table name -> {'count': rows in the table, 'results': the first limit rows}
+    """
+    result = {}
+    for name in names:
+        if name in tables:
+            rows = tables[name].head(limit).round(2)
+            result[name] = {
+                'count': len(tables[name]),
+                'results': rows.astype(object).where(rows.notna(), None).to_dict(orient='records'),
+            }
+    return result
+
+
+def _file_label(csv_file):
+    return os.path.basename(csv_file.raw_csv.name)
+
+
+def _append_table(summary, title, df, **kwargs):
+    """Add a PromptTable to the summary unless it has no rows."""
+    if len(df):
+        summary.append(PromptTable(title, df, include_index=False, **kwargs))
+
+
+def comparison_summary(before_file, after_file, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Text describing how the later upload changed against the earlier one, for the chatbot.
+
+    Args:
+        before_file (UploadedCSV): The earlier period
+        after_file (UploadedCSV): The later period
+        token_budget (int): Maximum number of prompt tokens the text may use
+
+    Returns:
+        str: The rendered summary ('' if the uploads have nothing to compare)
+    """
+    tables = compare(before_file, after_file)
+    if not tables:
+        return ''
+    before_label = period_label(load_aggregates_file(before_file.aggregates.name), _file_label(before_file))
+    after_label = period_label(load_aggregates_file(after_file.aggregates.name), _file_label(after_file))
+
+    summary = [
+        "Period-over-Period Comparison:",
+        f"'before' is {_file_label(before_file)} ({before_label}); 'after' is {_file_label(after_file)} ({after_label}).",
+        "delta = after - before; growth = percent change from before (blank when before is 0).",
+    ]
+
+    if 'totals' in tables:
+        _append_table(summary, "\nTotals", tables['totals'])
+
+    chauffeurs = tables.get('chauffeurs')
+    if chauffeurs is not None:
+        columns = ['chauffeur', 'rides_before', 'rides_after', 'revenue_before', 'revenue_after',
+                   'revenue_delta', 'revenue_growth', 'avg_price_before', 'avg_price_after']
+        both = chauffeurs[chauffeurs['status'] == 'both']
+        _append_table(
+            summary,
+            "\nMost Improved Chauffeurs (by revenue change, $)",
+            both[both['revenue_delta'] > 0].head(SUMMARY_ROWS)[columns],
+            droppable=True,
+        )
+        _append_table(
+            summary,
+            "\nBiggest Revenue Declines ($)",
+            both[both['revenue_delta'] < 0].sort_values('revenue_delta', kind='stable').head(SUMMARY_ROWS)[columns],
+            droppable=True,
+        )
+        for status, text in (('new', 'New chauffeurs (only after)'), ('gone', 'Chauffeurs no longer present (only before)')):
+            names = chauffeurs.loc[chauffeurs['status'] == status, 'chauffeur']
+            if len(names):
+                shown = ', '.join(map(str, names.head(SUMMARY_ROWS * 2)))
+                more = f" and {len(names) - SUMMARY_ROWS * 2} more" if len(names) > SUMMARY_ROWS * 2 else ''
+                summary.append(f"\n{text}: {len(names)}: {shown}{more}")
+
+    if 'weekday' in tables:
+        _append_table(
+            summary,
+            "\nRides and Revenue by Day of Week",
+            tables['weekday'][['day', 'rides_before', 'rides_after', 'rides_growth',
+                               'revenue_before', 'revenue_after', 'revenue_growth']],
+        )
+
+    routes = tables.get('routes')
+    if routes is not None:
+        routes = routes[routes['status'] == 'both']
+        columns = ['pickup', 'dropoff', 'rides_before', 'rides_after', 'rides_delta', 'revenue_delta']
+        _append_table(
+            summary,
+            "\nFastest Growing Routes (busiest routes of both periods)",
+            routes[routes['rides_delta'] > 0].head(SUMMARY_ROWS)[columns],
+            droppable=True,
+        )
+        _append_table(
+            summary,
+            "\nShrinking Routes",
+            routes[routes['rides_delta'] < 0].sort_values('rides_delta', kind='stable').head(SUMMARY_ROWS)[columns],
+            droppable=True,
+        )
+
+    return CompactPromptRenderer(token_budget).render(summary)
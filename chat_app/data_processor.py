@@ -3,85 +3,199 @@
 import pandas as pd
 import os
 from datetime import datetime
+from django.conf import settings
 from .Chatbot import Chatbot
+from .prompt_encoding import CompactPromptRenderer, PromptTable, DEFAULT_TOKEN_BUDGET
+from .aggregates import build_aggregates
+from .profiling import GeneralProfiler, read_sample, infer_roles, apply_roles, SAMPLE_ROWS
+from .sampling import SampleEstimator, leading_bytes, reservoir_sample, PREVIEW_SAMPLE_ROWS
+from .anomalies import SCORE_THRESHOLD
+from .readers import read_table, sniff_format
+from .validation import validate
+from .answers import precompute_answers
+from .tracing import traced, span
+
+# Analysis modes: 'chauffeur' assumes the booking schema, 'general' profiles any CSV,
+# 'auto' standardizes the columns and falls back to 'general' if they don't fit the booking schema
+MODES = ('auto', 'chauffeur', 'general')
 
 class DataSummarizer:
-    def __init__(self, csv_path):
+    def __init__(self, csv_path, token_budget=DEFAULT_TOKEN_BUDGET, mode='auto', column_names=None):
         """
-        Initialize the DataSummarizer with a path to the CSV file.
+        Initialize the DataSummarizer with the CSV file to analyze.
         
         Args:
-            csv_path (str): Path to the CSV file to analyze
+            csv_path (str or file): Path to the CSV or Excel file, or a binary file handle
+                opened through the storage API
+            token_budget (int): Maximum number of prompt tokens the written summary may use
+            mode (str): One of MODES; after generate_summary it holds the mode actually used
+            column_names (list, optional): Standardized column names from an earlier pass
+                over the same file (see generate_preview); skips the LLM standardization
         """
-        # Convert the provided path to an absolute path
-        self.csv_path = os.path.abspath(csv_path)
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        self.mode = mode
+        self.column_names = column_names
+        # Column roles of the general profile (numeric, monetary, datetime, ...)
+        self.roles = None
+        if isinstance(csv_path, (str, os.PathLike)):
+            # Convert the provided path to an absolute path
+            self.csv_path = os.path.abspath(csv_path)
+            self.csv_file = None
+        else:
+            self.csv_path = getattr(csv_path, 'name', 'uploaded file')
+            self.csv_file = csv_path
         self.df = None
+        # CSV encoding and delimiter, or Excel; sniffed from the first block on first read
+        self.table_format = None
+        # Data-quality check results (validation.ValidationResult), set by validate_data
+        self.validation = None
+        # Small aggregate tables (per chauffeur, per day, ...) that charts and APIs reuse
+        self.aggregates = {}
+        # Summary items are text lines or PromptTable blocks, rendered in generate_summary
         self.summary = []
+        self.renderer = CompactPromptRenderer(token_budget)
         
         # Print the path information for debugging
         print(f"CSV path set to: {self.csv_path}")
         print(f"Current working directory: {os.getcwd()}")
     
+    def sniff(self):
+        """Detect the file's format (see readers.sniff_format) once, on first use."""
+        if self.table_format is None:
+            self.table_format = sniff_format(self.csv_file if self.csv_file is not None else self.csv_path)
+            print(f"Reading {self.csv_path} as {self.table_format}")
+        return self.table_format
+
+    @traced()
     def load_data(self):
-        """Load the CSV file into a pandas DataFrame."""
+        """Load the CSV or Excel file into a pandas DataFrame."""
         try:
-            if not os.path.exists(self.csv_path):
+            if self.csv_file is None and not os.path.exists(self.csv_path):
                 raise FileNotFoundError(
                     f"CSV file not found at '{self.csv_path}'. "
                     f"Current working directory is '{os.getcwd()}'"
                 )
             
-            self.df = pd.read_csv(self.csv_path)
+            self.df = read_table(self.csv_file if self.csv_file is not None else self.csv_path, self.sniff())
             
-            column_names = self.df.columns.tolist()
-            Standardizer = Chatbot()
-            prompt = f"""You are a data standardization assistant that maps CSV column names to standardized versions for a luxury chauffeur service booking system while strictly maintaining the original order.
-                        Input columns: {column_names}
-                        Rules for standardization:
-                        - The output list MUST maintain the exact same order as the input list
-                        - Each output element corresponds to the input element at the same position
-                        - Only use these exact standardized names:
-                        "Booking" - for booking/reservation/confirmation numbers
-                        "PAX" - for passenger/client/customer names
-                        "Chauffer" - for driver/chauffer/operator names
-                        "Pickup" - for pickup location/origin/start point
-                        "Dropoff" - for dropoff/destination/end point
-                        "Price" - for cost/fare/amount/price/rate
-                        "Date" - for date/time/schedule information
-                        "Notes" - for comments/remarks/special instructions/additional information
-                        - If a column doesn't match any of these categories, keep it unchanged
-                        - Return ONLY a Python list containing the standardized column names
-                        - The list must be properly formatted with square brackets and quoted strings
-                        - Do not include ANY explanatory text, just the Python list
-                        - If there are more columns given to you than the standardized names, pick the ones most likely to fir the standardized names.
-                        - Do not add new columns and do not reduce columns.
-                        Example:
-                        Input:  ["confirmation_number", "customer_name", "driver_name", "origin_address", "destination_address", "trip_fare", "pickup_time", "special_requests"]
-                        Output: ["Booking", "PAX", "Chauffer", "Pickup", "Dropoff", "Price", "Date", "Notes"]
-
-                        Standardize these columns:{column_names}"""
+            self.summary.append(f"Successfully loaded data from: {self.csv_path}")
+            self.summary.append(f"Dataset contains {len(self.df)} total bookings/rides/calls.")
+            self.standardize_columns()
+        except Exception as e:
+            self.summary.append(f"Error loading data: {str(e)}")
+            raise
 
-            try:
-                standardized_columns = Standardizer.generate_response(prompt)
-                # You'll need to parse this string response into a list
-                standardized_columns = self.parse_llm_response(standardized_columns)
-                # Then rename your DataFrame columns
-                self.df.columns = standardized_columns  # Make sure this is a list!
+    @traced()
+    def standardize_columns(self):
+        """Rename the loaded columns to the standardized booking names, asking the LLM for the mapping."""
+        if self.column_names is not None:
+            # Already standardized by an earlier pass over the same file
+            self.df.columns = self.column_names
+            self.summary.append(f"Columns standardized and present: {', '.join(self.df.columns)}\n")
+            return
 
-                
-                # Add to summary after successful standardization
-                self.summary.append(f"Successfully loaded data from: {self.csv_path}")
-                self.summary.append(f"Dataset contains {len(self.df)} total bookings/rides/calls.")
-                self.summary.append(f"Columns standardized and present: {', '.join(self.df.columns)}\n")
+        column_names = self.df.columns.tolist()
+        Standardizer = Chatbot()
+        prompt = f"""You are a data standardization assistant that maps CSV column names to standardized versions for a luxury chauffeur service booking system while strictly maintaining the original order.
+                    Input columns: {column_names}
+                    Rules for standardization:
+                    - The output list MUST maintain the exact same order as the input list
+                    - Each output element corresponds to the input element at the same position
+                    - Only use these exact standardized names:
+                    "Booking" - for booking/reservation/confirmation numbers
+                    "PAX" - for passenger/client/customer names
+                    "Chauffer" - for driver/chauffer/operator names
+                    "Pickup" - for pickup location/origin/start point
+                    "Dropoff" - for dropoff/destination/end point
+                    "Price" - for cost/fare/amount/price/rate
+                    "Date" - for date/time/schedule information
+                    "Notes" - for comments/remarks/special instructions/additional information
+                    - If a column doesn't match any of these categories, keep it unchanged
+                    - Return ONLY a Python list containing the standardized column names
+                    - The list must be properly formatted with square brackets and quoted strings
+                    - Do not include ANY explanatory text, just the Python list
+                    - If there are more columns given to you than the standardized names, pick the ones most likely to fir the standardized names.
+                    - Do not add new columns and do not reduce columns.
+                    Example:
+                    Input:  ["confirmation_number", "customer_name", "driver_name", "origin_address", "destination_address", "trip_fare", "pickup_time", "special_requests"]
+                    Output: ["Booking", "PAX", "Chauffer", "Pickup", "Dropoff", "Price", "Date", "Notes"]
 
-            except Exception as e:
-                print(f"Column standardization failed: {e}")
-                # Continue with original column names
-                self.summary.append("Column standardization failed - using original column names")
+                    Standardize these columns:{column_names}"""
+
+        try:
+            standardized_columns = Standardizer.generate_response(prompt)
+            # You'll need to parse this string response into a list
+            standardized_columns = self.parse_llm_response(standardized_columns)
+            # Then rename your DataFrame columns
+            self.df.columns = standardized_columns  # Make sure this is a list!
+
+            # Add to summary after successful standardization
+            self.summary.append(f"Columns standardized and present: {', '.join(self.df.columns)}\n")
+
+        except Exception as e:
+            print(f"Column standardization failed: {e}")
+            # Continue with original column names
+            self.summary.append("Column standardization failed - using original column names")
+        self.column_names = self.df.columns.tolist()
+
+    @traced()
+    def load_general_data(self):
+        """
+        Load a CSV of unknown schema. Column roles are inferred from a bounded
+        sample, and the full file is then read with matching dtypes, skipping
+        columns that are empty in the sample.
+        """
+        source = self.csv_file if self.csv_file is not None else self.csv_path
+        # Columns standardized by an earlier pass keep their names
+        names = self.column_names
+        header = {'header': 0, 'names': names} if names and len(set(names)) == len(names) else {}
+        try:
+            sample = read_sample(source, table_format=self.sniff(), **header)
+            self.roles = infer_roles(sample)
+            usecols = [col for col, role in self.roles.items() if role != 'empty']
+            dtypes = {
+                col: 'category' if role == 'categorical' else str
+                for col, role in self.roles.items() if role != 'empty'
+            }
+            raw = read_table(source, self.table_format, usecols=usecols, dtype=dtypes, **header)
+            self.df = apply_roles(raw, self.roles)
+
+            self.summary.append(f"Successfully loaded data from: {self.csv_path}")
+            self.summary.append(f"Dataset contains {len(self.df)} rows.")
         except Exception as e:
             self.summary.append(f"Error loading data: {str(e)}")
             raise
 
+    @traced()
+    def load(self):
+        """
+        Load the data for the requested mode, resolving 'auto' to the mode that fits the columns.
+        General data is converted to the types of its inferred column roles.
+        """
+        if self.mode == 'general':
+            self.load_general_data()
+            return
+        self.load_data()
+        if self.mode == 'auto':
+            self.mode = 'chauffeur' if self.is_chauffeur_schema() else 'general'
+            if self.mode == 'general':
+                self.summary.append("Columns do not match the chauffeur booking schema - using the general CSV profile.")
+        if self.mode == 'general':
+            # Loaded for the chauffeur schema; infer roles from a bounded sample of it
+            self.roles = infer_roles(self.df.head(SAMPLE_ROWS))
+            self.df = apply_roles(self.df, self.roles)
+
+    def is_chauffeur_schema(self):
+        """Whether the standardized columns look like chauffeur bookings."""
+        columns = set(self.df.columns)
+        return 'Price' in columns and bool(columns & {'Chauffer', 'Pickup', 'Dropoff'})
+
+    @traced()
+    def profile_general(self):
+        """Add the schema-agnostic profile of the loaded data (see load) to the summary."""
+        self.summary.extend(GeneralProfiler(self.df, self.roles).profile())
+
     def parse_llm_response(self,response_string):
             """
             Parse the LLM's response string into a Python list of column names.
@@ -125,6 +239,7 @@ class DataSummarizer:
             except Exception as e:
                 raise ValueError(f"Failed to parse LLM response: {str(e)}")
             
+    @traced()
     def generate_basic_stats(self):
         """
         Generate basic statistical summaries for the Price column.
@@ -164,6 +279,7 @@ class DataSummarizer:
         self.summary.append(f"\nPrice Distribution:")
         self.summary.append(f"{percentage_above:.1f}% of items are above the average price")
         
+    @traced()
     def analyze_chauffer_earnings(self):
         """
         Analyze earnings per chauffer, calculating both average and total earnings.
@@ -203,14 +319,8 @@ class DataSummarizer:
             self.summary.append(f"Total Company Earnings: ${total_company_earnings:,.2f}")
             self.summary.append(f"Average Earnings per Chauffer: ${average_chauffer_earnings:,.2f}")
             
-            # Add individual chauffer statistics
-            self.summary.append(f"\nIndividual Chauffer Performance:")
-            for chauffer in chauffer_stats.index:
-                stats = chauffer_stats.loc[chauffer]
-                self.summary.append(f"\nChauffer: {chauffer}")
-                self.summary.append(f"Total Bookings: {stats['Total_Bookings']}")
-                self.summary.append(f"Average Earning per Booking: ${stats['Average_Earning']:,.2f}")
-                self.summary.append(f"Total Earnings: ${stats['Total_Earning']:,.2f}")
+            # Add individual chauffer statistics as one table (amounts in $)
+            self.summary.append(PromptTable("\nIndividual Chauffer Performance ($)", chauffer_stats))
 
             # Add performance insights
             top_earner = chauffer_stats.index[0]
@@ -226,6 +336,7 @@ class DataSummarizer:
         except Exception as e:
             self.summary.append(f"\nError analyzing chauffer earnings: {str(e)}")
    
+    @traced()
     def analyze_categories(self):
         """Analyze categorical columns and their distributions."""
         if self.df is None:
@@ -234,19 +345,158 @@ class DataSummarizer:
             return  # Exit the function early
         
         categorical_cols = self.df.select_dtypes(include=['object', 'category']).columns
+        if 'routes' in self.aggregates:
+            # Covered by analyze_locations, with spellings merged. An all-empty
+            # location column is read as floats and is not among the categoricals.
+            categorical_cols = categorical_cols.drop(['Pickup', 'Dropoff'], errors='ignore')
         
         for col in categorical_cols:
             value_counts = self.df[col].value_counts()
             total_count = len(self.df)
             
-            self.summary.append(f"\nDistribution for {col}:")
-            for value, count in value_counts.head(6).items():
-                percentage = (count / total_count) * 100
-                self.summary.append(f"{value}: {count} ({percentage:.1f}%)")
+            top_values = value_counts.head(6).to_frame('Count')
+            top_values['Percentage'] = (top_values['Count'] / total_count * 100).round(1)
+            self.summary.append(PromptTable(f"\nDistribution for {col}", top_values, digits=1))
             
-            if len(value_counts) > 5:
+            if len(value_counts) > 6:
                 self.summary.append(f"... and {len(value_counts) - 6} more unique values")
     
+    @traced()
+    def compute_aggregates(self):
+        """Build the aggregate tables that charts and APIs are served from."""
+        if self.df is None:
+            print("Debug: Data not loaded yet. Please call load_data() first.")
+            return
+        try:
+            self.aggregates = build_aggregates(self.df)
+        except Exception as e:
+            print(f"Error computing aggregates: {e}")
+            self.aggregates = {}
+        if self.validation is not None and not self.validation.issues.empty:
+            self.aggregates['issues'] = self.validation.issues
+        if settings.PRECOMPUTED_ANSWERS:
+            # Exact answers to the common questions, so chat can skip the LLM for them
+            answers = precompute_answers(self.aggregates)
+            if not answers.empty:
+                self.aggregates['answers'] = answers
+
+    @traced()
+    def validate_data(self):
+        """
+        Check every row against the data-quality rules (validation.py) and report the issues.
+
+        With settings.VALIDATION_EXCLUDE_INVALID, rows that fail a rule marked
+        excludable (duplicate bookings, prices <= 0, ...) are dropped here, before
+        any figures or aggregates are computed.
+        """
+        if self.df is None:
+            print("Debug: Data not loaded yet. Please call load_data() first.")
+            return
+        self.validation = validate(self.df)
+        if self.mode != 'general' and 'Price' in self.df.columns and not pd.api.types.is_numeric_dtype(self.df['Price']):
+            # Unreadable prices are reported as invalid_price; the figures treat them as missing
+            self.df['Price'] = pd.to_numeric(self.df['Price'], errors='coerce')
+        issues = self.validation.issues
+        if issues.empty:
+            return
+        self.aggregates['issues'] = issues
+
+        flagged = int(self.validation.invalid.sum())
+        excluded = int(self.validation.excluded.sum())
+        self.summary.append("\nData Quality Issues:")
+        self.summary.append(
+            f"{flagged} rows ({flagged / len(self.df) * 100:.2f}%) fail at least one check "
+            f"(examples are booking numbers, or line numbers without them)."
+        )
+        self.summary.append(PromptTable("Issues by Rule", issues.drop(columns="excludable"), digits=4, include_index=False))
+        if excluded and settings.VALIDATION_EXCLUDE_INVALID:
+            self.df = self.df[~self.validation.excluded].reset_index(drop=True)
+            self.summary.append(f"{excluded} rows with excludable issues are left out of all figures below.")
+        elif excluded:
+            self.summary.append(f"All rows are included in the figures below, including {excluded} with excludable issues.")
+
+    @traced()
+    def analyze_extreme_rides(self):
+        """List the most and least earned ride of every chauffer."""
+        rides = self.aggregates.get('extreme_rides')
+        if rides is None or rides.empty:
+            return
+        extremes = rides[rides['rank'] == 1].drop(columns=['rank']).sort_values(['chauffeur', 'kind'], ascending=[True, False])
+        self.summary.append(PromptTable(
+            "\nMost (top) and Least (bottom) Earned Ride per Chauffer",
+            extremes,
+            include_index=False,
+        ))
+
+    @traced()
+    def analyze_busiest_days(self):
+        """Rank the days of the week from busiest to least busy."""
+        weekday = self.aggregates.get('weekday')
+        if weekday is None:
+            return
+        ranked = weekday.sort_values('rides', ascending=False).set_index('day')
+        self.summary.append(PromptTable("\nRides by Day of Week, busiest first ($)", ranked))
+
+    @traced()
+    def analyze_locations(self):
+        """Busiest routes and locations, and traffic between airports and hotels, from normalized addresses."""
+        routes = self.aggregates.get('routes')
+        if routes is None or routes.empty:
+            return
+        locations = self.aggregates['locations']
+        flows = self.aggregates['location_flows']
+
+        self.summary.append("\nLocation Analysis:")
+        self.summary.append(
+            f"Addresses are normalized (case, abbreviations, airport terminals), so "
+            f"{int(locations['spellings'].sum())} raw spellings count as the {len(locations)} busiest locations."
+        )
+        self.summary.append(PromptTable(
+            "Busiest Locations",
+            locations.drop(columns='pickup_revenue').head(10),
+            include_index=False,
+        ))
+        self.summary.append(PromptTable(
+            "\nBusiest Routes ($)",
+            routes.head(15),
+            droppable=True,
+            include_index=False,
+        ))
+        by_revenue = routes.sort_values('revenue', ascending=False).head(5)
+        self.summary.append(PromptTable("\nHighest Revenue Routes ($)", by_revenue, include_index=False))
+        self.summary.append(PromptTable(
+            "\nRides between Airports, Hotels and Other Places ($)",
+            flows,
+            include_index=False,
+        ))
+
+    @traced()
+    def analyze_anomalies(self):
+        """Rides priced far from their chauffeur's or route's usual price (robust z-score)."""
+        anomalies = self.aggregates.get('anomalies')
+        if anomalies is None or anomalies.empty:
+            return
+        counts = self.aggregates['anomaly_counts']
+        flagged = int(counts['flagged'].sum())
+
+        self.summary.append("\nPrice Anomalies:")
+        self.summary.append(
+            f"{flagged} rides ({flagged / len(self.df) * 100:.2f}%) are priced far from the median of the same "
+            f"chauffeur or route (|score| >= {SCORE_THRESHOLD}; 'expected' is that median, 'basis' says which)."
+        )
+        self.summary.append(PromptTable(
+            "Most Unusual Prices ($)",
+            anomalies.head(10),
+            droppable=True,
+            include_index=False,
+        ))
+        self.summary.append(PromptTable(
+            "\nUnusually Priced Rides per Chauffeur",
+            counts.head(10),
+            include_index=False,
+        ))
+
+    @traced()
     def check_missing_values(self):
         """Analyze missing values in the dataset."""
         if self.df is None:
@@ -259,6 +509,7 @@ class DataSummarizer:
             for col, count in missing[missing > 0].items():
                 percentage = (count / len(self.df)) * 100
                 self.summary.append(f"{col}: {count} missing values ({percentage:.1f}%)")
+    @traced()
     def analyze_notes(self):
         """Analyze the each ride that contained notes"""
         if self.df is None:
@@ -282,24 +533,29 @@ class DataSummarizer:
         self.summary.append(f"Total rides with notes: {len(notes_df)}")
         self.summary.append(f"Percentage of rides with notes: {(len(notes_df) / len(self.df)) * 100:.1f}%\n")
 
-        # Analyze each ride with notes
-        for idx, row in notes_df.iterrows():
-            self.summary.append(f"\nRide Details ({idx + 1}):")
-            # Add all available information for the ride
-            for column in self.df.columns:
-                if pd.notna(row[column]) and str(row[column]).strip():
-                    self.summary.append(f"{column}: {row[column]}")
+        # List every ride with notes in one table, skipping columns that are empty for all of them.
+        # This is the largest block of the summary, so rows are cut first when over the token budget.
+        notes_df = notes_df.dropna(axis=1, how='all')
+        self.summary.append(PromptTable(
+            "Ride Details",
+            notes_df,
+            droppable=True,
+            record_label="Ride Details",
+            include_index=False,
+        ))
 
-            # Add a separator between rides
-            self.summary.append("-" * 50)
-        
-        
-    def generate_summary(self, output_file):
+
+    @traced()
+    def generate_summary(self, output_file=None):
         """
-        Generate a complete summary of the dataset and save it to a file.
+        Generate a complete summary of the dataset.
         
         Args:
-            output_file (str): Full path where the summary should be saved
+            output_file (str, optional): Local path to also write the summary to.
+                The web app saves the returned text through the storage API instead.
+
+        Returns:
+            str: The rendered summary text
         """
         try:
             # Clear any existing summary
@@ -310,22 +566,105 @@ class DataSummarizer:
             self.summary.append(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
             
             # Perform all analyses
-            self.load_data()
-            self.check_missing_values()
-            self.generate_basic_stats()
-            self.analyze_chauffer_earnings()
-            self.analyze_categories()
-            self.analyze_notes()
-            
-            # Create directory if it doesn't exist
-            os.makedirs(os.path.dirname(output_file), exist_ok=True)
-            
-            # Write summary to file using the provided path
-            with open(output_file, 'w') as f:
-                f.write('\n'.join(self.summary))
+            self.load()
+
+            if self.mode == 'general':
+                self.validate_data()
+                self.check_missing_values()
+                self.profile_general()
+            else:
+                self.validate_data()
+                self.compute_aggregates()
+                self.check_missing_values()
+                self.generate_basic_stats()
+                self.analyze_chauffer_earnings()
+                self.analyze_extreme_rides()
+                self.analyze_busiest_days()
+                self.analyze_locations()
+                self.analyze_anomalies()
+                self.analyze_categories()
+                self.analyze_notes()
             
-            print(f"Summary successfully written to {output_file}")
+            # Render the tables compactly so the summary fits in the prompt token budget
+            with span('DataSummarizer.render') as render_span:
+                summary_text = self.renderer.render(self.summary)
+            report = self.renderer.report
+            if render_span is not None:
+                render_span.set(tokens_before=report['tokens_before'], tokens_after=report['tokens_after'])
+            print(
+                f"Summary prompt tokens: {report['tokens_before']} (prose) -> "
+                f"{report['tokens_after']} (compact), budget {report['token_budget']}"
+            )
+
+            if output_file:
+                # Create directory if it doesn't exist
+                os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+                
+                # Write summary to file using the provided path
+                with open(output_file, 'w') as f:
+                    f.write(summary_text)
+                
+                print(f"Summary successfully written to {output_file}")
+
+            return summary_text
             
         except Exception as e:
             print(f"Error generating summary: {str(e)}")
             raise
+
+    @traced()
+    def generate_preview(self, sample_rows=PREVIEW_SAMPLE_ROWS, max_bytes=None):
+        """
+        Generate an approximate summary from a uniform reservoir sample of the rows.
+
+        One streaming pass over at most max_bytes of a CSV file collects the
+        sample; every figure in the preview is an estimate for the whole file
+        with a 95% confidence margin. The standardized columns and resolved mode
+        are kept in column_names and mode, so the exact summary of the same file
+        can reuse them without another LLM call.
+
+        Args:
+            sample_rows (int): Number of rows in the sample
+            max_bytes (int, optional): Most bytes of a CSV file read, PREVIEW_MAX_BYTES by default
+
+        Returns:
+            str: The rendered approximate summary
+        """
+        source = self.csv_file if self.csv_file is not None else self.csv_path
+        try:
+            self.summary = []
+            scanned_share = 1.0
+            if not self.sniff().is_excel:
+                source, scanned_share = leading_bytes(source, max_bytes or settings.PREVIEW_MAX_BYTES)
+            if self.mode == 'general':
+                sample, total_rows = reservoir_sample(source, sample_rows, table_format=self.sniff(), dtype=str)
+                self.roles = infer_roles(sample.head(SAMPLE_ROWS))
+                self.df = apply_roles(sample, self.roles)
+            else:
+                sample, total_rows = reservoir_sample(source, sample_rows, table_format=self.sniff())
+                self.df = sample
+                self.standardize_columns()
+                if self.mode == 'auto':
+                    self.mode = 'chauffeur' if self.is_chauffeur_schema() else 'general'
+                if self.mode == 'general':
+                    self.roles = infer_roles(self.df.head(SAMPLE_ROWS))
+                    self.df = apply_roles(self.df, self.roles)
+
+            # Scale the rows seen in the leading bytes up to the whole file
+            total_rows = round(total_rows / scanned_share)
+            estimator = SampleEstimator(self.df, total_rows, self.roles, scanned_share)
+            items = estimator.estimate(general=self.mode == 'general')
+            # Keep the column line from standardization after the preview header
+            self.summary = items[:2] + self.summary + items[2:]
+
+            with span('DataSummarizer.render'):
+                summary_text = self.renderer.render(self.summary)
+            print(
+                f"Preview summary from {len(self.df)} of {total_rows} rows: "
+                f"{self.renderer.report['tokens_after']} tokens"
+            )
+            return summary_text
+
+        except Exception as e:
+            print(f"Error generating preview: {str(e)}")
+            raise
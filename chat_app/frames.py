@@ -0,0 +1,218 @@
+# frames.py
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+from django.conf import settings
+
+from .aggregates import parse_dates
+from .storage import evict_lru, open_artifact
+from .tracing import traced
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # Without pyarrow, frames are only cached inside each process
+    pa = None
+
+# Chauffeur columns with few distinct values, stored as categories
+CATEGORY_COLUMNS = ['Chauffer', 'Pickup', 'Dropoff']
+
+
+def prepare_frame(df, mode):
+    """
+    Give a loaded DataFrame compact, analysis-ready types before it is cached.
+    General frames are already typed by profiling.apply_roles.
+    """
+    if mode == 'general':
+        return df
+    typed = {}
+    for col in df.columns:
+        if col == 'Price':
+            typed[col] = pd.to_numeric(df[col], errors='coerce')
+        elif col == 'Date':
+            typed[col] = parse_dates(df[col])
+        elif col in CATEGORY_COLUMNS:
+            typed[col] = df[col].astype('category')
+        else:
+            typed[col] = df[col]
+    return pd.DataFrame(typed, index=df.index)
+
+
+def _to_arrow(df):
+    """Arrow table of a DataFrame; object columns with mixed values are stored as strings."""
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        df = df.copy()
+        for col in df.columns[df.dtypes == object]:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+class FrameCache:
+    """
+    Memory-bounded LRU cache of typed DataFrames, shared by the worker processes of a machine.
+
+    Frames are written once as Arrow IPC files to a local directory and read back
+    memory-mapped, with columns wrapped as pd.ArrowDtype without copying. Every
+    gunicorn worker that maps the same file shares its pages through the OS page
+    cache, so a dataset is held in RAM once per machine rather than once per
+    worker. Each process also keeps an LRU of the frames it has mapped, bounded
+    by memory_max_bytes; the directory itself is bounded by max_bytes.
+
+    Without pyarrow, frames are kept in the per-process LRU only.
+    """
+
+    def __init__(self, directory, max_bytes, memory_max_bytes):
+        """
+        Args:
+            directory (str): Local directory holding the Arrow files
+            max_bytes (int): Total size of the Arrow files before the oldest are evicted
+            memory_max_bytes (int): Total size of the frames each process keeps referenced
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_max_bytes = memory_max_bytes
+        self._frames = OrderedDict()  # key -> (DataFrame, size in bytes)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        """Whether frames are shared between processes through Arrow files."""
+        return pa is not None
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.arrow')
+
+    def _remember(self, key, frame, nbytes):
+        """Keep a frame in this process, evicting least recently used frames beyond the budget."""
+        with self._lock:
+            if key in self._frames:
+                self._memory_bytes -= self._frames.pop(key)[1]
+            if nbytes > self.memory_max_bytes:
+                return
+            self._frames[key] = (frame, nbytes)
+            self._memory_bytes += nbytes
+            while self._memory_bytes > self.memory_max_bytes:
+                _, (_, size) = self._frames.popitem(last=False)
+                self._memory_bytes -= size
+
+    def _map(self, key):
+        """Memory-map a frame written by any process, or None if there is no file for it."""
+        path = self._path(key)
+        try:
+            source = pa.memory_map(path, 'r')
+        except FileNotFoundError:
+            return None
+        # Touch the file so disk eviction sees it as recently used
+        os.utime(path)
+        table = pa.ipc.open_file(source).read_all()
+        return table.to_pandas(types_mapper=pd.ArrowDtype), table.nbytes
+
+    def get(self, key):
+        """
+        Return the cached frame for key, or None.
+        The frame is shared: callers must not modify it.
+        """
+        with self._lock:
+            if key in self._frames:
+                self._frames.move_to_end(key)
+                return self._frames[key][0]
+        if not self.shared:
+            return None
+        mapped = self._map(key)
+        if mapped is None:
+            return None
+        self._remember(key, *mapped)
+        return mapped[0]
+
+    def put(self, key, df):
+        """
+        Cache a frame and return the shared copy callers should use from now on.
+        """
+        if self.shared:
+            try:
+                table = _to_arrow(df)
+                os.makedirs(self.directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'wb') as out:
+                        with pa.ipc.new_file(out, table.schema) as writer:
+                            writer.write_table(table)
+                    # Atomic, so other workers never map a half-written file
+                    os.replace(tmp_path, self._path(key))
+                except Exception:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+                evict_lru(self.directory, self.max_bytes)
+                mapped = self._map(key)
+                if mapped is not None:
+                    self._remember(key, *mapped)
+                    return mapped[0]
+            except Exception as e:
+                print(f"Could not share frame {key}: {e}")
+        self._remember(key, df, int(df.memory_usage(deep=True).sum()))
+        return df
+
+    def discard(self, key):
+        """Forget a frame in this process and remove its shared file."""
+        with self._lock:
+            if key in self._frames:
+                self._memory_bytes -= self._frames.pop(key)[1]
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+frame_cache = FrameCache(
+    settings.FRAME_CACHE_DIR,
+    settings.FRAME_CACHE_MAX_BYTES,
+    settings.FRAME_CACHE_MEMORY_BYTES,
+)
+
+
+def frame_key(csv_file):
+    """Cache key of an upload's frame: its id plus its raw file, which never changes."""
+    digest = hashlib.sha1(csv_file.raw_csv.name.encode('utf-8')).hexdigest()[:12]
+    return f'{csv_file.id}-{digest}'
+
+
+@traced('frames.load_frame')
+def load_frame(csv_file):
+    """
+    The typed DataFrame of an upload, for per-question computations.
+
+    Served from the frame cache; on a miss the raw CSV is loaded the way its
+    summary was made (same mode and standardized columns) and cached. Frames
+    are not stored at ingest, so only uploads that are asked about use the cache.
+    The frame is shared: callers must not modify it.
+
+    Args:
+        csv_file (UploadedCSV): A processed upload
+
+    Returns:
+        DataFrame: The upload's rows
+    """
+    key = frame_key(csv_file)
+    df = frame_cache.get(key)
+    if df is not None:
+        return df
+
+    from .data_processor import DataSummarizer
+    with open_artifact(csv_file.raw_csv.name, csv_file.raw_csv.storage) as raw_file:
+        summarizer = DataSummarizer(raw_file, mode=csv_file.analysis_mode, column_names=csv_file.column_names)
+        summarizer.load()
+    return frame_cache.put(key, prepare_frame(summarizer.df, summarizer.mode))
+
+
+def discard_frame(csv_file):
+    """Drop an upload's frame from the cache (when the upload is deleted)."""
+    frame_cache.discard(frame_key(csv_file))
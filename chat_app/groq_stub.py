@@ -0,0 +1,184 @@
+# groq_stub.py
+
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Words the stub's replies are made of, one token each
+REPLY_WORDS = (
+    'Looking at the summary, Driver 4 completed 45 trips in June averaging $75 per trip '
+    'with most revenue coming from airport transfers and weekend bookings'
+).split()
+
+# Column list in the column standardization prompt (see DataSummarizer.standardize_columns)
+_STANDARDIZE = re.compile(r'Standardize these columns:\s*(\[.*\])', re.S)
+
+# Error bodies by status, shaped like the API's
+ERRORS = {
+    429: ('rate_limit_exceeded', 'Rate limit reached (injected by groq_stub)'),
+    500: ('internal_server_error', 'Internal server error (injected by groq_stub)'),
+    503: ('service_unavailable', 'Service unavailable (injected by groq_stub)'),
+}
+
+
+class StubConfig:
+    """How the stub behaves; shared by all request threads."""
+
+    def __init__(self, latency=0.5, jitter=0.2, tokens_per_second=250, reply_tokens=150,
+                 error_rate=0.0, error_status=429, seed=None):
+        """
+        Args:
+            latency (float): Seconds before the first token
+            jitter (float): Up to this many seconds added to or removed from the latency
+            tokens_per_second (float): Generation speed once the first token is out (0 = instant)
+            reply_tokens (int): Tokens in every reply
+            error_rate (float): Share of requests answered with error_status instead
+            error_status (int): 429, 500 or 503
+            seed (int, optional): Seed for reproducible jitter and errors
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def draw(self):
+        """(injected error status or None, latency) for the next request."""
+        with self._lock:
+            self.requests += 1
+            if self._random.random() < self.error_rate:
+                self.errors += 1
+                return self.error_status, 0.0
+            return None, max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+
+def reply_tokens(messages, count):
+    """
+    Tokens of the reply to a conversation.
+
+    Column standardization prompts get their own column list back, so uploads
+    are processed as if every column already had its standardized name.
+    """
+    match = _STANDARDIZE.search(messages[-1].get('content') or '') if messages else None
+    if match:
+        return [match.group(1)]
+    words = [REPLY_WORDS[i % len(REPLY_WORDS)] for i in range(count)]
+    return [words[0]] + [' ' + word for word in words[1:]]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """OpenAI/Groq-compatible POST .../chat/completions, streamed or not."""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+    config = None  # StubConfig, set by make_server
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self._send_json(400, {'error': {'message': 'Invalid JSON', 'type': 'invalid_request_error'}})
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            return self._send_json(404, {'error': {'message': f'Unknown path {self.path}', 'type': 'not_found'}})
+
+        status, latency = self.config.draw()
+        if status:
+            code, message = ERRORS.get(status, ERRORS[500])
+            return self._send_json(status, {'error': {'message': message, 'type': code, 'code': code}},
+                                   headers={'retry-after': '1'} if status == 429 else None)
+
+        messages = body.get('messages') or []
+        tokens = reply_tokens(messages, self.config.reply_tokens)
+        time.sleep(latency)
+        completion = {
+            'id': f'chatcmpl-{uuid.uuid4().hex}',
+            'created': int(time.time()),
+            'model': body.get('model', 'stub'),
+        }
+        if body.get('stream'):
+            self._stream(completion, tokens)
+        else:
+            time.sleep(self._generation_time(len(tokens)))
+            self._send_json(200, dict(
+                completion,
+                object='chat.completion',
+                choices=[{'index': 0, 'message': {'role': 'assistant', 'content': ''.join(tokens)},
+                          'finish_reason': 'stop'}],
+                usage=self._usage(messages, tokens),
+            ))
+
+    def _generation_time(self, count):
+        rate = self.config.tokens_per_second
+        return count / rate if rate > 0 else 0.0
+
+    def _usage(self, messages, tokens):
+        # Rough count: one token per four characters of prompt
+        prompt = sum(len(message.get('content') or '') for message in messages) // 4
+        return {'prompt_tokens': prompt, 'completion_tokens': len(tokens), 'total_tokens': prompt + len(tokens)}
+
+    def _stream(self, completion, tokens):
+        """Server-sent events, one chunk per token, at the configured token rate."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        delay = self._generation_time(1)
+        chunk = dict(completion, object='chat.completion.chunk')
+        for i, token in enumerate(tokens):
+            delta = {'role': 'assistant', 'content': token} if i == 0 else {'content': token}
+            self._write_event(dict(chunk, choices=[{'index': 0, 'delta': delta, 'finish_reason': None}]))
+            time.sleep(delay)
+        self._write_event(dict(chunk, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]))
+        self._write_chunk(b'data: [DONE]\n\n')
+        self._write_chunk(b'')
+
+    def _write_event(self, data):
+        self._write_chunk(f'data: {json.dumps(data)}\n\n'.encode('utf-8'))
+
+    def _write_chunk(self, data):
+        self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+    def _send_json(self, status, data, headers=None):
+        payload = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # One line per request would swamp the console under load
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping idle keep-alive connections is normal under load
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def make_server(config, host='127.0.0.1', port=8001):
+    """
+    A threaded stub server; call serve_forever() on it.
+
+    Point the app at it with GROQ_BASE_URL=http://<host>:<port>.
+    """
+    handler = type('ConfiguredStubHandler', (StubHandler,), {'config': config})
+    return StubServer((host, port), handler)
@@ -0,0 +1,202 @@
+# ingest.py
+
+import glob
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+
+from .models import UploadedCSV
+
+# Bytes read at a time while hashing
+HASH_READ_SIZE = 1024 * 1024
+
+# Upload rows written per database round trip
+DEFAULT_BATCH_SIZE = 50
+
+
+def find_exports(directory, pattern='*.csv'):
+    """CSV exports in a directory (not recursive), in name order."""
+    paths = glob.glob(os.path.join(directory, pattern))
+    return sorted(path for path in paths if os.path.isfile(path))
+
+
+def hash_file(path):
+    """SHA-256 of a file's contents, as stored in UploadedCSV.content_hash."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_READ_SIZE), b''):
+            digest.update(block)
+    return path, digest.hexdigest()
+
+
+def _init_worker():
+    # Workers may be started fresh (spawn/forkserver) rather than forked
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def summarize_export(path, mode, token_budget):
+    """
+    Summarize one export in a worker process. No database access happens here;
+    the parent stores the results.
+
+    Returns:
+        dict: path, summary, aggregates (JSON text), mode, column_names, rows, bytes, seconds
+    """
+    from .aggregates import dumps
+    from .data_processor import DataSummarizer
+
+    start = time.perf_counter()
+    summarizer = DataSummarizer(path, token_budget=token_budget, mode=mode)
+    summary = summarizer.generate_summary()
+    return {
+        'path': path,
+        'summary': summary,
+        'aggregates': dumps(summarizer.aggregates),
+        'mode': summarizer.mode,
+        'column_names': summarizer.column_names,
+        'rows': len(summarizer.df),
+        'bytes': os.path.getsize(path),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+class ExportIngester:
+    """
+    Ingests a directory of CSV exports for one user.
+
+    Files are hashed and summarized in a pool of worker processes, so large
+    backfills use every core. Files whose contents the user already uploaded
+    (or that appear twice in the directory) are skipped. The parent process
+    stores the artifacts and writes the UploadedCSV rows batch_size at a time:
+    one bulk insert and one bulk update per batch.
+    """
+
+    def __init__(self, user, workers=None, mode='auto', batch_size=DEFAULT_BATCH_SIZE, log=print):
+        """
+        Args:
+            user (CustomUser): Owner of the new uploads
+            workers (int, optional): Worker processes, one per CPU by default
+            mode (str): Analysis mode of every file (see data_processor.MODES)
+            batch_size (int): Upload rows written per database round trip
+            log (callable): Where progress messages go
+        """
+        self.user = user
+        self.workers = workers or os.cpu_count() or 1
+        self.mode = mode
+        self.batch_size = batch_size
+        self.log = log
+        self.results = []
+        self._pending = []
+
+    def dedupe(self, hashes):
+        """
+        Drop files already uploaded by the user and repeated files.
+
+        Args:
+            hashes (dict): Path -> content hash
+
+        Returns:
+            dict: Path -> content hash of the files left to ingest
+        """
+        existing = set(
+            UploadedCSV.objects.filter(user=self.user, content_hash__in=set(hashes.values()))
+            .values_list('content_hash', flat=True)
+        )
+        unique = {}
+        seen = set(existing)
+        for path, content_hash in hashes.items():
+            if content_hash in seen:
+                reason = 'already uploaded' if content_hash in existing else 'duplicate in directory'
+                self.results.append({'path': path, 'status': f'skipped ({reason})'})
+                continue
+            seen.add(content_hash)
+            unique[path] = content_hash
+        return unique
+
+    def _store(self, result, content_hash):
+        """Queue a summarized file; its rows are written once a batch is full."""
+        self._pending.append((result, content_hash))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write the queued uploads: raw files first, then their rows, then the summaries."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+
+        uploads = []
+        for result, content_hash in pending:
+            csv_file = UploadedCSV(
+                user=self.user,
+                content_hash=content_hash,
+                analysis_mode=result['mode'],
+                column_names=result['column_names'],
+            )
+            with open(result['path'], 'rb') as f:
+                csv_file.raw_csv.save(os.path.basename(result['path']), File(f), save=False)
+            uploads.append(csv_file)
+
+        with transaction.atomic():
+            UploadedCSV.objects.bulk_create(uploads)
+            # Artifact names contain the new ids
+            for csv_file, (result, _) in zip(uploads, pending):
+                csv_file.processed_csv.save(
+                    f'summary_{csv_file.id}.txt', ContentFile(result['summary'].encode('utf-8')), save=False,
+                )
+                csv_file.aggregates.save(
+                    f'aggregates_{csv_file.id}.json', ContentFile(result['aggregates'].encode('utf-8')), save=False,
+                )
+                csv_file.is_processed = True
+            UploadedCSV.objects.bulk_update(uploads, ['processed_csv', 'aggregates', 'is_processed'])
+
+        for csv_file, (result, _) in zip(uploads, pending):
+            result['upload_id'] = csv_file.id
+            # Stored now; don't keep every summary in memory for the rest of the run
+            del result['summary'], result['aggregates']
+        self.log(f"Saved {len(uploads)} uploads")
+
+    def run(self, paths):
+        """
+        Ingest the given files.
+
+        Returns:
+            list: One dict per file: path and status, plus rows, bytes, seconds
+                and upload_id for ingested files
+        """
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as pool:
+            hashes = dict(pool.map(hash_file, paths))
+            unique = self.dedupe(hashes)
+
+            futures = {
+                pool.submit(summarize_export, path, self.mode, settings.SUMMARY_TOKEN_BUDGET): path
+                for path in unique
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self.results.append({'path': path, 'status': f'failed: {e}'})
+                    self.log(f"Failed {os.path.basename(path)}: {e}")
+                    continue
+                result['status'] = 'ingested'
+                self.results.append(result)
+                self.log(
+                    f"Summarized {os.path.basename(path)}: {result['rows']} rows in {result['seconds']:.2f}s "
+                    f"({result['bytes'] / 1e6 / max(result['seconds'], 1e-9):.1f} MB/s)"
+                )
+                self._store(result, unique[path])
+        self.flush()
+        return self.results
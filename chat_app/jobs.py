@@ -0,0 +1,78 @@
+# jobs.py
+
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .scheduling import FairQueue, tenant_context
+from .tracing import trace
+
+_queue = FairQueue()
+_condition = threading.Condition()
+_workers = []
+
+
+def _worker():
+    while True:
+        with _condition:
+            while not _queue:
+                _condition.wait()
+            future, tenant, func, args, kwargs = _queue.pop()
+        if not future.set_running_or_notify_cancel():
+            continue
+
+        close_old_connections()
+        try:
+            with tenant_context(tenant), trace(f'job {func.__name__}', tenant=tenant or ''):
+                future.set_result(func(*args, **kwargs))
+        except Exception as e:
+            print(f"Background job {func.__name__} failed: {e}")
+            future.set_exception(e)
+        finally:
+            close_old_connections()
+
+
+def _start_workers():
+    # Started on first use, so nothing runs in a preloading master (see boot.preload)
+    while len(_workers) < settings.BACKGROUND_JOB_WORKERS:
+        thread = threading.Thread(target=_worker, name=f'background-job-{len(_workers)}', daemon=True)
+        thread.start()
+        _workers.append(thread)
+
+
+def submit(func, *args, tenant=None, cost=1.0, **kwargs):
+    """
+    Run func(*args, **kwargs) on a background thread of this process.
+
+    Jobs live in memory only: they are meant for work that improves something
+    already usable (like refining a preview summary), not for work that must
+    survive a restart. Each job gets fresh database connections.
+
+    Pending jobs are started in weighted fair order across tenants (see
+    scheduling.FairQueue), so one company queuing many large files doesn't
+    hold up everyone else's. LLM calls made by the job are attributed to its tenant.
+    The queue is per process: under N gunicorn workers a tenant whose jobs land
+    on every worker can still get up to N times its share.
+
+    Args:
+        func (callable): The job
+        tenant (str, optional): Who the job works for (scheduling.tenant_of)
+        cost (float): Relative size of the job, e.g. MB to process
+
+    Returns:
+        Future: The job's future
+    """
+    future = Future()
+    with _condition:
+        _start_workers()
+        _queue.push(tenant, (future, tenant, func, args, kwargs), cost)
+        _condition.notify()
+    return future
+
+
+def pending():
+    """Queued (not yet started) jobs per tenant."""
+    with _condition:
+        return _queue.waiting()
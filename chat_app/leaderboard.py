@@ -0,0 +1,75 @@
+# leaderboard.py
+
+from functools import lru_cache
+
+from .aggregates import load_aggregates_file, EXTREME_RIDES_K
+
+# Leaderboard orderings the API accepts, mapped to the column they sort by
+SORT_FIELDS = {
+    'revenue': 'revenue',
+    'rides': 'rides',
+    'avg_price': 'avg_price',
+}
+
+
+def _records(df):
+    """DataFrame rows as JSON-safe dicts (NaN becomes None)."""
+    return df.astype(object).where(df.notna(), None).to_dict(orient='records')
+
+
+@lru_cache(maxsize=64)
+def _build(aggregates_name, sort, k):
+    """
+    Assemble the full leaderboard for one aggregates artifact.
+
+    Everything comes from the tables computed at ingest, and the result is
+    memoized per artifact, ordering and k, so repeated calls from the UI and the
+    chat layer only pay for slicing a page.
+    """
+    aggregates = load_aggregates_file(aggregates_name)
+    chauffeurs = aggregates.get('chauffeurs')
+    if chauffeurs is None:
+        return []
+
+    board = chauffeurs.sort_values(SORT_FIELDS[sort], ascending=False, kind='stable').reset_index(drop=True)
+    board['rank'] = board.index + 1
+    board['revenue_share'] = (board['revenue'] / board['revenue'].sum() * 100).round(1)
+    board[['revenue', 'avg_price']] = board[['revenue', 'avg_price']].round(2)
+
+    rides = aggregates.get('extreme_rides')
+    extremes = {}
+    if rides is not None:
+        rides = rides[rides['rank'] <= k]
+        # One pass over the (small) extremes table, grouped by chauffeur and kind
+        for (chauffeur, kind), group in rides.groupby(['chauffeur', 'kind'], sort=False):
+            extremes[(chauffeur, kind)] = _records(group.drop(columns=['chauffeur', 'kind']))
+
+    entries = _records(board[['rank', 'chauffeur', 'rides', 'revenue', 'avg_price', 'revenue_share']])
+    for entry in entries:
+        entry['top_rides'] = extremes.get((entry['chauffeur'], 'top'), [])
+        entry['bottom_rides'] = extremes.get((entry['chauffeur'], 'bottom'), [])
+    return entries
+
+
+def leaderboard(csv_file, sort='revenue', k=3):
+    """
+    Chauffeur leaderboard with each chauffeur's highest and lowest priced rides.
+
+    Args:
+        csv_file (UploadedCSV): A processed upload
+        sort (str): One of SORT_FIELDS
+        k (int): Number of top and bottom rides per chauffeur (at most EXTREME_RIDES_K)
+
+    Returns:
+        list: One dict per chauffeur, best first. Callers must not modify it.
+
+    Raises:
+        ValueError: If sort or k is out of range
+    """
+    if sort not in SORT_FIELDS:
+        raise ValueError(f"sort must be one of {', '.join(SORT_FIELDS)}")
+    if not 0 <= k <= EXTREME_RIDES_K:
+        raise ValueError(f"k must be between 0 and {EXTREME_RIDES_K}")
+    if not csv_file.aggregates:
+        return []
+    return _build(csv_file.aggregates.name, sort, k)
@@ -0,0 +1,184 @@
+# loadtest.py
+
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import numpy as np
+
+# Question every chat request asks
+DEFAULT_QUESTION = 'Which chauffeur earned the most, and what was their average fare?'
+
+# Seconds a single request may take before it counts as failed
+REQUEST_TIMEOUT = 300
+
+_CHAT_URL = re.compile(r'/chat/(\d+)/')
+
+
+class LoadTestError(Exception):
+    """A step of a virtual user's session failed; the rest of that iteration is skipped."""
+
+
+class Recorder:
+    """Latency and outcome of every request, by endpoint; shared by the virtual users."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, endpoint, seconds, ok):
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append((seconds, ok))
+
+    def report(self, elapsed):
+        """
+        Per-endpoint statistics.
+
+        Args:
+            elapsed (float): Wall time of the run, for requests/sec
+
+        Returns:
+            list: One dict per endpoint: endpoint, requests, errors, p50, p95, p99, max (ms) and rps
+        """
+        rows = []
+        for endpoint, samples in self.samples.items():
+            seconds = np.array([s for s, _ in samples]) * 1000
+            p50, p95, p99 = np.percentile(seconds, [50, 95, 99])
+            rows.append({
+                'endpoint': endpoint,
+                'requests': len(samples),
+                'errors': sum(not ok for _, ok in samples),
+                'p50': p50,
+                'p95': p95,
+                'p99': p99,
+                'max': seconds.max(),
+                'rps': len(samples) / max(elapsed, 1e-9),
+            })
+        return rows
+
+
+class VirtualUser:
+    """
+    One simulated browser session: log in, then upload a CSV and chat about it, repeatedly.
+
+    Each request is timed and recorded under its endpoint name (login,
+    upload, chat_page, chat). CSRF tokens and session cookies are handled
+    like a browser would.
+    """
+
+    def __init__(self, base_url, email, password, recorder):
+        self.client = httpx.Client(base_url=base_url, timeout=REQUEST_TIMEOUT, follow_redirects=False)
+        self.email = email
+        self.password = password
+        self.recorder = recorder
+
+    def _request(self, endpoint, method, url, expect, **kwargs):
+        """Send a timed request; expect is the status code that counts as success."""
+        token = self.client.cookies.get('csrftoken')
+        headers = {'X-CSRFToken': token, 'Referer': str(self.client.base_url)} if token else {}
+        start = time.perf_counter()
+        try:
+            response = self.client.request(method, url, headers=headers, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.add(endpoint, time.perf_counter() - start, False)
+            raise LoadTestError(f'{endpoint}: {e}')
+        ok = response.status_code == expect
+        error = f'HTTP {response.status_code}'
+        if ok and endpoint == 'chat':
+            # The chatbot reports API failures in the reply instead of the status code
+            error = response.json().get('response', '')
+            ok = not error.startswith('Error:')
+        self.recorder.add(endpoint, time.perf_counter() - start, ok)
+        if not ok:
+            raise LoadTestError(f'{endpoint}: {error[:200]}')
+        return response
+
+    def login(self):
+        # The login page sets the CSRF cookie
+        self.client.get('/login/')
+        self._request('login', 'POST', '/login/', 302, data={
+            'username': self.email,
+            'password': self.password,
+            'csrfmiddlewaretoken': self.client.cookies.get('csrftoken', ''),
+        })
+
+    def upload(self, csv_name, csv_bytes, mode='auto'):
+        """Upload a CSV; returns the id of the new upload."""
+        response = self._request(
+            'upload', 'POST', '/', 302,
+            data={'analysis_mode': mode, 'csrfmiddlewaretoken': self.client.cookies.get('csrftoken', '')},
+            files={'csv_file': (csv_name, csv_bytes, 'text/csv')},
+        )
+        match = _CHAT_URL.search(response.headers.get('location', ''))
+        if not match:
+            raise LoadTestError(f"upload: redirected to {response.headers.get('location')}")
+        return int(match.group(1))
+
+    def chat(self, upload_id, question):
+        self._request('chat', 'POST', f'/chat/{upload_id}/', 200, data={
+            'message': question,
+            'csrfmiddlewaretoken': self.client.cookies.get('csrftoken', ''),
+        })
+
+    def run(self, csv_path, iterations, chats, question=DEFAULT_QUESTION, mode='auto'):
+        """
+        Log in once, then upload and chat iterations times.
+
+        Returns:
+            list: Error messages of the iterations that failed
+        """
+        with open(csv_path, 'rb') as f:
+            csv_bytes = f.read()
+        errors = []
+        try:
+            self.login()
+            for _ in range(iterations):
+                try:
+                    upload_id = self.upload(os.path.basename(csv_path), csv_bytes, mode)
+                    self._request('chat_page', 'GET', f'/chat/{upload_id}/', 200)
+                    for _ in range(chats):
+                        self.chat(upload_id, question)
+                except LoadTestError as e:
+                    errors.append(str(e))
+        except LoadTestError as e:
+            errors.append(str(e))
+        finally:
+            self.client.close()
+        return errors
+
+
+def run_load_test(base_url, accounts, csv_path, iterations=1, chats=3, question=DEFAULT_QUESTION,
+                  mode='auto', ramp_up=0.0):
+    """
+    Drive the app with one concurrent virtual user per account.
+
+    Args:
+        base_url (str): Root URL of the running app
+        accounts (list): (email, password) of every virtual user; also the concurrency
+        csv_path (str): CSV every virtual user uploads
+        iterations (int): Upload + chat rounds per virtual user
+        chats (int): Chat messages per upload
+        question (str): What every chat message asks
+        mode (str): Analysis mode of the uploads
+        ramp_up (float): Seconds over which the virtual users are started
+
+    Returns:
+        dict: 'endpoints' (see Recorder.report), 'seconds' (wall time) and 'errors'
+    """
+    recorder = Recorder()
+    delay = ramp_up / len(accounts) if accounts else 0
+
+    def session(i, email, password):
+        time.sleep(i * delay)
+        user = VirtualUser(base_url, email, password, recorder)
+        return user.run(csv_path, iterations, chats, question, mode)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(accounts) or 1, thread_name_prefix='virtual-user') as executor:
+        futures = [executor.submit(session, i, email, password) for i, (email, password) in enumerate(accounts)]
+        errors = [error for future in futures for error in future.result()]
+    elapsed = time.perf_counter() - start
+    return {'endpoints': recorder.report(elapsed), 'seconds': elapsed, 'errors': errors}
@@ -0,0 +1,245 @@
+# locations.py
+
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Rows kept in the routes and locations aggregates
+TOP_ROUTES = 100
+TOP_LOCATIONS = 100
+
+# Different spellings of the same airport, after normalization -> canonical name
+AIRPORT_ALIASES = {
+    'jfk': 'jfk airport',
+    'john f kennedy': 'jfk airport',
+    'kennedy': 'jfk airport',
+    'lga': 'lga airport',
+    'laguardia': 'lga airport',
+    'la guardia': 'lga airport',
+    'ewr': 'ewr airport',
+    'newark liberty': 'ewr airport',
+    'newark': 'ewr airport',
+    'teb': 'teb airport',
+    'teterboro': 'teb airport',
+    'hpn': 'hpn airport',
+    'westchester county': 'hpn airport',
+    'lax': 'lax airport',
+    'los angeles': 'lax airport',
+    'sfo': 'sfo airport',
+    'san francisco': 'sfo airport',
+    'ord': 'ord airport',
+    'ohare': 'ord airport',
+    'mdw': 'mdw airport',
+    'midway': 'mdw airport',
+    'bos': 'bos airport',
+    'logan': 'bos airport',
+    'mia': 'mia airport',
+    'miami': 'mia airport',
+    'iad': 'iad airport',
+    'dulles': 'iad airport',
+    'dca': 'dca airport',
+    'reagan national': 'dca airport',
+    'atl': 'atl airport',
+    'hartsfield jackson': 'atl airport',
+    'dfw': 'dfw airport',
+    'dallas fort worth': 'dfw airport',
+}
+
+# Aliases that are also ordinary place names; they only count next to a word like "airport"
+AMBIGUOUS_ALIASES = {'kennedy', 'newark', 'los angeles', 'san francisco', 'logan', 'midway', 'miami'}
+
+# Abbreviations expanded before comparing addresses
+ABBREVIATIONS = {
+    'st': 'street', 'str': 'street', 'ave': 'avenue', 'av': 'avenue', 'blvd': 'boulevard',
+    'rd': 'road', 'dr': 'drive', 'ln': 'lane', 'pl': 'place', 'sq': 'square', 'pkwy': 'parkway',
+    'hwy': 'highway', 'ctr': 'center', 'centre': 'center', 'intl': 'international',
+    'arpt': 'airport', 'airpt': 'airport', 'n': 'north', 's': 'south', 'e': 'east', 'w': 'west',
+    'mt': 'mount', 'ft': 'fort', 'htl': 'hotel',
+}
+# 'st' at the start of a name, or right after a house number, is "saint" (St. Regis, 2 St Marks Pl)
+SAINT = 'saint'
+
+_AIRPORT = re.compile(r'\b(airport|terminal|arrivals|departures)\b')
+# Parts of an airport address that don't change which airport it is
+_AIRPORT_NOISE = re.compile(
+    r'\b(terminal|term|gate|door|pier|level|zone)\s*\w*\b|\b(international|intl|airport|arrivals|departures|'
+    r'domestic|private|fbo|aviation|the)\b'
+)
+_HOTEL = re.compile(
+    r'\b(hotel|inn|resort|suites|motel|lodge|hostel|marriott|hilton|hyatt|sheraton|westin|ritz|'
+    r'four seasons|peninsula|mandarin oriental|saint regis|fairmont|waldorf|intercontinental|'
+    r'holiday inn|courtyard|doubletree|radisson|kimpton)\b'
+)
+
+
+@lru_cache(maxsize=65536)
+def normalize_address(address):
+    """
+    Canonical form of an address, so different spellings of one place compare equal.
+
+    Lowercases, drops punctuation, expands common abbreviations ('st' is
+    "saint" before a name and "street" after one) and reduces
+    airports to '<code> airport' regardless of terminal or wording. Results are
+    memoized per process: the same addresses come back in every export.
+    """
+    text = str(address).lower().replace('&', ' and ').replace("'", '')
+    text = re.sub(r'[^\w\s#]', ' ', text)
+    tokens = text.split()
+    if tokens and tokens[0] == 'the':
+        tokens = tokens[1:]
+    tokens = [
+        SAINT if token == 'st' and i + 1 < len(tokens) and (i == 0 or tokens[i - 1].isdigit())
+        else ABBREVIATIONS.get(token, token)
+        for i, token in enumerate(tokens)
+    ]
+    text = ' '.join(tokens)
+
+    stripped = ' '.join(_AIRPORT_NOISE.sub(' ', text).split())
+    if stripped in AIRPORT_ALIASES and stripped not in AMBIGUOUS_ALIASES:
+        return AIRPORT_ALIASES[stripped]
+    if _AIRPORT.search(text):
+        for alias, airport in AIRPORT_ALIASES.items():
+            if re.search(rf'\b{alias}\b', stripped):
+                return airport
+        return f'{stripped} airport' if stripped else 'airport'
+    return text
+
+
+def location_kind(name):
+    """'airport', 'hotel' or 'other' for a normalized location."""
+    if name.endswith(' airport') or name == 'airport':
+        return 'airport'
+    if _HOTEL.search(name):
+        return 'hotel'
+    return 'other'
+
+
+class LocationIndex:
+    """
+    Pickup and dropoff addresses as integer codes into one table of normalized locations.
+
+    Each distinct raw spelling is normalized once; rides then only carry small
+    integer codes (-1 when missing), so route and location statistics are
+    integer groupbys (np.bincount) instead of string comparisons.
+    """
+
+    def __init__(self, pickup, dropoff):
+        """
+        Args:
+            pickup (Series): Raw pickup addresses
+            dropoff (Series): Raw dropoff addresses
+        """
+        # One dictionary for both columns, so a place has the same code as pickup and dropoff
+        raw_codes, raw_values = pd.factorize(pd.concat([pickup, dropoff], ignore_index=True))
+        normalized = pd.Series([normalize_address(value) for value in raw_values], dtype=object)
+        location_codes, labels = pd.factorize(normalized)
+
+        # Raw code -> location code; -1 (missing) stays -1
+        lookup = np.append(location_codes, -1).astype(np.int32)
+        codes = lookup[raw_codes]
+        self.pickup = codes[:len(pickup)]
+        self.dropoff = codes[len(pickup):]
+        self.labels = np.asarray(labels, dtype=object)
+        self.kinds = np.array([location_kind(label) for label in self.labels], dtype=object)
+        self.raw_count = len(raw_values)
+        # Number of raw spellings folded into each location
+        self.spellings = np.bincount(location_codes, minlength=len(self.labels))
+
+    def __len__(self):
+        return len(self.labels)
+
+    def route_codes(self):
+        """Integer code of every ride's pickup -> dropoff pair, -1 if either is missing."""
+        codes = self.pickup.astype(np.int64) * len(self) + self.dropoff
+        return np.where((self.pickup >= 0) & (self.dropoff >= 0), codes, -1)
+
+    def route_labels(self, mask):
+        """'pickup -> dropoff' labels of the rides selected by a boolean mask."""
+        pickup, dropoff = self.pickup[mask], self.dropoff[mask]
+        labels = np.append(self.labels, '?')  # code -1 (missing) -> '?'
+        return [f'{labels[p]} -> {labels[d]}' for p, d in zip(pickup, dropoff)]
+
+    def routes(self, price, top=TOP_ROUTES):
+        """
+        Rides, revenue and average price per pickup -> dropoff pair, busiest first.
+
+        Args:
+            price (ndarray): Ride prices (NaN when unknown)
+            top (int): Number of routes returned
+        """
+        route_codes = self.route_codes()
+        valid = route_codes >= 0
+        route_codes = route_codes[valid]
+        routes, inverse = np.unique(route_codes, return_inverse=True)
+        price = price[valid]
+        priced = ~np.isnan(price)
+
+        rides = np.bincount(inverse)
+        revenue = np.bincount(inverse, weights=np.where(priced, price, 0.0))
+        priced_rides = np.bincount(inverse, weights=priced)
+
+        table = pd.DataFrame({
+            'pickup': self.labels[routes // len(self)],
+            'dropoff': self.labels[routes % len(self)],
+            'rides': rides,
+            'revenue': revenue,
+            'avg_price': revenue / np.where(priced_rides > 0, priced_rides, np.nan),
+        })
+        return table.sort_values(['rides', 'revenue'], ascending=False, kind='stable').head(top).reset_index(drop=True)
+
+    def places(self, price, top=TOP_LOCATIONS):
+        """Pickups, dropoffs and pickup revenue per normalized location, busiest first."""
+        size = len(self)
+        has_pickup = self.pickup >= 0
+        pickup_price = np.where(np.isnan(price), 0.0, price)[has_pickup]
+        table = pd.DataFrame({
+            'location': self.labels,
+            'kind': self.kinds,
+            'spellings': self.spellings,
+            'pickups': np.bincount(self.pickup[has_pickup], minlength=size),
+            'dropoffs': np.bincount(self.dropoff[self.dropoff >= 0], minlength=size),
+            'pickup_revenue': np.bincount(self.pickup[has_pickup], weights=pickup_price, minlength=size),
+        })
+        table['rides'] = table['pickups'] + table['dropoffs']
+        table = table.sort_values('rides', ascending=False, kind='stable').drop(columns='rides')
+        return table.head(top).reset_index(drop=True)
+
+    def flows(self, price):
+        """Rides and revenue between kinds of places (airport -> hotel, ...)."""
+        kinds, kind_codes = np.unique(self.kinds, return_inverse=True)
+        kind_codes = np.append(kind_codes, -1)  # code -1 (missing) -> -1
+        pickup_kind = kind_codes[self.pickup]
+        dropoff_kind = kind_codes[self.dropoff]
+        valid = (pickup_kind >= 0) & (dropoff_kind >= 0)
+
+        pair = pickup_kind[valid] * len(kinds) + dropoff_kind[valid]
+        rides = np.bincount(pair, minlength=len(kinds) ** 2)
+        revenue = np.bincount(pair, weights=np.nan_to_num(price[valid]), minlength=len(kinds) ** 2)
+        table = pd.DataFrame({
+            'from': np.repeat(kinds, len(kinds)),
+            'to': np.tile(kinds, len(kinds)),
+            'rides': rides,
+            'revenue': revenue,
+        })
+        return table[table['rides'] > 0].sort_values('rides', ascending=False).reset_index(drop=True)
+
+
+def location_aggregates(index, price):
+    """
+    Route and location tables for the aggregates artifact.
+
+    Args:
+        index (LocationIndex): Normalized pickups and dropoffs of the rides
+        price (Series): Numeric ride prices
+
+    Returns:
+        dict: 'routes', 'locations' and 'location_flows' tables
+    """
+    price = price.to_numpy(dtype=float)
+    return {
+        'routes': index.routes(price),
+        'locations': index.places(price),
+        'location_flows': index.flows(price),
+    }
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from chat_app.batch import parse_questions, run_batch
+from chat_app.models import UploadedCSV
+from chat_app.storage import read_text
+
+
+class Command(BaseCommand):
+    help = ('Ask a list of questions about a processed upload, several at a time, '
+            'and write the answers to one report in storage (reports/).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('upload_id', type=int, help='Id of the UploadedCSV to ask about.')
+        parser.add_argument('questions', help='Text file with one question per line (# starts a comment).')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Questions in flight at once (default: BATCH_QUESTION_WORKERS).')
+        parser.add_argument('--output', help='Also write the report to this local file.')
+
+    def handle(self, *args, **options):
+        try:
+            csv_file = UploadedCSV.objects.get(id=options['upload_id'], is_processed=True)
+        except UploadedCSV.DoesNotExist:
+            raise CommandError(f"No processed upload with id {options['upload_id']}")
+        try:
+            with open(options['questions'], encoding='utf-8') as f:
+                questions = parse_questions(f.read())
+        except OSError as e:
+            raise CommandError(f"Could not read questions: {e}")
+        if not questions:
+            raise CommandError('The questions file has no questions.')
+
+        batch = run_batch(csv_file, questions, options['workers'])
+
+        for result in batch['results']:
+            status = 'ok' if result['ok'] else 'FAILED'
+            self.stdout.write(f"{result['seconds']:6.2f}s {status:6} {result['question']}")
+        answered = sum(result['ok'] for result in batch['results'])
+        self.stdout.write(
+            f"{answered}/{len(questions)} answered in {batch['seconds']:.2f}s. Report: {batch['report']}"
+        )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as out:
+                out.write(read_text(batch['report']))
+            self.stdout.write(f"Report written to {options['output']}")
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from chat_app.readers import benchmark, sniff_format
+
+
+class Command(BaseCommand):
+    help = ('Time reading CSV or Excel files with the previous loader (plain pd.read_csv) '
+            'and with the reader layer (sniffed dialect, pyarrow engine, streamed Excel).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='CSV or Excel files to read.')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per reader; the fastest counts.')
+
+    def handle(self, *args, **options):
+        for path in options['paths']:
+            try:
+                table_format = sniff_format(path)
+            except OSError as e:
+                raise CommandError(str(e))
+            self.stdout.write(f"\n{path}: {table_format}")
+            self.stdout.write(f"{'seconds':>9} {'rows':>10} {'cols':>5}  reader")
+            for row in benchmark(path, options['repeat']):
+                if row['seconds'] is None:
+                    self.stdout.write(f"{'failed':>9} {'':>10} {'':>5}  {row['reader']}: {row['error']}")
+                    continue
+                rows = '' if row['rows'] is None else row['rows']
+                cols = '' if row['columns'] is None else row['columns']
+                self.stdout.write(f"{row['seconds']:>9.3f} {rows:>10} {cols:>5}  {row['reader']}")
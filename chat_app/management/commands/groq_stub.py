@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from chat_app.groq_stub import StubConfig, make_server, ERRORS
+
+
+class Command(BaseCommand):
+    help = ('Run a local OpenAI/Groq-compatible chat completions server with configurable latency, '
+            'token rate and injected errors. Start the app with GROQ_BASE_URL=http://<host>:<port> to use it.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument('--latency', type=float, default=0.5, help='Seconds before the first token.')
+        parser.add_argument('--jitter', type=float, default=0.2,
+                            help='Up to this many seconds added to or removed from the latency.')
+        parser.add_argument('--tokens-per-second', type=float, default=250,
+                            help='Generation speed after the first token (0 = instant).')
+        parser.add_argument('--reply-tokens', type=int, default=150, help='Tokens in every reply.')
+        parser.add_argument('--error-rate', type=float, default=0.0,
+                            help='Share of requests (0-1) answered with --error-status.')
+        parser.add_argument('--error-status', type=int, choices=sorted(ERRORS), default=429)
+        parser.add_argument('--seed', type=int, default=None, help='Seed for reproducible jitter and errors.')
+
+    def handle(self, *args, **options):
+        config = StubConfig(
+            latency=options['latency'],
+            jitter=options['jitter'],
+            tokens_per_second=options['tokens_per_second'],
+            reply_tokens=options['reply_tokens'],
+            error_rate=options['error_rate'],
+            error_status=options['error_status'],
+            seed=options['seed'],
+        )
+        server = make_server(config, options['host'], options['port'])
+        self.stdout.write(
+            f"Groq stub listening on http://{options['host']}:{options['port']} "
+            f"(latency {config.latency}s +/- {config.jitter}s, {config.tokens_per_second} tokens/s, "
+            f"{config.reply_tokens} tokens per reply, {config.error_rate:.0%} errors as HTTP {config.error_status})"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Served {config.requests} requests, {config.errors} injected errors")
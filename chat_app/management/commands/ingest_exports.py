@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chat_app.data_processor import MODES
+from chat_app.ingest import ExportIngester, find_exports, DEFAULT_BATCH_SIZE
+from chat_app.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = ('Ingest a directory of CSV exports for a user, summarizing files in parallel worker '
+            'processes. Files the user already uploaded are skipped.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Directory containing the exports.')
+        parser.add_argument('--user', required=True, help='Email of the user the uploads belong to.')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Worker processes (default: one per CPU).')
+        parser.add_argument('--pattern', default='*.csv', help='File name pattern to ingest.')
+        parser.add_argument('--mode', choices=MODES, default='auto', help='Analysis mode of every file.')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='Upload rows written per database round trip.')
+
+    def handle(self, *args, **options):
+        try:
+            user = CustomUser.objects.get(email=options['user'])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"No user with email {options['user']}")
+        paths = find_exports(options['directory'], options['pattern'])
+        if not paths:
+            raise CommandError(f"No files matching {options['pattern']} in {options['directory']}")
+
+        start = time.perf_counter()
+        ingester = ExportIngester(
+            user,
+            workers=options['workers'],
+            mode=options['mode'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        results = ingester.run(paths)
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(f"\n{'file':40} {'status':28} {'rows':>9} {'MB':>8} {'sec':>7} {'MB/s':>7} {'rows/s':>9}")
+        for result in sorted(results, key=lambda r: r['path']):
+            name = result['path'].rsplit('/', 1)[-1][:40]
+            if result['status'] != 'ingested':
+                self.stdout.write(f"{name:40} {result['status'][:28]:28}")
+                continue
+            seconds = max(result['seconds'], 1e-9)
+            self.stdout.write(
+                f"{name:40} {'ingested #' + str(result['upload_id']):28} {result['rows']:>9} "
+                f"{result['bytes'] / 1e6:>8.1f} {result['seconds']:>7.2f} "
+                f"{result['bytes'] / 1e6 / seconds:>7.1f} {result['rows'] / seconds:>9.0f}"
+            )
+
+        ingested = [r for r in results if r['status'] == 'ingested']
+        total_bytes = sum(r['bytes'] for r in ingested)
+        total_rows = sum(r['rows'] for r in ingested)
+        self.stdout.write(
+            f"\n{len(ingested)} of {len(paths)} files ingested in {elapsed:.1f}s with {ingester.workers} workers: "
+            f"{total_rows} rows, {total_bytes / 1e6:.1f} MB ({total_bytes / 1e6 / max(elapsed, 1e-9):.1f} MB/s)"
+        )
@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from chat_app.data_processor import MODES
+from chat_app.loadtest import run_load_test, DEFAULT_QUESTION
+from chat_app.models import CustomUser
+
+# Password of the accounts created with --create-users
+LOAD_TEST_PASSWORD = 'load-test-password'
+
+
+class Command(BaseCommand):
+    help = ('Drive a running instance of the app with concurrent virtual users (login, upload, chat) '
+            'and report p50/p95/p99 latency and requests/sec per endpoint. Run the app against the '
+            'groq_stub command to keep the Groq API out of the measurements.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv', help='CSV file every virtual user uploads.')
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Root URL of the running app.')
+        parser.add_argument('--concurrency', type=int, default=10, help='Virtual users running at once.')
+        parser.add_argument('--iterations', type=int, default=1, help='Upload + chat rounds per virtual user.')
+        parser.add_argument('--chats', type=int, default=3, help='Chat messages per upload.')
+        parser.add_argument('--question', default=DEFAULT_QUESTION, help='What every chat message asks.')
+        parser.add_argument('--mode', choices=MODES, default='auto', help='Analysis mode of the uploads.')
+        parser.add_argument('--ramp-up', type=float, default=0.0,
+                            help='Seconds over which the virtual users are started.')
+        parser.add_argument('--email', help='Approved account every virtual user logs in as.')
+        parser.add_argument('--password', help='Password of --email.')
+        parser.add_argument('--create-users', action='store_true',
+                            help='Create (or reset) one approved account per virtual user in this '
+                                 "database: loadtest-<n>@example.com. Only for an app sharing this project's database.")
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        if concurrency < 1:
+            raise CommandError('--concurrency must be at least 1')
+        if options['create_users']:
+            accounts = [self._load_test_user(n) for n in range(concurrency)]
+        elif options['email'] and options['password']:
+            accounts = [(options['email'], options['password'])] * concurrency
+        else:
+            raise CommandError('Give --email and --password, or --create-users')
+
+        self.stdout.write(
+            f"{concurrency} virtual users x {options['iterations']} iterations "
+            f"(1 upload + {options['chats']} chats) against {options['base_url']}"
+        )
+        result = run_load_test(
+            options['base_url'],
+            accounts,
+            options['csv'],
+            iterations=options['iterations'],
+            chats=options['chats'],
+            question=options['question'],
+            mode=options['mode'],
+            ramp_up=options['ramp_up'],
+        )
+
+        self.stdout.write(
+            f"\n{'endpoint':12} {'requests':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} "
+            f"{'p99 ms':>9} {'max ms':>9} {'req/s':>8}"
+        )
+        for row in sorted(result['endpoints'], key=lambda r: r['endpoint']):
+            self.stdout.write(
+                f"{row['endpoint']:12} {row['requests']:>8} {row['errors']:>7} {row['p50']:>9.0f} "
+                f"{row['p95']:>9.0f} {row['p99']:>9.0f} {row['max']:>9.0f} {row['rps']:>8.2f}"
+            )
+        total = sum(row['requests'] for row in result['endpoints'])
+        self.stdout.write(
+            f"\n{total} requests in {result['seconds']:.1f}s ({total / max(result['seconds'], 1e-9):.2f} req/s), "
+            f"{len(result['errors'])} failed iterations"
+        )
+        for error in sorted(set(result['errors']))[:10]:
+            self.stdout.write(f"  {error}")
+
+    def _load_test_user(self, n):
+        email = f'loadtest-{n}@example.com'
+        user, _ = CustomUser.objects.get_or_create(
+            email=email, defaults={'company_name': 'Load Test', 'is_approved': True},
+        )
+        user.is_approved = True
+        user.set_password(LOAD_TEST_PASSWORD)
+        user.save()
+        return email, LOAD_TEST_PASSWORD
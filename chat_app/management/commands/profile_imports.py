@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from chat_app.boot import profile_imports
+
+
+class Command(BaseCommand):
+    help = ('Boot the app in a fresh interpreter with python -X importtime and show the slowest imports, '
+            'and which of our modules pull heavy packages (pandas, groq, ...) into worker boot.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('modules', nargs='*', help='Extra modules to import after boot.')
+        parser.add_argument('--top', type=int, default=15, help='Imports listed.')
+
+    def handle(self, *args, **options):
+        try:
+            profile = profile_imports(options['modules'])
+        except RuntimeError as e:
+            raise CommandError(f"Boot failed:\n{e}")
+        imports = profile['imports']
+
+        total = sum(row['cumulative_ms'] for row in imports if row['level'] == 0)
+        self.stdout.write(f"{len(imports)} modules imported in {total:.0f} ms\n")
+
+        self.stdout.write(f"{'cumulative ms':>13} {'self ms':>8}  module")
+        slowest = sorted(imports, key=lambda row: row['cumulative_ms'], reverse=True)[:options['top']]
+        for row in slowest:
+            self.stdout.write(f"{row['cumulative_ms']:>13.1f} {row['self_ms']:>8.1f}  {row['module']}")
+
+        if not profile['heavy']:
+            self.stdout.write("\nNo heavy packages are imported at boot.")
+            return
+        self.stdout.write("\nHeavy packages imported at boot (and the chain that imports them):")
+        by_module = {row['module']: row for row in imports}
+        for package, importers in profile['heavy'].items():
+            chain = ' -> '.join(importers + [package])
+            self.stdout.write(f"  {package} ({by_module[package]['cumulative_ms']:.0f} ms): {chain}")
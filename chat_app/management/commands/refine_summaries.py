@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chat_app.models import UploadedCSV
+from chat_app.views import refine_summary
+
+
+class Command(BaseCommand):
+    help = ('Replace preview summaries whose background refinement was lost (e.g. to a restart) '
+            'with exact ones. Meant to run periodically, e.g. from Heroku Scheduler.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=float, default=30.0,
+                            help='Minutes since upload before a preview counts as lost; '
+                                 'younger ones may still be refining in a web process.')
+        parser.add_argument('--limit', type=int, default=20,
+                            help='Maximum number of uploads refined in one run.')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options['min_age'])
+        pending = (
+            UploadedCSV.objects
+            .filter(is_processed=True, summary_is_exact=False, uploaded_at__lt=cutoff)
+            .order_by('uploaded_at')
+            .values_list('id', 'analysis_mode', 'column_names')[:options['limit']]
+        )
+
+        refined = failed = 0
+        for csv_file_id, mode, column_names in pending:
+            try:
+                refine_summary(csv_file_id, mode, column_names)
+                refined += 1
+            except Exception as e:
+                # The preview stays in place; the next run tries again
+                failed += 1
+                self.stderr.write(f"Could not refine upload {csv_file_id}: {e}")
+
+        if not refined and not failed:
+            self.stdout.write('No previews waiting to be refined.')
+        else:
+            self.stdout.write(f"Refined {refined} summaries, {failed} failed")
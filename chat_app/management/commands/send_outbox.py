@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from chat_app.outbox import send_pending, DEFAULT_BATCH_SIZE, DEFAULT_MAX_ATTEMPTS
+
+
+class Command(BaseCommand):
+    help = 'Send queued emails from the outbox in batches over one SMTP connection per batch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='Maximum number of emails sent per SMTP connection.')
+        parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS,
+                            help='Attempts after which a failing email is marked as failed.')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds to wait before polling again when the outbox is empty.')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the outbox once and exit instead of running as a worker.')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = send_pending(options['batch_size'], options['max_attempts'])
+            if sent or failed:
+                self.stdout.write(f"Outbox batch: {sent} sent, {failed} failed")
+
+            # Keep going straight away while full batches are being delivered; failing
+            # emails wait out their retry delay, so an SMTP outage doesn't spin
+            if sent and sent + failed >= options['batch_size']:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
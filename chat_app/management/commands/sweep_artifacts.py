@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from chat_app.retention import ArtifactSweeper
+
+
+class Command(BaseCommand):
+    help = ('Delete expired uploads, summaries and chunked uploads, and reconcile the database '
+            'with storage. Meant to run periodically, e.g. from Heroku Scheduler.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Rows or files handled per batch.')
+        parser.add_argument('--max-deletes', type=int, default=5000,
+                            help='Maximum number of files deleted in one run.')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to sleep between batches.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would be deleted without deleting anything.')
+
+    def handle(self, *args, **options):
+        sweeper = ArtifactSweeper(
+            batch_size=options['batch_size'],
+            max_deletes=options['max_deletes'],
+            pause=options['pause'],
+            dry_run=options['dry_run'],
+            log=self.stdout.write,
+        )
+        deleted = +sweeper.run()  # drop zero counts
+
+        prefix = 'Would delete' if options['dry_run'] else 'Deleted'
+        if not deleted:
+            self.stdout.write('Nothing to sweep.')
+        for kind, count in sorted(deleted.items()):
+            self.stdout.write(f"{prefix} {count} {kind.replace('_', ' ')}")
+        if sweeper.files_left <= 0:
+            self.stdout.write('Reached --max-deletes; run again to continue.')
@@ -0,0 +1,46 @@
+# middleware.py
+
+from .scheduling import tenant_context, tenant_of
+from .tracing import trace
+
+
+class TenantMiddleware:
+    """
+    Attribute the work done for a request (LLM calls, queued jobs) to the user's company,
+    so the fair queues in scheduling.py can share throughput between tenants.
+    Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        user = request.user
+        if not user.is_authenticated:
+            return self.get_response(request)
+        with tenant_context(tenant_of(user)):
+            return self.get_response(request)
+
+
+class TracingMiddleware:
+    """
+    One trace per request (see tracing.py), named after the matched URL pattern.
+    Goes first, so the time spent in the other middleware is part of the trace.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with trace(f'{request.method} {request.path}', **{'http.method': request.method}) as root:
+            response = self.get_response(request)
+            if root is not None:
+                match = request.resolver_match
+                if match is not None:
+                    root.name = f'{request.method} /{match.route}'
+                    root.set(**{'http.route': match.route})
+                root.set(**{'http.status_code': response.status_code})
+                user = getattr(request, 'user', None)
+                if user is not None and user.is_authenticated:
+                    root.set(**{'user.id': user.pk})
+            return response
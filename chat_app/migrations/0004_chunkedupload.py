@@ -0,0 +1,46 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:26
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_app', '0003_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedcsv',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 of the raw file contents, when known.', max_length=64),
+        ),
+        migrations.CreateModel(
+            name='ChunkedUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255)),
+                ('total_size', models.BigIntegerField(help_text='Size of the complete file in bytes.')),
+                ('received_bytes', models.BigIntegerField(default=0, help_text='Number of bytes committed so far; the next chunk must start here.')),
+                ('expected_sha256', models.CharField(blank=True, help_text='Optional SHA-256 sent by the client, checked when the upload completes.', max_length=64)),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('header', models.JSONField(blank=True, help_text='Column names sniffed from the first chunk.', null=True)),
+                ('delimiter', models.CharField(blank=True, max_length=1)),
+                ('row_count', models.BigIntegerField(default=0)),
+                ('status', models.CharField(choices=[('uploading', 'Uploading'), ('complete', 'Complete'), ('failed', 'Failed')], default='uploading', max_length=10)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('uploaded_csv', models.ForeignKey(blank=True, help_text='The upload created from this file once it is complete.', null=True, on_delete=django.db.models.deletion.SET_NULL, to='chat_app.uploadedcsv')),
+                ('user', models.ForeignKey(help_text='The user who is uploading this file.', on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Chunked upload',
+                'verbose_name_plural': 'Chunked uploads',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_app', '0004_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedcsv',
+            name='aggregates',
+            field=models.FileField(blank=True, help_text='Precomputed aggregate tables used for charts and APIs.', null=True, upload_to='aggregates/'),
+        ),
+    ]
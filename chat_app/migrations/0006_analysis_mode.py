@@ -0,0 +1,23 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_app', '0005_uploadedcsv_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chunkedupload',
+            name='analysis_mode',
+            field=models.CharField(choices=[('auto', 'Detect automatically'), ('chauffeur', 'Chauffeur bookings'), ('general', 'General CSV')], default='auto', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='uploadedcsv',
+            name='analysis_mode',
+            field=models.CharField(choices=[('auto', 'Detect automatically'), ('chauffeur', 'Chauffeur bookings'), ('general', 'General CSV')], default='auto', help_text='Requested analysis mode; replaced by the mode actually used once processed.', max_length=10),
+        ),
+    ]
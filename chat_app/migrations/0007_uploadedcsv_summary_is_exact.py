@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_app', '0006_analysis_mode'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedcsv',
+            name='summary_is_exact',
+            field=models.BooleanField(default=True, help_text='False while the summary is a sample-based preview waiting to be refined.'),
+        ),
+    ]
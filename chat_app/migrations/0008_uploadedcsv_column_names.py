@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_app', '0007_uploadedcsv_summary_is_exact'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedcsv',
+            name='column_names',
+            field=models.JSONField(blank=True, help_text='Standardized column names, so the file can be reloaded without asking the LLM again.', null=True),
+        ),
+    ]
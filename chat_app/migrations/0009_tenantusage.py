@@ -0,0 +1,36 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_app', '0008_uploadedcsv_column_names'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TenantUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('chat', 'Chat calls'), ('ingest', 'Ingestion (MB)')], max_length=10)),
+                ('scope', models.CharField(choices=[('user', 'User'), ('company', 'Company')], max_length=10)),
+                ('key', models.CharField(help_text='User email or company name.', max_length=254)),
+                ('tokens', models.FloatField(help_text='Tokens left in the bucket at updated_at; it refills continuously up to its capacity.')),
+                ('updated_at', models.DateTimeField()),
+                ('used', models.FloatField(default=0, help_text='Tokens consumed in total (calls, or MB ingested).')),
+                ('rejected', models.PositiveIntegerField(default=0, help_text='Requests refused because the bucket was empty.')),
+                ('last_used_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Tenant usage',
+                'verbose_name_plural': 'Tenant usage',
+                'ordering': ['kind', 'scope', 'key'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='tenantusage',
+            constraint=models.UniqueConstraint(fields=('kind', 'scope', 'key'), name='unique_tenant_usage'),
+        ),
+    ]
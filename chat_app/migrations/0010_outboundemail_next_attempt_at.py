@@ -0,0 +1,19 @@
+# Generated by Django 5.0.14 on 2026-10-19 15:19
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat_app', '0009_tenantusage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboundemail',
+            name='next_attempt_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, help_text='Earliest time the worker (re)tries the message; pushed back after each failure.'),
+        ),
+    ]
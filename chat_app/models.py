@@ -1,8 +1,10 @@
 from django.db import models
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser, BaseUserManager
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-import os
+from .storage import delete_artifact
+import uuid
 
 # First, let's create a custom manager for our user model
 class CustomUserManager(BaseUserManager):
@@ -77,10 +79,29 @@ class CustomUser(AbstractUser):
     # Assign the custom manager to our model
     objects = CustomUserManager()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Remember the approval status as it was loaded from the database, so the
+        pre_save signal can detect a change without querying the user again.
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_is_approved = dict(zip(field_names, values)).get('is_approved')
+        return instance
+
     def __str__(self):
         return self.email
 
 
+# How an upload is analyzed: the chauffeur booking schema, a general CSV profile,
+# or 'auto' to decide from the columns
+ANALYSIS_MODE_CHOICES = [
+    ('auto', _('Detect automatically')),
+    ('chauffeur', _('Chauffeur bookings')),
+    ('general', _('General CSV')),
+]
+
+
 class UploadedCSV(models.Model):
     """
     Model to store and manage CSV files uploaded by users.
@@ -108,6 +129,33 @@ class UploadedCSV(models.Model):
         default=False,
         help_text=_('Indicates whether the CSV has been processed.')
     )
+    aggregates = models.FileField(
+        upload_to='aggregates/',
+        null=True,
+        blank=True,
+        help_text=_('Precomputed aggregate tables used for charts and APIs.')
+    )
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        help_text=_('SHA-256 of the raw file contents, when known.')
+    )
+    analysis_mode = models.CharField(
+        max_length=10,
+        choices=ANALYSIS_MODE_CHOICES,
+        default='auto',
+        help_text=_('Requested analysis mode; replaced by the mode actually used once processed.')
+    )
+    summary_is_exact = models.BooleanField(
+        default=True,
+        help_text=_('False while the summary is a sample-based preview waiting to be refined.')
+    )
+    column_names = models.JSONField(
+        null=True,
+        blank=True,
+        help_text=_('Standardized column names, so the file can be reloaded without asking the LLM again.')
+    )
 
     def __str__(self):
         """
@@ -121,24 +169,18 @@ class UploadedCSV(models.Model):
         Override delete method to ensure both the raw and processed files
         are removed from storage when the model instance is deleted.
         """
-        # Delete the raw CSV file if it exists
-        if self.raw_csv:
-            file_path = self.raw_csv.path
-            if os.path.isfile(file_path):
+        # Delete the raw and processed files through the storage API, so this works
+        # for local disk and object storage alike
+        for field in (self.raw_csv, self.processed_csv, self.aggregates):
+            if field:
                 try:
-                    os.remove(file_path)
-                except OSError as e:
+                    delete_artifact(field.name, field.storage)
+                except Exception as e:
                     # Log the error but don't prevent deletion of the model instance
-                    print(f"Error deleting raw CSV file: {e}")
-
-        # Delete the processed CSV file if it exists
-        if self.processed_csv:
-            file_path = self.processed_csv.path
-            if os.path.isfile(file_path):
-                try:
-                    os.remove(file_path)
-                except OSError as e:
-                    print(f"Error deleting processed CSV file: {e}")
+                    print(f"Error deleting file {field.name}: {e}")
+        # Imported here so loading the models does not pull in pandas
+        from .frames import discard_frame
+        discard_frame(self)
 
         # Call the parent class's delete method
         super().delete(*args, **kwargs)
@@ -146,4 +188,184 @@ class UploadedCSV(models.Model):
     class Meta:
         verbose_name = _('Uploaded CSV')
         verbose_name_plural = _('Uploaded CSVs')
-        ordering = ['-uploaded_at']  # Newest files first
\ No newline at end of file
+        ordering = ['-uploaded_at']  # Newest files first
+
+
+class ChunkedUpload(models.Model):
+    """
+    A resumable upload that arrives in chunks. Chunks are appended to a part
+    file on disk while the content hash and a CSV header/row sniff are updated
+    incrementally; once the last chunk is written the file becomes an UploadedCSV.
+    """
+    STATUS_UPLOADING = 'uploading'
+    STATUS_COMPLETE = 'complete'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_UPLOADING, _('Uploading')),
+        (STATUS_COMPLETE, _('Complete')),
+        (STATUS_FAILED, _('Failed')),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        help_text=_('The user who is uploading this file.')
+    )
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField(help_text=_('Size of the complete file in bytes.'))
+    received_bytes = models.BigIntegerField(
+        default=0,
+        help_text=_('Number of bytes committed so far; the next chunk must start here.')
+    )
+    expected_sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text=_('Optional SHA-256 sent by the client, checked when the upload completes.')
+    )
+    sha256 = models.CharField(max_length=64, blank=True)
+    header = models.JSONField(
+        null=True,
+        blank=True,
+        help_text=_('Column names sniffed from the first chunk.')
+    )
+    delimiter = models.CharField(max_length=1, blank=True)
+    analysis_mode = models.CharField(max_length=10, choices=ANALYSIS_MODE_CHOICES, default='auto')
+    row_count = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_UPLOADING)
+    error = models.TextField(blank=True)
+    uploaded_csv = models.ForeignKey(
+        UploadedCSV,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        help_text=_('The upload created from this file once it is complete.')
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def is_complete(self):
+        return self.received_bytes >= self.total_size
+
+    def __str__(self):
+        return f"{self.filename} ({self.received_bytes}/{self.total_size} bytes)"
+
+    class Meta:
+        verbose_name = _('Chunked upload')
+        verbose_name_plural = _('Chunked uploads')
+        ordering = ['-created_at']
+
+
+class OutboundEmail(models.Model):
+    """
+    An email waiting in the outbox. Signal handlers enqueue messages here instead
+    of talking to SMTP during the request; the `send_outbox` worker delivers them
+    in batches over a single SMTP connection.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, _('Pending')),
+        (STATUS_SENT, _('Sent')),
+        (STATUS_FAILED, _('Failed')),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField(help_text=_('Plain text version of the message.'))
+    html_body = models.TextField(
+        blank=True,
+        help_text=_('Optional HTML version of the message.')
+    )
+    from_email = models.CharField(max_length=254, blank=True)
+    recipients = models.JSONField(help_text=_('List of recipient email addresses.'))
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        db_index=True,
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        help_text=_('Number of delivery attempts made so far.')
+    )
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+        help_text=_('Earliest time the worker (re)tries the message; pushed back after each failure.')
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
+
+    @classmethod
+    def enqueue(cls, subject, body, recipients, html_body='', from_email=None):
+        """
+        Add a message to the outbox. Nothing is sent until the worker picks it up.
+        """
+        return cls.objects.create(
+            subject=subject,
+            body=body,
+            html_body=html_body,
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL or '',
+            recipients=list(recipients),
+        )
+
+    class Meta:
+        verbose_name = _('Outbound email')
+        verbose_name_plural = _('Outbound emails')
+        ordering = ['created_at']
+
+
+class TenantUsage(models.Model):
+    """
+    Token bucket and usage counters of one user or company for one kind of work.
+    Maintained by chat_app/quotas.py; shown in the admin.
+    """
+    KIND_CHAT = 'chat'
+    KIND_INGEST = 'ingest'
+    KIND_CHOICES = [
+        (KIND_CHAT, _('Chat calls')),
+        (KIND_INGEST, _('Ingestion (MB)')),
+    ]
+    SCOPE_USER = 'user'
+    SCOPE_COMPANY = 'company'
+    SCOPE_CHOICES = [
+        (SCOPE_USER, _('User')),
+        (SCOPE_COMPANY, _('Company')),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    key = models.CharField(
+        max_length=254,
+        help_text=_('User email or company name.')
+    )
+    tokens = models.FloatField(
+        help_text=_('Tokens left in the bucket at updated_at; it refills continuously up to its capacity.')
+    )
+    updated_at = models.DateTimeField()
+    used = models.FloatField(
+        default=0,
+        help_text=_('Tokens consumed in total (calls, or MB ingested).')
+    )
+    rejected = models.PositiveIntegerField(
+        default=0,
+        help_text=_('Requests refused because the bucket was empty.')
+    )
+    last_used_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.kind} quota of {self.scope} {self.key}"
+
+    class Meta:
+        verbose_name = _('Tenant usage')
+        verbose_name_plural = _('Tenant usage')
+        ordering = ['kind', 'scope', 'key']
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'scope', 'key'], name='unique_tenant_usage'),
+        ]
@@ -0,0 +1,126 @@
+# outbox.py
+
+import logging
+from datetime import timedelta
+
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Delay before the first retry of a failed email, doubled after every further failure, up to the maximum
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 60 * 60
+
+# How long a worker holds the emails it claimed before others may take them over
+CLAIM_SECONDS = 5 * 60
+
+
+def _build_message(email, connection):
+    """Turn an OutboundEmail row into a Django email message bound to the shared connection."""
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email or None,
+        to=email.recipients,
+        connection=connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def retry_delay(attempts):
+    """Seconds to wait before trying a message again after its attempts-th failure."""
+    return min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+
+
+def claim_batch(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Claim up to batch_size due emails for this worker.
+
+    Rows are locked with SKIP LOCKED where the database supports it, only for as
+    long as it takes to count the attempt and push next_attempt_at a lease
+    ahead. Other workers then skip them while this one talks to SMTP outside
+    the transaction; a worker that dies mid-batch releases them when the lease runs out.
+
+    Returns:
+        list: The claimed OutboundEmail rows
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=OutboundEmail.STATUS_PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'created_at')[:batch_size]
+        )
+        for email in batch:
+            email.attempts += 1
+            email.next_attempt_at = now + timedelta(seconds=CLAIM_SECONDS)
+        OutboundEmail.objects.bulk_update(batch, ['attempts', 'next_attempt_at'])
+    return batch
+
+
+def send_pending(batch_size=DEFAULT_BATCH_SIZE, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Send one batch of due emails over a single SMTP connection.
+
+    The batch is claimed first (see claim_batch), so several workers can drain
+    the outbox without sending the same email twice, and no database lock is
+    held while sending. A message that fails is retried after an exponentially
+    growing delay (retry_delay) until it has been tried max_attempts times.
+
+    Args:
+        batch_size (int): Maximum number of emails to send in this batch
+        max_attempts (int): Attempts after which a failing email is marked failed
+
+    Returns:
+        tuple: (number sent, number failed) in this batch
+    """
+    sent = failed = 0
+    batch = claim_batch(batch_size)
+    if not batch:
+        return sent, failed
+
+    # One connection (and one SMTP login) for the whole batch
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        logger.warning("Could not open SMTP connection: %s", e)
+        connection = None
+        connection_error = str(e)
+
+    for email in batch:
+        try:
+            if connection is None:
+                raise ConnectionError(connection_error)
+            connection.send_messages([_build_message(email, connection)])
+        except Exception as e:
+            failed += 1
+            email.last_error = str(e)
+            if email.attempts >= max_attempts:
+                email.status = OutboundEmail.STATUS_FAILED
+            else:
+                email.next_attempt_at = timezone.now() + timedelta(seconds=retry_delay(email.attempts))
+            logger.warning("Failed to send outbox email %s: %s", email.pk, e)
+        else:
+            sent += 1
+            email.status = OutboundEmail.STATUS_SENT
+            email.sent_at = timezone.now()
+            email.last_error = ''
+
+    if connection is not None:
+        connection.close()
+
+    OutboundEmail.objects.bulk_update(
+        batch, ['status', 'last_error', 'sent_at', 'next_attempt_at']
+    )
+    return sent, failed
@@ -0,0 +1,232 @@
+# profiling.py
+
+import re
+
+import pandas as pd
+
+from .prompt_encoding import PromptTable
+from .readers import read_table
+
+# Column roles are inferred from at most this many rows
+SAMPLE_ROWS = 5000
+
+# Wide files: only this many columns of each role get detailed tables
+MAX_COLUMNS_PER_ROLE = 12
+
+# Number of values listed per categorical column
+TOP_VALUES = 5
+
+ROLES = ['id', 'monetary', 'numeric', 'datetime', 'categorical', 'text', 'empty']
+
+_NUMBER = re.compile(r'^\s*\(?[-+]?\s*[$€£¥]?\s*\d[\d,]*(\.\d+)?\)?\s*$')
+_CURRENCY = re.compile(r'[$€£¥]')
+_MONEY_NAME = re.compile(r'price|amount|cost|fare|revenue|total|fee|pay|salary|charge|income|sales|\$', re.I)
+_ID_NAME = re.compile(r'(^|[\s_#-])(id|no|num|number|code|ref|reference|booking|invoice|order)($|[\s_#-])|#', re.I)
+
+
+def read_sample(source, rows=SAMPLE_ROWS, table_format=None, **read_csv_kwargs):
+    """
+    Read the first rows of a CSV or Excel file as strings, leaving file handles where they started.
+
+    Args:
+        source (str or file): Path or seekable binary file handle
+        table_format (TableFormat, optional): The file's format (readers.sniff_format)
+        **read_csv_kwargs: Passed on to pd.read_csv (e.g. header and names)
+
+    Returns:
+        DataFrame: Up to `rows` rows, every column as str (missing values as NaN)
+    """
+    return read_table(source, table_format, nrows=rows, dtype=str, **read_csv_kwargs)
+
+
+def to_number(series):
+    """Parse numbers written with currency symbols, thousands separators or (negative) parentheses."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+    text = series.astype(str).str.strip()
+    negative = text.str.startswith('(') & text.str.endswith(')')
+    cleaned = text.str.replace(r'[$€£¥,()\s]', '', regex=True)
+    numbers = pd.to_numeric(cleaned, errors='coerce')
+    return numbers.where(~negative, -numbers)
+
+
+def infer_role(name, values):
+    """
+    Decide what a column holds from a sample of its values.
+
+    Args:
+        name (str): Column name
+        values (Series): Sample values of the column
+
+    Returns:
+        str: One of ROLES
+    """
+    values = values.dropna()
+    if pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values):
+        values = values.astype(str).str.strip()
+        values = values[values != '']
+    if values.empty:
+        return 'empty'
+
+    unique_ratio = values.nunique() / len(values)
+
+    if pd.api.types.is_numeric_dtype(values):
+        numeric_share, currency_share = 1.0, 0.0
+        text = values.astype(str)
+    else:
+        text = values
+        numeric_share = text.str.match(_NUMBER).mean()
+        currency_share = text.str.contains(_CURRENCY).mean()
+
+    if numeric_share >= 0.95:
+        integer_like = not text.str.contains(r'\.\d', regex=True).any()
+        if integer_like and _ID_NAME.search(name) and unique_ratio >= 0.9:
+            return 'id'
+        if currency_share >= 0.5 or _MONEY_NAME.search(name):
+            return 'monetary'
+        return 'numeric'
+
+    # Dates: most values parse, and they are not just numbers
+    dates = pd.to_datetime(text, errors='coerce', format='mixed')
+    if dates.notna().mean() >= 0.9:
+        return 'datetime'
+
+    if _ID_NAME.search(name) and unique_ratio >= 0.9:
+        return 'id'
+    average_length = text.str.len().mean()
+    if average_length > 40 or (unique_ratio > 0.5 and text.str.contains(' ').mean() > 0.5):
+        return 'text'
+    if unique_ratio <= 0.5 or values.nunique() <= 50:
+        return 'categorical'
+    return 'id' if average_length <= 20 else 'text'
+
+
+def infer_roles(sample):
+    """Infer the role of every column of a sample DataFrame."""
+    return {col: infer_role(str(col), sample[col]) for col in sample.columns}
+
+
+def apply_roles(df, roles):
+    """
+    Convert the columns of the full DataFrame to types matching their roles,
+    one vectorized operation per column.
+    """
+    typed = {}
+    for col, role in roles.items():
+        if role == 'empty':
+            continue
+        if role in ('numeric', 'monetary'):
+            typed[col] = to_number(df[col])
+        elif role == 'datetime':
+            typed[col] = pd.to_datetime(df[col], errors='coerce', format='mixed')
+        elif role == 'categorical':
+            typed[col] = df[col].astype('category')
+        else:
+            typed[col] = df[col]
+    return pd.DataFrame(typed, index=df.index)
+
+
+class GeneralProfiler:
+    """
+    Summarizes a CSV of any schema. Column roles come from a bounded sample,
+    then each role gets its own vectorized analysis. Output is a list of summary
+    items (text lines and PromptTable blocks) for DataSummarizer.
+    """
+
+    def __init__(self, df, roles):
+        """
+        Args:
+            df (DataFrame): The full dataset, already converted with apply_roles
+            roles (dict): Column name -> role, as returned by infer_roles
+        """
+        self.df = df
+        self.roles = roles
+        self.items = []
+
+    def columns(self, role):
+        cols = [col for col, r in self.roles.items() if r == role and col in self.df.columns]
+        return cols[:MAX_COLUMNS_PER_ROLE]
+
+    def overview(self):
+        df = self.df
+        self.items.append(f"\nGeneral Dataset Profile:")
+        self.items.append(f"Rows: {len(df)}, columns: {len(self.roles)}")
+        table = pd.DataFrame({
+            'role': pd.Series(self.roles),
+            'filled_pct': (df.notna().mean() * 100).round(1),
+            'unique': df.nunique(),
+        }).rename_axis('column')
+        self.items.append(PromptTable("Columns", table, digits=1))
+
+    def numeric(self):
+        for role in ('monetary', 'numeric'):
+            cols = self.columns(role)
+            if not cols:
+                continue
+            stats = self.df[cols].describe().T[['count', 'mean', 'std', 'min', '50%', 'max']]
+            stats = stats.rename(columns={'50%': 'median'})
+            if role == 'monetary':
+                stats['sum'] = self.df[cols].sum()
+            self.items.append(PromptTable(f"\n{role.capitalize()} Columns", stats.rename_axis('column')))
+
+    def datetimes(self):
+        for col in self.columns('datetime'):
+            dates = self.df[col].dropna()
+            if dates.empty:
+                continue
+            self.items.append(f"\nDate column {col}: {dates.min():%Y-%m-%d} to {dates.max():%Y-%m-%d}")
+            per_month = dates.dt.to_period('M').value_counts().sort_index()
+            self.items.append(PromptTable(
+                f"Rows per month ({col})",
+                per_month.rename('rows').rename_axis('month').to_frame(),
+                droppable=True,
+            ))
+            per_weekday = dates.dt.day_name().value_counts()
+            self.items.append(PromptTable(
+                f"Rows per weekday, busiest first ({col})",
+                per_weekday.rename('rows').rename_axis('weekday').to_frame(),
+            ))
+
+    def categoricals(self):
+        money = self.columns('monetary')
+        for col in self.columns('categorical'):
+            counts = self.df[col].value_counts()
+            top = counts.head(TOP_VALUES).to_frame('Count')
+            top['Percentage'] = (top['Count'] / len(self.df) * 100).round(1)
+            # With a money column, also show how much each top value accounts for
+            if money:
+                sums = self.df.groupby(col, observed=True)[money[0]].sum()
+                top[f'{money[0]}_sum'] = sums.reindex(top.index)
+            title = f"\nTop values of {col} ({len(counts)} distinct)"
+            self.items.append(PromptTable(title, top.rename_axis(col), droppable=True))
+
+    def identifiers(self):
+        for col in self.columns('id'):
+            values = self.df[col].dropna()
+            duplicates = int(values.duplicated().sum())
+            self.items.append(f"\nIdentifier {col}: {values.nunique()} unique, {duplicates} duplicated values")
+
+    def free_text(self):
+        cols = self.columns('text')
+        if not cols:
+            return
+        lengths = pd.DataFrame({
+            col: self.df[col].dropna().astype(str).str.len().describe()[['count', 'mean', 'max']]
+            for col in cols
+        }).T.rename(columns={'count': 'filled', 'mean': 'avg_length', 'max': 'max_length'})
+        self.items.append(PromptTable("\nFree Text Columns", lengths.rename_axis('column'), digits=0))
+
+    def profile(self):
+        """
+        Run every analysis that applies to the inferred roles.
+
+        Returns:
+            list: Summary items (str and PromptTable)
+        """
+        self.overview()
+        self.numeric()
+        self.datetimes()
+        self.identifiers()
+        self.categoricals()
+        self.free_text()
+        return self.items
@@ -0,0 +1,224 @@
+# prompt_encoding.py
+
+import math
+import re
+
+import pandas as pd
+
+# Default number of prompt tokens the summary is allowed to use
+DEFAULT_TOKEN_BUDGET = 6000
+
+# Short keys for the standardized column names and the computed statistics.
+# Repeated keys are written once in the table header, so shorter is cheaper.
+ABBREVIATIONS = {
+    'Booking': 'bk',
+    'PAX': 'pax',
+    'Chauffer': 'chf',
+    'Pickup': 'pu',
+    'Dropoff': 'do',
+    'Price': 'price',
+    'Date': 'date',
+    'Notes': 'note',
+    'Total_Bookings': 'n',
+    'Average_Earning': 'avg',
+    'Total_Earning': 'total',
+    'Count': 'n',
+    'Percentage': 'pct',
+    'chauffeur': 'chf',
+    'rides': 'n',
+    'revenue': 'rev',
+    'pickup': 'pu',
+    'dropoff': 'do',
+}
+
+# Words, digit runs and single punctuation marks, roughly how BPE tokenizers split text
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+def estimate_tokens(text):
+    """
+    Estimate how many tokens a piece of text costs in an LLM prompt.
+
+    This is an approximation of a BPE tokenizer (words of up to ~6 letters are
+    one token, digits are grouped in threes, punctuation is one token each),
+    which is close enough to compare two renderings of the same data.
+
+    Args:
+        text (str): The text to measure
+
+    Returns:
+        int: Estimated token count
+    """
+    tokens = 0
+    for piece in _TOKEN_PATTERN.findall(text):
+        if piece.isdigit():
+            tokens += math.ceil(len(piece) / 3)
+        elif piece.isalpha():
+            tokens += math.ceil(len(piece) / 6)
+        else:
+            tokens += 1
+    return tokens
+
+
+def format_value(value, digits=2):
+    """
+    Format a single cell for the prompt: numbers are rounded and written
+    without thousands separators or trailing zeros, text is flattened to one line.
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ''
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, (int, float)) or pd.api.types.is_number(value):
+        value = round(float(value), digits)
+        if value.is_integer():
+            return str(int(value))
+        return f"{value:.{digits}f}".rstrip('0').rstrip('.')
+    # Pipes and newlines would break the table layout
+    return ' '.join(str(value).split()).replace('|', '/')
+
+
+class PromptTable:
+    """
+    A block of tabular data inside the summary.
+
+    The table is rendered with a single header row of abbreviated column keys
+    instead of repeating "Column: value" for every row. The legacy prose layout
+    can still be produced, which is only used to report the token savings.
+    """
+
+    def __init__(self, title, df, digits=2, droppable=False, record_label=None, include_index=True):
+        """
+        Args:
+            title (str): Heading written above the table
+            df (DataFrame): The rows to render
+            digits (int): Decimal places for numeric cells
+            droppable (bool): Whether rows may be cut to stay within the token budget
+            record_label (str, optional): Label used for each row in the prose layout
+            include_index (bool): Whether the DataFrame index is written as the first column
+        """
+        self.title = title
+        self.df = df.reset_index() if include_index else df
+        self.digits = digits
+        self.droppable = droppable
+        self.record_label = record_label
+        self.max_rows = None
+
+    def _keys(self):
+        return [ABBREVIATIONS.get(str(col), str(col)) for col in self.df.columns]
+
+    def _legend(self):
+        pairs = [
+            f"{key}={col}" for key, col in zip(self._keys(), self.df.columns)
+            if key.lower() != str(col).lower()
+        ]
+        return f" ({', '.join(pairs)})" if pairs else ''
+
+    def render(self, digits=None):
+        """Render the table with one header row and pipe-separated cells."""
+        digits = self.digits if digits is None else digits
+        rows = self.df if self.max_rows is None else self.df.head(self.max_rows)
+
+        lines = [f"{self.title}{self._legend()}:", '|'.join(self._keys())]
+        # Format column by column so the work is vectorized per column
+        cells = [rows[col].map(lambda v: format_value(v, digits)) for col in rows.columns]
+        if cells:
+            lines.extend('|'.join(row) for row in zip(*cells))
+
+        omitted = len(self.df) - len(rows)
+        if omitted > 0:
+            lines.append(f"... {omitted} more rows omitted")
+        return '\n'.join(lines)
+
+    def render_prose(self):
+        """Render the table the way the summary used to: one 'Column: value' line per cell."""
+        lines = [f"{self.title}:"]
+        for position, row in enumerate(self.df.itertuples(index=False), start=1):
+            if self.record_label:
+                lines.append(f"\n{self.record_label} ({position}):")
+            else:
+                lines.append('')
+            for col, value in zip(self.df.columns, row):
+                if pd.notna(value) and str(value).strip():
+                    lines.append(f"{col}: {value}")
+        return '\n'.join(lines)
+
+
+class CompactPromptRenderer:
+    """
+    Turns a summary (a list of text lines and PromptTable blocks) into prompt
+    text that fits within a token budget, and reports the token savings.
+    """
+
+    def __init__(self, token_budget=DEFAULT_TOKEN_BUDGET):
+        """
+        Args:
+            token_budget (int): Maximum number of prompt tokens the rendered summary may use
+        """
+        self.token_budget = token_budget
+        self.report = {}
+
+    def _join(self, items, digits=None):
+        return '\n'.join(
+            item.render(digits) if isinstance(item, PromptTable) else str(item)
+            for item in items
+        )
+
+    def render(self, items):
+        """
+        Render the summary items to text within the token budget.
+
+        Numbers are rounded further first; if that is not enough, rows are cut
+        from the droppable tables, largest table first.
+
+        Args:
+            items (list): Summary lines (str) and PromptTable blocks
+
+        Returns:
+            str: The rendered summary
+        """
+        tables = [item for item in items if isinstance(item, PromptTable)]
+        for table in tables:
+            table.max_rows = None
+
+        tokens_before = estimate_tokens('\n'.join(
+            item.render_prose() if isinstance(item, PromptTable) else str(item)
+            for item in items
+        ))
+
+        digits = None
+        text = self._join(items)
+        tokens = estimate_tokens(text)
+
+        # Step 1: drop decimals everywhere
+        if tokens > self.token_budget:
+            digits = 0
+            text = self._join(items, digits)
+            tokens = estimate_tokens(text)
+
+        # Step 2: trim rows from droppable tables until the text fits
+        droppable = sorted(
+            (table for table in tables if table.droppable),
+            key=lambda table: len(table.df),
+            reverse=True,
+        )
+        for table in droppable:
+            if tokens <= self.token_budget:
+                break
+            table_tokens = estimate_tokens(table.render(digits))
+            per_row = max(table_tokens / max(len(table.df), 1), 1)
+            table.max_rows = len(table.df)
+            # The per-row cost is an average, so repeat until the text really fits
+            while tokens > self.token_budget and table.max_rows > 0:
+                rows_to_cut = math.ceil((tokens - self.token_budget) / per_row)
+                table.max_rows = max(table.max_rows - rows_to_cut, 0)
+                text = self._join(items, digits)
+                tokens = estimate_tokens(text)
+
+        self.report = {
+            'tokens_before': tokens_before,
+            'tokens_after': tokens,
+            'token_budget': self.token_budget,
+            'within_budget': tokens <= self.token_budget,
+        }
+        return text
@@ -0,0 +1,101 @@
+# quotas.py
+
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import TenantUsage
+from .scheduling import tenant_of
+
+
+class QuotaExceeded(Exception):
+    """The user's or their company's bucket doesn't hold enough tokens right now."""
+
+    def __init__(self, kind, scope, retry_after):
+        self.kind = kind
+        self.scope = scope
+        self.retry_after = retry_after
+        what = 'chat requests' if kind == TenantUsage.KIND_CHAT else 'uploads'
+        who = 'your company' if scope == TenantUsage.SCOPE_COMPANY else 'you'
+        super().__init__(f"Too many {what} from {who}. Try again in {math.ceil(retry_after)} seconds.")
+
+
+def bucket_limits(kind, scope):
+    """
+    (capacity, refill per second) of a bucket, or None if that quota is off.
+
+    settings.TENANT_QUOTAS gives (burst, per hour) for every kind and scope.
+    """
+    burst, per_hour = settings.TENANT_QUOTAS[kind][scope]
+    if burst <= 0 or per_hour <= 0:
+        return None
+    return float(burst), per_hour / 3600
+
+
+def _level(usage, limits, now):
+    """Tokens in a bucket now, after refilling since its last update."""
+    capacity, rate = limits
+    elapsed = max((now - usage.updated_at).total_seconds(), 0.0)
+    return min(capacity, usage.tokens + elapsed * rate)
+
+
+def available(usage):
+    """Tokens a TenantUsage bucket holds right now (None if its quota is off)."""
+    limits = bucket_limits(usage.kind, usage.scope)
+    return None if limits is None else _level(usage, limits, timezone.now())
+
+
+def consume(user, kind, cost=1.0):
+    """
+    Take cost tokens from both the user's and their company's bucket, or from neither.
+
+    Buckets refill continuously up to their burst capacity. A cost larger than
+    a bucket's capacity (a very large upload) takes a full bucket. Bucket rows
+    are locked for the update, so every worker and dyno sees the same quota.
+
+    Args:
+        user (CustomUser): Who is asking
+        kind (str): TenantUsage.KIND_CHAT or TenantUsage.KIND_INGEST
+        cost (float): Tokens needed: calls for chat, MB for ingestion
+
+    Raises:
+        QuotaExceeded: A bucket is short; nothing was consumed
+    """
+    now = timezone.now()
+    buckets = []
+    for scope, key in ((TenantUsage.SCOPE_USER, user.email), (TenantUsage.SCOPE_COMPANY, tenant_of(user))):
+        limits = bucket_limits(kind, scope)
+        if limits is not None:
+            buckets.append((scope, key, limits))
+    if not buckets:
+        return
+
+    short = None
+    with transaction.atomic():
+        rows = []
+        for scope, key, limits in buckets:
+            usage, _ = TenantUsage.objects.select_for_update().get_or_create(
+                kind=kind, scope=scope, key=key,
+                defaults={'tokens': limits[0], 'updated_at': now},
+            )
+            level = _level(usage, limits, now)
+            needed = min(cost, limits[0])
+            if level < needed and short is None:
+                short = (usage, scope, (needed - level) / limits[1])
+            rows.append((usage, level, needed))
+
+        if short is None:
+            for usage, level, needed in rows:
+                usage.tokens = level - needed
+                usage.updated_at = now
+                usage.used += cost
+                usage.last_used_at = now
+                usage.save(update_fields=['tokens', 'updated_at', 'used', 'last_used_at'])
+
+    if short is not None:
+        usage, scope, retry_after = short
+        TenantUsage.objects.filter(pk=usage.pk).update(rejected=F('rejected') + 1)
+        raise QuotaExceeded(kind, scope, retry_after)
@@ -0,0 +1,435 @@
+# readers.py
+
+import codecs
+import csv
+import io
+import os
+import time
+from datetime import date
+
+import pandas as pd
+from django.conf import settings
+
+try:
+    import pyarrow  # noqa: F401  (only needed for pandas' pyarrow engine)
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+try:
+    import openpyxl
+except ImportError:  # Excel uploads then fail with a clear message
+    openpyxl = None
+
+# Bytes read from the start of a file to detect its format, encoding and delimiter
+SNIFF_SIZE = 64 * 1024
+
+# Lines of the first block the delimiter is sniffed from
+SNIFF_LINES = 50
+
+# Delimiters booking system exports use
+DELIMITERS = ',;\t|'
+
+# File extensions read as Excel workbooks
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm')
+
+# Rows converted to a DataFrame at a time while streaming a worksheet
+EXCEL_CHUNK_ROWS = 50000
+
+# read_csv options the pyarrow engine doesn't support; the C engine is used when one is given
+_C_ENGINE_ONLY = {'nrows', 'chunksize', 'iterator', 'skipfooter', 'low_memory', 'converters'}
+
+_ZIP_MAGIC = b'PK\x03\x04'
+
+# pyarrow infers ISO timestamps and dates where the C engine keeps text, which would make
+# the summary depend on the engine. Dates are parsed after the columns are standardized
+# (aggregates.parse_dates). Timestamp inference is turned off by allowing only a format no
+# value has; date-only columns still come back as datetime.date objects and are turned
+# back into their text by _dates_as_text.
+_NO_TIMESTAMP_INFERENCE = '%Y-%m-%d (no timestamp inference)'
+
+
+class TableFormat:
+    """How a tabular file is written, as detected from its first block by sniff_format."""
+
+    def __init__(self, kind='csv', encoding='utf-8', delimiter=',', quotechar='"', multiline=False):
+        """
+        Args:
+            kind (str): 'csv' or 'excel'
+            encoding (str): Text encoding of a CSV
+            delimiter (str): Field delimiter of a CSV
+            quotechar (str): Quote character of a CSV
+            multiline (bool): Whether quoted CSV values contain line breaks
+        """
+        self.kind = kind
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.quotechar = quotechar
+        self.multiline = multiline
+
+    @property
+    def is_excel(self):
+        return self.kind == 'excel'
+
+    def read_csv_kwargs(self):
+        """
+        Options that make pd.read_csv read this CSV. The encoding is sniffed from
+        the first block only, so bytes further on that don't decode are replaced
+        (U+FFFD) instead of failing the read.
+        """
+        return {'sep': self.delimiter, 'encoding': self.encoding, 'quotechar': self.quotechar,
+                'encoding_errors': 'replace'}
+
+    def __repr__(self):
+        if self.is_excel:
+            return 'TableFormat(excel)'
+        return f'TableFormat(csv, encoding={self.encoding}, delimiter={self.delimiter!r})'
+
+
+def _peek(source, size=SNIFF_SIZE):
+    """The first bytes of a path or seekable binary handle, leaving handles where they started."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return f.read(size)
+    start = source.tell()
+    block = source.read(size)
+    source.seek(start)
+    return block
+
+
+def detect_encoding(block):
+    """
+    Text encoding of a file from its first bytes.
+
+    A byte order mark wins; otherwise UTF-8 if the block decodes as UTF-8 (a
+    character cut off at the end of the block is fine), else Windows-1252, the
+    usual encoding of "Latin-1" exports, or Latin-1 itself for bytes 1252 leaves undefined.
+    """
+    if block.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if block.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(block, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    try:
+        block.decode('cp1252')
+        return 'cp1252'
+    except UnicodeDecodeError:
+        return 'latin-1'
+
+
+def sniff_delimiter(lines):
+    """Field delimiter of CSV lines (one of DELIMITERS), ',' if it can't be told."""
+    try:
+        return csv.Sniffer().sniff('\n'.join(lines[:SNIFF_LINES]), delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        return ','
+
+
+def first_lines(block, encoding, complete=False):
+    """
+    The lines of a block of a file, decoded.
+
+    Args:
+        block (bytes): The first bytes of the file
+        encoding (str): Its encoding (detect_encoding)
+        complete (bool): Whether the block is the whole file; otherwise its last,
+            probably cut off, line is dropped
+
+    Returns:
+        list: The lines, without line endings
+    """
+    text = codecs.getincrementaldecoder(encoding)(errors='replace').decode(block, final=complete)
+    lines = text.splitlines()
+    if not complete and lines and not text.endswith(('\n', '\r')):
+        lines = lines[:-1]
+    return lines
+
+
+def is_excel(name='', block=b''):
+    """Whether a file is an Excel workbook, by extension or by its zip signature."""
+    return str(name).lower().endswith(EXCEL_EXTENSIONS) or block.startswith(_ZIP_MAGIC)
+
+
+def sniff_format(source):
+    """
+    Detect whether a file is a CSV or an Excel workbook and, for a CSV, its
+    encoding, delimiter and whether quoted values span lines, from its first block.
+
+    Args:
+        source (str or file): Path or seekable binary file handle
+
+    Returns:
+        TableFormat: The detected format
+    """
+    block = _peek(source)
+    name = source if isinstance(source, (str, os.PathLike)) else getattr(source, 'name', '')
+    if is_excel(name, block):
+        return TableFormat('excel')
+
+    encoding = detect_encoding(block)
+    lines = first_lines(block, encoding, complete=len(block) < SNIFF_SIZE)
+    delimiter = sniff_delimiter(lines)
+    # A quoted value with a line break shows up as a record spanning several lines
+    records = list(csv.reader(io.StringIO('\n'.join(lines[:SNIFF_LINES * 4])), delimiter=delimiter))
+    multiline = any('\n' in field for record in records for field in record)
+    return TableFormat('csv', encoding, delimiter, multiline=multiline)
+
+
+def csv_engine(table_format, read_csv_kwargs):
+    """
+    The pd.read_csv engine for a read: pyarrow (multithreaded) when installed,
+    enabled (settings.CSV_READER_ENGINE) and able to handle the options, else C.
+
+    pyarrow splits the file into blocks parsed in parallel, which assumes records
+    don't span lines; files with multi-line quoted values are read by the C engine.
+    """
+    if settings.CSV_READER_ENGINE == 'c' or not HAS_PYARROW:
+        return 'c'
+    if table_format.multiline or _C_ENGINE_ONLY & set(read_csv_kwargs):
+        return 'c'
+    return 'pyarrow'
+
+
+def read_table(source, table_format=None, **read_csv_kwargs):
+    """
+    Read a CSV or Excel file into a DataFrame.
+
+    CSVs are read with their sniffed encoding and delimiter, by the pyarrow
+    engine where possible (see csv_engine). Excel workbooks are streamed from
+    their first worksheet (see read_excel_chunks). Handles are left where they started.
+
+    Args:
+        source (str or file): Path or seekable binary file handle
+        table_format (TableFormat, optional): The file's format; sniffed if not given
+        **read_csv_kwargs: Passed on to pd.read_csv (header, names, usecols, dtype, nrows)
+
+    Returns:
+        DataFrame: The rows
+    """
+    table_format = table_format or sniff_format(source)
+    start = source.tell() if hasattr(source, 'tell') else None
+    try:
+        if table_format.is_excel:
+            chunks = list(read_excel_chunks(source, **read_csv_kwargs))
+            return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+        options = {**table_format.read_csv_kwargs(), **read_csv_kwargs}
+        return _read_csv(source, csv_engine(table_format, options), options)
+    finally:
+        if start is not None:
+            source.seek(start)
+
+
+def _read_csv(source, engine, options):
+    """
+    pd.read_csv with the given engine. Files the pyarrow engine rejects (e.g. rows
+    with fewer fields than the header, which the C engine pads with NaN) are read
+    again with the C engine. So are files with bytes that don't decode in the
+    sniffed encoding: pyarrow ignores encoding_errors and returns such columns
+    as raw bytes.
+    """
+    if engine != 'pyarrow':
+        return pd.read_csv(source, engine=engine, **options)
+    start = source.tell() if hasattr(source, 'tell') else None
+    try:
+        frame = pd.read_csv(source, engine='pyarrow', **{'date_format': _NO_TIMESTAMP_INFERENCE, **options})
+    except pd.errors.ParserError as e:
+        print(f"pyarrow engine can't parse the file ({e}); reading it with the C engine")
+        if start is not None:
+            source.seek(start)
+        return pd.read_csv(source, engine='c', **options)
+    if _has_undecoded_bytes(frame):
+        print(f"File is not all {options.get('encoding')}; reading it with the C engine, replacing the bad bytes")
+        if start is not None:
+            source.seek(start)
+        return pd.read_csv(source, engine='c', **options)
+    return _dates_as_text(frame)
+
+
+def _has_undecoded_bytes(frame):
+    """Whether pyarrow left a column as bytes because it did not decode."""
+    for col in frame.columns[frame.dtypes == object]:
+        values = frame[col]
+        first = values.first_valid_index()
+        if first is not None and isinstance(values[first], bytes):
+            return True
+    return False
+
+
+def _dates_as_text(frame):
+    """Turn columns pyarrow read as datetime.date back into their YYYY-MM-DD text, as the C engine reads them."""
+    for col in frame.columns[frame.dtypes == object]:
+        values = frame[col]
+        first = values.first_valid_index()
+        if first is not None and type(values[first]) is date:
+            frame[col] = values.map(date.isoformat, na_action='ignore').infer_objects()
+    return frame
+
+
+def iter_chunks(source, chunksize, table_format=None, **read_csv_kwargs):
+    """
+    Read a CSV or Excel file in DataFrames of at most chunksize rows.
+
+    Args:
+        source (str or file): Path or seekable binary file handle
+        chunksize (int): Rows per chunk
+        table_format (TableFormat, optional): The file's format; sniffed if not given
+        **read_csv_kwargs: Passed on to pd.read_csv
+
+    Yields:
+        DataFrame: The next chunk
+    """
+    table_format = table_format or sniff_format(source)
+    if table_format.is_excel:
+        yield from read_excel_chunks(source, chunksize=chunksize, **read_csv_kwargs)
+        return
+    options = {**table_format.read_csv_kwargs(), **read_csv_kwargs}
+    with pd.read_csv(source, chunksize=chunksize, **options) as reader:
+        yield from reader
+
+
+def _header_names(row):
+    names, seen = [], {}
+    for position, value in enumerate(row):
+        name = str(value).strip() if value is not None else ''
+        name = name or f'Unnamed: {position}'
+        # Repeated names get .1, .2, ... like pd.read_csv does
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def read_excel_chunks(source, chunksize=EXCEL_CHUNK_ROWS, header=0, names=None, usecols=None, dtype=None,
+                      nrows=None):
+    """
+    Stream the first worksheet of an Excel workbook as DataFrames.
+
+    The workbook is opened read-only, so rows are parsed from the sheet XML as
+    they are iterated instead of building the whole workbook in memory, and
+    cells are read as their stored values (not formulas). Rows are converted to
+    columns a chunk at a time and then typed like pd.read_csv types them: the
+    requested dtypes, else numbers and dates as such and everything else as text.
+
+    Args:
+        source (str or file): Path or seekable binary file handle
+        chunksize (int): Rows per DataFrame
+        header (int or None): 0 if the first row holds the column names, None if not
+        names (list, optional): Column names to use instead
+        usecols (list, optional): Columns to keep, by name
+        dtype (str, type or dict, optional): Column types, as for pd.read_csv
+        nrows (int, optional): Rows to read at most
+
+    Yields:
+        DataFrame: The next chunk
+    """
+    if openpyxl is None:
+        raise ValueError("Reading Excel files requires openpyxl (pip install openpyxl)")
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        columns = list(names) if names is not None else None
+        if header is not None:
+            first = next(rows, None)
+            if first is None:
+                raise ValueError("The worksheet is empty")
+            if columns is None:
+                columns = _header_names(first)
+        width = len(columns) if columns is not None else None
+
+        produced = 0
+        batch = []
+        yielded = False
+        for row in rows:
+            if width is None:
+                width = len(row)
+                columns = list(range(width))
+            # Read-only sheets don't pad rows; trailing formatted-but-empty rows are skipped
+            if all(value is None for value in row):
+                continue
+            batch.append(row[:width] + (None,) * (width - len(row)))
+            produced += 1
+            if len(batch) == chunksize or produced == nrows:
+                yield _excel_frame(batch, columns, usecols, dtype)
+                yielded = True
+                batch = []
+            if produced == nrows:
+                break
+        if batch or not yielded:
+            yield _excel_frame(batch, columns or [], usecols, dtype)
+    finally:
+        workbook.close()
+
+
+def _excel_frame(rows, columns, usecols, dtype):
+    """One chunk of worksheet rows as a typed DataFrame."""
+    frame = pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+    if usecols is not None:
+        wanted = set(usecols)
+        frame = frame[[col for col in frame.columns if col in wanted]]
+    for col in frame.columns:
+        target = dtype.get(col) if isinstance(dtype, dict) else dtype
+        values = frame[col]
+        if target in (str, 'str'):
+            # Text, keeping empty cells missing as pd.read_csv does
+            frame[col] = values.astype(str).where(values.notna())
+        elif target is not None:
+            frame[col] = values.astype(target)
+        elif values.dtype == object:
+            # Mixed cells: numbers where the whole column is numeric, text otherwise
+            numbers = pd.to_numeric(values, errors='coerce')
+            if numbers.notna().sum() == values.notna().sum():
+                frame[col] = numbers
+            else:
+                frame[col] = values.where(values.isna(), values.astype(str))
+    return frame
+
+
+def benchmark(path, repeat=3):
+    """
+    Time reading a file with the previous loader (plain pd.read_csv, C engine)
+    and with read_table, each with the C and the pyarrow engine where they apply.
+
+    Args:
+        path (str): CSV or Excel file
+        repeat (int): Runs per reader; the fastest is reported
+
+    Returns:
+        list: Dicts with reader, seconds, rows and columns, fastest first
+    """
+    table_format = sniff_format(path)
+    readers = {}
+    if table_format.is_excel:
+        readers['read_table (openpyxl read-only, streamed)'] = lambda: read_table(path, table_format)
+        if openpyxl is not None:
+            readers['pd.read_excel (openpyxl)'] = lambda: pd.read_excel(path)
+    else:
+        readers['pd.read_csv (previous loader)'] = lambda: pd.read_csv(path)
+        readers['read_table, C engine'] = lambda: _read_csv(path, 'c', table_format.read_csv_kwargs())
+        if HAS_PYARROW and not table_format.multiline:
+            readers['read_table, pyarrow engine'] = lambda: _read_csv(path, 'pyarrow', table_format.read_csv_kwargs())
+        readers['sniff_format'] = lambda: sniff_format(path)
+
+    results = []
+    for name, read in readers.items():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            try:
+                result = read()
+            except Exception as e:
+                result = e
+                break
+            timings.append(time.perf_counter() - started)
+        if isinstance(result, Exception):
+            results.append({'reader': name, 'seconds': None, 'rows': None, 'columns': None, 'error': str(result)})
+            continue
+        shape = result.shape if isinstance(result, pd.DataFrame) else (None, None)
+        results.append({'reader': name, 'seconds': min(timings), 'rows': shape[0], 'columns': shape[1], 'error': ''})
+    return sorted(results, key=lambda row: float('inf') if row['seconds'] is None else row['seconds'])
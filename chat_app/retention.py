@@ -0,0 +1,232 @@
+# retention.py
+
+import os
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .models import UploadedCSV, ChunkedUpload
+from .storage import is_local, artifact_cache
+from .batch import REPORT_DIRECTORY
+from . import chunked_upload
+
+# Storage directories owned by UploadedCSV, and the file fields that point into each of them.
+# A file in one of these directories that no row refers to is an orphan.
+UPLOAD_DIRECTORIES = {
+    'csv_files': 'raw_csv',
+    'summaries': 'processed_csv',
+    'aggregates': 'aggregates',
+}
+UPLOAD_FILE_FIELDS = list(UPLOAD_DIRECTORIES.values())
+
+
+class ArtifactSweeper:
+    """
+    Deletes expired uploads, stale chunked uploads, orphaned files and old reports.
+
+    Work is done in batches of batch_size rows or files, and a single run never
+    deletes more than max_deletes files, so one sweep has bounded I/O even after
+    a long backlog has built up; the next run picks up where this one stopped.
+    """
+
+    def __init__(self, storage=None, batch_size=500, max_deletes=5000, pause=0.0,
+                 dry_run=False, retention_hours=None, log=print):
+        """
+        Args:
+            storage (Storage, optional): Storage to sweep, default_storage by default
+            batch_size (int): Rows or files handled per database query / delete batch
+            max_deletes (int): Maximum number of files deleted in this run
+            pause (float): Seconds to sleep between batches to spread the I/O
+            dry_run (bool): Only report what would be deleted
+            retention_hours (dict, optional): Overrides for settings.ARTIFACT_RETENTION_HOURS
+            log (callable): Where progress messages go
+        """
+        self.storage = storage or default_storage
+        self.batch_size = batch_size
+        self.max_deletes = max_deletes
+        self.pause = pause
+        self.dry_run = dry_run
+        self.retention = {**settings.ARTIFACT_RETENTION_HOURS, **(retention_hours or {})}
+        self.log = log
+        self.now = timezone.now()
+        self.deleted = Counter()
+
+    def cutoff(self, artifact_type):
+        """Anything of this type last touched before the returned time has expired."""
+        return self.now - timedelta(hours=self.retention[artifact_type])
+
+    @property
+    def files_left(self):
+        return self.max_deletes - self.deleted['files']
+
+    def _delete_files(self, names):
+        """Delete a batch of storage files, staying within the per-run limit."""
+        names = [name for name in names if name][:max(self.files_left, 0)]
+        for name in names:
+            if not self.dry_run:
+                try:
+                    self.storage.delete(name)
+                    artifact_cache.discard(name)
+                except Exception as e:
+                    self.log(f"Could not delete {name}: {e}")
+                    continue
+            self.deleted['files'] += 1
+        return len(names)
+
+    def _batches(self, queryset, fields):
+        """Yield lists of rows using keyset pagination, so deleted rows don't shift pages."""
+        last_id = None
+        while self.files_left > 0:
+            page = queryset.order_by('pk')
+            if last_id is not None:
+                page = page.filter(pk__gt=last_id)
+            batch = list(page.values('pk', *fields)[:self.batch_size])
+            if not batch:
+                return
+            last_id = batch[-1]['pk']
+            yield batch
+            if self.pause:
+                time.sleep(self.pause)
+
+    def _delete_upload_rows(self, rows, reason):
+        # Stay within the file budget: only remove rows whose files could all be deleted
+        allowed = []
+        for row in rows:
+            files = [row[field] for field in UPLOAD_FILE_FIELDS if row[field]]
+            if len(files) > self.files_left:
+                break
+            self._delete_files(files)
+            allowed.append(row['pk'])
+        if allowed and not self.dry_run:
+            # Files are already gone, so a bulk delete (which skips UploadedCSV.delete) is fine
+            # once the cached frames UploadedCSV.delete would discard are dropped too
+            from .frames import discard_frame  # imported here: it pulls in pandas and pyarrow
+
+            for row in rows[:len(allowed)]:
+                discard_frame(UploadedCSV(pk=row['pk'], raw_csv=row['raw_csv']))
+            UploadedCSV.objects.filter(pk__in=allowed).delete()
+        self.deleted[reason] += len(allowed)
+
+    def sweep_uploads(self):
+        """Delete processed uploads past their TTL, and uploads whose processing never finished."""
+        policies = [
+            ('uploads', UploadedCSV.objects.filter(is_processed=True)),
+            ('unprocessed_uploads', UploadedCSV.objects.filter(is_processed=False)),
+        ]
+        for artifact_type, queryset in policies:
+            expired = queryset.filter(uploaded_at__lt=self.cutoff(artifact_type))
+            for rows in self._batches(expired, UPLOAD_FILE_FIELDS):
+                self._delete_upload_rows(rows, artifact_type)
+
+    def sweep_chunked_uploads(self):
+        """Delete chunked uploads that stopped receiving chunks, and finished ones past their TTL."""
+        stale = ChunkedUpload.objects.filter(updated_at__lt=self.cutoff('chunked_uploads'))
+        for rows in self._batches(stale, []):
+            ids = [row['pk'] for row in rows]
+            for upload in ChunkedUpload.objects.filter(pk__in=ids):
+                if not self.dry_run:
+                    chunked_upload.discard(upload, self.storage)
+            if not self.dry_run:
+                ChunkedUpload.objects.filter(pk__in=ids).delete()
+            self.deleted['chunked_uploads'] += len(ids)
+
+    def _list_files(self, directory):
+        try:
+            return self.storage.listdir(directory)
+        except FileNotFoundError:
+            return [], []
+
+    def _is_past_grace(self, name, artifact_type='orphans'):
+        try:
+            return self.storage.get_modified_time(name) < self.cutoff(artifact_type)
+        except (FileNotFoundError, NotImplementedError):
+            return False
+
+    def sweep_orphans(self):
+        """
+        Reconcile the database with storage in both directions: delete files no row
+        refers to, and rows whose raw file has disappeared from storage. Each
+        directory is listed once, and references are checked in bulk per batch.
+        """
+        for directory, field in UPLOAD_DIRECTORIES.items():
+            _, files = self._list_files(directory)
+            stored = {f'{directory}/{name}' for name in files}
+
+            # Files without a row. Only old files count, so uploads in progress are left alone.
+            names = sorted(stored)
+            for start in range(0, len(names), self.batch_size):
+                if self.files_left <= 0:
+                    return
+                batch = names[start:start + self.batch_size]
+                referenced = set(
+                    UploadedCSV.objects.filter(**{f'{field}__in': batch}).values_list(field, flat=True)
+                )
+                orphans = [name for name in batch if name not in referenced and self._is_past_grace(name)]
+                self.deleted['orphan_files'] += self._delete_files(orphans)
+
+            # Rows whose raw file is gone cannot be chatted with any more. An empty listing is
+            # more likely a misconfigured storage than every file missing, so it is not trusted.
+            if field == 'raw_csv' and stored:
+                old_rows = UploadedCSV.objects.filter(uploaded_at__lt=self.cutoff('orphans'))
+                for rows in self._batches(old_rows, UPLOAD_FILE_FIELDS):
+                    dangling = [row for row in rows if row['raw_csv'] not in stored]
+                    self._delete_upload_rows(dangling, 'dangling_uploads')
+
+        # Chunk directories whose upload row no longer exists
+        directories, _ = self._list_files('chunked_uploads')
+        upload_ids = []
+        for directory in directories:
+            try:
+                upload_ids.append(uuid.UUID(directory))
+            except ValueError:
+                pass
+        known = {
+            str(pk) for pk in ChunkedUpload.objects.filter(pk__in=upload_ids).values_list('pk', flat=True)
+        }
+        for directory in directories:
+            if self.files_left <= 0:
+                return
+            path = f'chunked_uploads/{directory}'
+            _, files = self._list_files(path)
+            if directory not in known:
+                names = [f'{path}/{name}' for name in files]
+                if all(self._is_past_grace(name) for name in names):
+                    self.deleted['orphan_files'] += self._delete_files(names)
+                    files = []
+            # Local storage keeps empty directories around; remove them so listings stay small
+            if not files and not self.dry_run and is_local(self.storage):
+                try:
+                    os.rmdir(self.storage.path(path))
+                except OSError:
+                    pass
+
+    def sweep_reports(self):
+        """Delete batch question reports past their TTL."""
+        _, files = self._list_files(REPORT_DIRECTORY)
+        names = [f'{REPORT_DIRECTORY}/{name}' for name in sorted(files)]
+        for start in range(0, len(names), self.batch_size):
+            if self.files_left <= 0:
+                return
+            batch = names[start:start + self.batch_size]
+            expired = [name for name in batch if self._is_past_grace(name, 'reports')]
+            self.deleted['reports'] += self._delete_files(expired)
+            if self.pause:
+                time.sleep(self.pause)
+
+    def run(self):
+        """
+        Run every sweep.
+
+        Returns:
+            Counter: Number of files deleted and rows removed per artifact type
+        """
+        self.sweep_uploads()
+        self.sweep_chunked_uploads()
+        self.sweep_orphans()
+        self.sweep_reports()
+        return self.deleted
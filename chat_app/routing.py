@@ -0,0 +1,249 @@
+# routing.py
+
+import re
+import threading
+import time
+
+from django.conf import settings
+
+from .tracing import span
+
+# Questions asking for one figure, name or date that the summary states
+_LOOKUP = re.compile(
+    r"^\s*(?:how (?:many|much)|what(?:'s| is| was| are| were)?(?: the)? (?:total|number|count|average|mean|median|"
+    r"sum|highest|lowest|busiest|top|most|least|biggest|smallest|date|first|last|price|revenue)|"
+    r"who (?:is|was|has|had|drove|made|earned|got)|which \w+ (?:has|had|is|was|made|earned|drove|got)|"
+    r"when (?:is|was|did|does)|list|name|show|give me)\b",
+    re.I,
+)
+
+# Words that ask for reasoning over the data rather than reading it
+_ANALYTICAL = re.compile(
+    r"\b(?:why|explain\w*|compar\w*|versus|vs|trends?|patterns?|insights?|recommend\w*|suggest\w*|should|"
+    r"improv\w*|strateg\w*|analy[sz]\w*|correlat\w*|predict\w*|forecast\w*|over time|chang\w*|growth|"
+    r"impact|caus\w*|relationship|differen\w*|better|worse|overall|summari[sz]\w*|what if|anomal\w*|unusual)\b",
+    re.I,
+)
+
+# Questions longer than this go to the large model whatever their shape
+MAX_LOOKUP_WORDS = 20
+
+# Words too common to pick summary sections by
+_STOPWORDS = frozenset(
+    'the and for are was were how many much what which who when where with that this from does did has had '
+    'have there their them than then any all per each give show list name tell about total number count '
+    'most least top highest lowest biggest smallest file data'.split()
+)
+
+# Question words and the words the summary uses for the same thing
+_SYNONYMS = {
+    'ride': ('booking', 'trip', 'rows'),
+    'trip': ('booking', 'ride', 'rows'),
+    'booking': ('ride', 'trip', 'rows'),
+    'driver': ('chauffer', 'chauffeur', 'chf'),
+    'chauffeur': ('chauffer', 'chf'),
+    'revenue': ('price', 'sum', 'earn'),
+    'earn': ('price', 'revenue', 'sum'),
+    'money': ('price', 'revenue'),
+    'fare': ('price',),
+    'cost': ('price',),
+    'customer': ('pax', 'client'),
+    'passenger': ('pax', 'client'),
+    'client': ('pax',),
+    'location': ('pickup', 'dropoff', 'route'),
+    'airport': ('pickup', 'dropoff', 'route'),
+    'day': ('weekday', 'daily', 'date'),
+    'busiest': ('weekday', 'month', 'route'),
+    'month': ('monthly', 'date'),
+    'missing': ('missing', 'issue'),
+    'duplicate': ('duplicat', 'issue'),
+}
+
+_WORD = re.compile(r"[a-z]{3,}")
+
+# Summary blocks kept whatever the question: the title and the dataset size
+HEADER_BLOCKS = 2
+
+
+def classify(question, client=None):
+    """
+    Decide whether a question is a simple lookup or needs analysis.
+
+    Local heuristics decide most questions: analytical wording or length send a
+    question to the large model, a lookup shape ("how many", "who has the
+    most", ...) to the small one. Questions neither matches are asked of
+    settings.ROUTER_CLASSIFIER_MODEL if one is set, else sent to the large model.
+
+    Args:
+        question (str): The user's question
+        client (Groq, optional): Client to reuse for the classifier model
+
+    Returns:
+        tuple: (route, reason), route being 'small' or 'large'
+    """
+    words = question.split()
+    match = _ANALYTICAL.search(question)
+    if match:
+        return 'large', f'asks to {match.group(0).lower()}'
+    if len(words) > MAX_LOOKUP_WORDS:
+        return 'large', f'{len(words)} words'
+    if question.count('?') > 1:
+        return 'large', 'several questions'
+    if _LOOKUP.search(question):
+        return 'small', 'lookup'
+    if settings.ROUTER_CLASSIFIER_MODEL:
+        return classify_with_model(question, client)
+    return 'large', 'not a recognized lookup'
+
+
+def classify_with_model(question, client=None):
+    """Ask the classifier model whether a question is a lookup; 'large' if it can't tell."""
+    from .Chatbot import Chatbot
+
+    classifier = Chatbot(model=settings.ROUTER_CLASSIFIER_MODEL, client=client)
+    prompt = f"""Classify this question about a summary of a data file.
+                Answer "simple" if it asks for one figure, name or date that can be read straight from the summary.
+                Answer "analytical" if it needs comparing, explaining or reasoning over several figures.
+                Answer with that one word only.
+                Question: {question}"""
+    answer = classifier.generate_response(prompt).strip().lower()
+    if answer.startswith('simple'):
+        return 'small', 'classifier'
+    return 'large', 'classifier' if answer.startswith('analytical') else 'classifier unsure'
+
+
+def _terms(text):
+    """Lowercase words of a question and their synonyms, without stopwords or a plural s."""
+    terms = set()
+    for word in _WORD.findall(text.lower()):
+        if word in _STOPWORDS:
+            continue
+        word = word[:-1] if word.endswith('s') and len(word) > 3 else word
+        terms.add(word)
+        # Synonyms of the word's stem too (earned -> earn, drivers -> driver)
+        for stem, synonyms in _SYNONYMS.items():
+            if word.startswith(stem):
+                terms.add(stem)
+                terms.update(synonyms)
+    return terms
+
+
+def trim_context(summary, question, token_budget):
+    """
+    Keep the parts of a summary a lookup question is about, within a token budget.
+
+    The summary is split into its blank-line separated sections. The title and
+    dataset size are always kept; the other sections are ranked by how many of
+    the question's words (and their synonyms) they mention and kept best first
+    while they fit, in their original order.
+
+    Args:
+        summary (str): The upload's summary
+        question (str): The question it should answer
+        token_budget (int): Most prompt tokens the trimmed summary may use
+
+    Returns:
+        str: The trimmed summary
+    """
+    from .prompt_encoding import estimate_tokens  # imported here: it pulls in pandas
+
+    blocks = [block for block in re.split(r'\n\s*\n', summary.strip()) if block.strip()]
+    costs = [estimate_tokens(block) for block in blocks]
+    if sum(costs) <= token_budget:
+        return summary
+
+    terms = _terms(question)
+    kept = set(range(min(HEADER_BLOCKS, len(blocks))))
+    used = sum(costs[position] for position in kept)
+    scores = {
+        position: sum(term in blocks[position].lower() for term in terms)
+        for position in range(len(kept), len(blocks))
+    }
+    # Best matching sections first; with no match at all, the sections in summary order
+    ranked = sorted(scores, key=lambda position: (-scores[position], position))
+    if any(scores.values()):
+        ranked = [position for position in ranked if scores[position]]
+    for position in ranked:
+        if used + costs[position] <= token_budget:
+            kept.add(position)
+            used += costs[position]
+    return '\n\n'.join(blocks[position] for position in sorted(kept))
+
+
+class RouteStats:
+    """Answer latency per route in this process, to estimate what the small model saves."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = {'small': 0, 'large': 0}
+        self.seconds = {'small': 0.0, 'large': 0.0}
+
+    def record(self, route, seconds):
+        with self._lock:
+            self.count[route] += 1
+            self.seconds[route] += seconds
+
+    def mean(self, route):
+        with self._lock:
+            return self.seconds[route] / self.count[route] if self.count[route] else None
+
+
+route_stats = RouteStats()
+
+
+def ask(context, question, general=False, client=None):
+    """
+    Answer a question about an upload, on the model its kind of question needs.
+
+    Lookups go to settings.ROUTER_SMALL_MODEL with the summary trimmed to
+    settings.ROUTER_SMALL_CONTEXT_TOKENS; everything else goes to
+    settings.ROUTER_LARGE_MODEL with the whole summary. The decision, the
+    context tokens saved and the time saved against the large model's average
+    answer so far are logged.
+
+    Args:
+        context (str): The upload's summary
+        question (str): The user's question
+        general (bool): Whether the summary is a general CSV profile
+        client (Groq, optional): Client to reuse
+
+    Returns:
+        str: The answer (an 'Error: ...' text if the API call failed, as Chatbot.generate_response)
+    """
+    from .Chatbot import Chatbot
+    from .prompt_encoding import estimate_tokens
+
+    if settings.ROUTER_ENABLED:
+        route, reason = classify(question, client)
+    else:
+        route, reason = 'large', 'routing off'
+    with span('router.ask', route=route, reason=reason) as route_span:
+        full_tokens = estimate_tokens(context)
+        if route == 'small':
+            model = settings.ROUTER_SMALL_MODEL
+            context = trim_context(context, question, settings.ROUTER_SMALL_CONTEXT_TOKENS)
+        else:
+            model = settings.ROUTER_LARGE_MODEL
+        context_tokens = estimate_tokens(context) if route == 'small' else full_tokens
+
+        start = time.perf_counter()
+        chatbot = Chatbot(context_text=context, model=model, general=general, client=client)
+        answer = chatbot.generate_response(question)
+        seconds = time.perf_counter() - start
+        if not answer.startswith('Error: '):
+            route_stats.record(route, seconds)
+
+        large_mean = route_stats.mean('large')
+        saved = large_mean - seconds if route == 'small' and large_mean is not None else None
+        if route_span is not None:
+            route_span.set(
+                model=model, context_tokens=context_tokens, context_tokens_saved=full_tokens - context_tokens,
+                seconds_saved=None if saved is None else round(saved, 3),
+            )
+    savings = 'no large-model answers yet to compare' if saved is None else f"~{saved:.2f}s saved"
+    if route == 'small':
+        print(f"Routed question to {model} ({reason}): {context_tokens} of {full_tokens} context tokens, "
+              f"{seconds:.2f}s, {savings}")
+    else:
+        print(f"Routed question to {model} ({reason}): {full_tokens} context tokens, {seconds:.2f}s")
+    return answer
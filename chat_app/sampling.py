@@ -0,0 +1,300 @@
+# sampling.py
+
+import io
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from .prompt_encoding import PromptTable
+from .aggregates import parse_dates, WEEKDAYS
+from .readers import iter_chunks
+
+# Rows kept in the reservoir the preview summary is computed from
+PREVIEW_SAMPLE_ROWS = 20000
+
+# Rows parsed per chunk while sampling
+READ_CHUNK_ROWS = 100000
+
+# z value of the confidence intervals shown in the preview (95%)
+CONFIDENCE_Z = 1.96
+
+# Rows listed in the per-chauffeur and per-category estimate tables
+PREVIEW_TOP_ROWS = 15
+
+
+def reservoir_sample(source, k=PREVIEW_SAMPLE_ROWS, chunksize=READ_CHUNK_ROWS, seed=None, table_format=None,
+                     **read_csv_kwargs):
+    """
+    Uniform random sample of k rows, taken in a single pass over the CSV or Excel file.
+
+    Every row gets a random priority and the k rows with the smallest priorities
+    are kept. This is the vectorized equivalent of reservoir sampling: memory
+    stays bounded by one chunk plus the reservoir, whatever the file size.
+
+    Args:
+        source (str or file): Path or seekable binary file handle
+        k (int): Sample size
+        chunksize (int): Rows parsed at a time
+        seed (int, optional): Seed for reproducible samples
+        table_format (TableFormat, optional): The file's format (readers.sniff_format)
+        **read_csv_kwargs: Passed on to pd.read_csv
+
+    Returns:
+        tuple: (sample DataFrame in file order, total number of rows in the file)
+    """
+    start = source.tell() if hasattr(source, 'tell') else None
+    rng = np.random.default_rng(seed)
+    reservoir, keys, total_rows = None, None, 0
+
+    for chunk in iter_chunks(source, chunksize, table_format, **read_csv_kwargs):
+        total_rows += len(chunk)
+        chunk_keys = rng.random(len(chunk))
+        if reservoir is None:
+            reservoir, keys = chunk, chunk_keys
+        else:
+            reservoir = pd.concat([reservoir, chunk])
+            keys = np.concatenate([keys, chunk_keys])
+        if len(reservoir) > k:
+            keep = np.sort(np.argpartition(keys, k)[:k])
+            reservoir, keys = reservoir.iloc[keep], keys[keep]
+
+    if start is not None:
+        source.seek(start)
+    if reservoir is None:
+        return pd.DataFrame(), 0
+    return reservoir.reset_index(drop=True), total_rows
+
+
+def leading_bytes(source, max_bytes):
+    """
+    The first max_bytes of a CSV file, cut after the last complete line.
+
+    Lets the preview sample a bounded part of a huge upload instead of reading
+    all of it inside the request. The source position is left unchanged.
+
+    Args:
+        source (str or file): Path or seekable binary file handle
+        max_bytes (int): Most bytes to read
+
+    Returns:
+        tuple: (source to sample from, share of the file's bytes it holds); the
+        source itself and 1.0 when the whole file fits in max_bytes
+    """
+    if hasattr(source, 'read'):
+        start = source.tell()
+        source.seek(0, os.SEEK_END)
+        size = source.tell() - start
+        source.seek(start)
+        if size <= max_bytes:
+            return source, 1.0
+        block = source.read(max_bytes)
+        source.seek(start)
+    else:
+        size = os.path.getsize(source)
+        if size <= max_bytes:
+            return source, 1.0
+        with open(source, 'rb') as f:
+            block = f.read(max_bytes)
+    block = block[:block.rfind(b'\n') + 1] or block
+    return io.BytesIO(block), len(block) / size
+
+
+def margin_of_error(std, n, total_rows):
+    """
+    Half-width of the confidence interval of a sample mean, with the finite
+    population correction (the margin is 0 when the sample is the whole file).
+    """
+    if n < 2 or total_rows <= 1:
+        return 0.0 if n >= total_rows else float('nan')
+    fpc = math.sqrt(max(total_rows - n, 0) / (total_rows - 1))
+    return CONFIDENCE_Z * std / math.sqrt(n) * fpc
+
+
+class SampleEstimator:
+    """
+    Estimates dataset-wide figures from a uniform sample, each with a 95%
+    confidence margin (reported as a `<name>_moe` column or a "± x" suffix).
+    Output is a list of summary items (text lines and PromptTable blocks) for
+    DataSummarizer, like GeneralProfiler.
+    """
+
+    def __init__(self, sample, total_rows, roles=None, scanned_share=1.0):
+        """
+        Args:
+            sample (DataFrame): Uniform sample of the rows, with standardized or typed columns
+            total_rows (int): Number of rows in the whole file (estimated if only part was scanned)
+            roles (dict, optional): Column roles of a general profile (see profiling.infer_roles)
+            scanned_share (float): Share of the file's bytes the sample was drawn from
+        """
+        self.sample = sample
+        self.n = len(sample)
+        self.total_rows = total_rows
+        self.roles = roles or {}
+        self.scanned_share = scanned_share
+        self.items = []
+
+    @property
+    def is_exact(self):
+        return self.n >= self.total_rows
+
+    def moe(self, std):
+        return margin_of_error(std, self.n, self.total_rows)
+
+    def total(self, values):
+        """Estimated file-wide sum of a per-row value (missing values count as 0), and its margin."""
+        values = values.fillna(0)
+        return self.total_rows * values.mean(), self.total_rows * self.moe(values.std())
+
+    def mean(self, values):
+        """Estimated mean of the non-missing values, and its margin."""
+        values = values.dropna()
+        if len(values) < 2:
+            return values.mean(), float('nan')
+        fpc_rows = self.total_rows * len(values) / self.n
+        return values.mean(), margin_of_error(values.std(), len(values), fpc_rows)
+
+    def header(self):
+        self.items.append("APPROXIMATE SUMMARY (preview)")
+        self.items.append(
+            f"Figures are estimated from a uniform random sample of {self.n} of {self.total_rows} rows. "
+            f"'± x' and *_moe columns are 95% confidence margins. An exact summary replaces this one "
+            f"automatically when processing finishes."
+        )
+        if self.scanned_share < 1:
+            self.items[-1] += (
+                f" The sample comes from the first {self.scanned_share:.0%} of the file and the row count "
+                f"is estimated from the file size, so trends over the file's order may be missed."
+            )
+
+    def missing_values(self):
+        missing = self.sample.isnull().mean()
+        missing = missing[missing > 0]
+        if missing.empty:
+            return
+        table = pd.DataFrame({
+            'missing_pct': missing * 100,
+            'missing_pct_moe': [self.moe(math.sqrt(p * (1 - p) * self.n / (self.n - 1))) * 100
+                                if self.n > 1 else float('nan') for p in missing],
+        }).rename_axis('column')
+        self.items.append(PromptTable("\nEstimated Missing Values", table, digits=1))
+
+    def group_estimates(self, keys, values):
+        """
+        Estimated row count, total and mean of values per group, with margins, in one grouped pass.
+
+        Counts and totals are means of per-row indicators (1 if the row is in the
+        group, times the value for totals) scaled to the whole file, so their
+        margins come from the indicator variances.
+        """
+        n, total_rows = self.n, self.total_rows
+        values = values.astype(float)
+        frame = pd.DataFrame({'key': keys, 'y': values.fillna(0), 'y2': values.fillna(0) ** 2,
+                              'priced': values.notna(), 'y_priced': values})
+        grouped = frame.groupby('key', observed=True)
+        stats = grouped.agg(count=('y', 'size'), total=('y', 'sum'), squares=('y2', 'sum'),
+                            priced=('priced', 'sum'), mean=('y_priced', 'mean'), std=('y_priced', 'std'))
+
+        share = stats['count'] / n
+        share_std = np.sqrt(share * (1 - share) * n / max(n - 1, 1))
+        total_std = np.sqrt(((stats['squares'] - stats['total'] ** 2 / n) / max(n - 1, 1)).clip(lower=0))
+
+        fpc = math.sqrt(max(total_rows - n, 0) / (total_rows - 1)) if total_rows > 1 else 0.0
+        scale = CONFIDENCE_Z / math.sqrt(max(n, 1)) * fpc
+        group_fpc = np.sqrt((1 - stats['priced'] / (total_rows * share)).clip(lower=0))
+
+        return pd.DataFrame({
+            'rides': total_rows * share,
+            'rides_moe': total_rows * share_std * scale,
+            'revenue': total_rows * stats['total'] / n,
+            'revenue_moe': total_rows * total_std * scale,
+            'avg_price': stats['mean'],
+            'avg_price_moe': CONFIDENCE_Z * stats['std'] / np.sqrt(stats['priced'].clip(lower=1)) * group_fpc,
+        }).sort_values('revenue', ascending=False)
+
+    def chauffeur_items(self):
+        """Estimates for the chauffeur booking schema."""
+        df = self.sample
+        if 'Price' not in df.columns:
+            self.items.append("\nError: Price column not found in the dataset.")
+            return
+        price = pd.to_numeric(df['Price'], errors='coerce')
+
+        mean, mean_moe = self.mean(price)
+        total, total_moe = self.total(price)
+        self.items.append("\nEstimated Price Analysis:")
+        self.items.append(f"Average Price: ${mean:,.2f} ± {mean_moe:,.2f}")
+        self.items.append(f"Median Price (sample): ${price.median():,.2f}")
+        self.items.append(f"Total Company Earnings: ${total:,.0f} ± {total_moe:,.0f}")
+
+        if 'Chauffer' in df.columns:
+            chauffeurs = self.group_estimates(df['Chauffer'], price)
+            self.items.append(PromptTable(
+                f"\nEstimated Chauffer Performance ($, top {min(len(chauffeurs), PREVIEW_TOP_ROWS)} "
+                f"of {len(chauffeurs)} seen in the sample)",
+                chauffeurs.head(PREVIEW_TOP_ROWS).rename_axis('chauffeur'),
+                digits=0,
+            ))
+
+        if 'Date' in df.columns:
+            dates = parse_dates(df['Date'])
+            weekdays = self.group_estimates(dates.dt.day_name(), price)
+            weekdays = weekdays.reindex([day for day in WEEKDAYS if day in weekdays.index])
+            self.items.append(PromptTable(
+                "\nEstimated Rides by Day of Week ($)",
+                weekdays.drop(columns=['avg_price', 'avg_price_moe']).rename_axis('day'),
+                digits=0,
+            ))
+
+    def general_items(self):
+        """Estimates for a general CSV, driven by the inferred column roles."""
+        df = self.sample
+        self.items.append(f"\nColumns: {len(self.roles)} ({', '.join(f'{c}={r}' for c, r in self.roles.items())})")
+
+        rows = []
+        for col, role in self.roles.items():
+            if role not in ('numeric', 'monetary') or col not in df.columns:
+                continue
+            mean, mean_moe = self.mean(df[col])
+            row = {'column': col, 'mean': mean, 'mean_moe': mean_moe,
+                   'min_seen': df[col].min(), 'max_seen': df[col].max()}
+            if role == 'monetary':
+                row['sum'], row['sum_moe'] = self.total(df[col])
+            rows.append(row)
+        if rows:
+            self.items.append(PromptTable("\nEstimated Numeric Columns", pd.DataFrame(rows).set_index('column')))
+
+        money = [col for col, role in self.roles.items() if role == 'monetary' and col in df.columns]
+        values = df[money[0]] if money else pd.Series(0.0, index=df.index)
+        for col, role in self.roles.items():
+            if role != 'categorical' or col not in df.columns:
+                continue
+            table = self.group_estimates(df[col], values).sort_values('rides', ascending=False)
+            table = table.rename(columns={'rides': 'rows', 'rides_moe': 'rows_moe'})
+            if money:
+                table = table.rename(columns={'revenue': f'{money[0]}_sum', 'revenue_moe': f'{money[0]}_sum_moe'})
+                table = table.drop(columns=['avg_price', 'avg_price_moe'])
+            else:
+                table = table[['rows', 'rows_moe']]
+            self.items.append(PromptTable(
+                f"\nEstimated top values of {col}",
+                table.head(PREVIEW_TOP_ROWS).rename_axis(col),
+                digits=0,
+                droppable=True,
+            ))
+
+    def estimate(self, general=False):
+        """
+        Build the approximate summary.
+
+        Returns:
+            list: Summary items (str and PromptTable)
+        """
+        self.header()
+        self.missing_values()
+        if general:
+            self.general_items()
+        else:
+            self.chauffeur_items()
+        return self.items
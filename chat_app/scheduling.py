@@ -0,0 +1,134 @@
+# scheduling.py
+
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Tenant (see tenant_of) the current request or job works for
+current_tenant = ContextVar('current_tenant', default=None)
+
+
+def tenant_of(user):
+    """Scheduling key of a user: their company, or their email if they have none."""
+    return (getattr(user, 'company_name', '') or '').strip() or user.email
+
+
+@contextmanager
+def tenant_context(tenant):
+    """Attribute the LLM calls made inside the block to tenant."""
+    token = current_tenant.set(tenant)
+    try:
+        yield
+    finally:
+        current_tenant.reset(token)
+
+
+def tenant_weight(tenant):
+    """Share of throughput a tenant gets relative to others (settings.TENANT_WEIGHTS, 1 by default)."""
+    return max(float(settings.TENANT_WEIGHTS.get(tenant, 1)), 0.01)
+
+
+class FairQueue:
+    """
+    Weighted fair queue of pending work, ordered by virtual finish time (WFQ).
+
+    Every item gets a virtual finish tag: its tenant's previous finish tag (or
+    the current virtual time, if the tenant was idle) plus cost / weight. The
+    virtual time advances to the start tag of each item taken out. Items come
+    out in finish tag order, so a tenant with 100 queued items and
+    one with a single item alternate instead of the single item waiting behind
+    the 100, and a tenant of weight 2 gets twice the share of one of weight 1.
+    Not thread safe; callers hold their own lock.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._finish = {}
+        self._virtual_time = 0.0
+        self._order = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, tenant, item, cost=1.0):
+        start = max(self._virtual_time, self._finish.get(tenant, 0.0))
+        finish = start + max(cost, 0.0) / tenant_weight(tenant)
+        self._finish[tenant] = finish
+        heapq.heappush(self._heap, (finish, next(self._order), start, tenant, item))
+
+    def pop(self):
+        """The next item in fair order (IndexError if empty)."""
+        finish, _, start, tenant, item = heapq.heappop(self._heap)
+        self._virtual_time = max(self._virtual_time, start)
+        # A tenant whose work is all done starts from the virtual time next time
+        if self._finish.get(tenant, 0.0) <= self._virtual_time:
+            self._finish.pop(tenant, None)
+        return item
+
+    def waiting(self):
+        """Queued items per tenant."""
+        counts = {}
+        for entry in self._heap:
+            counts[entry[3]] = counts.get(entry[3], 0) + 1
+        return counts
+
+
+class FairLimiter:
+    """
+    At most `slots` concurrent holders per process; waiters get slots in weighted fair order.
+    Each process has its own limiter, so with N workers up to N * slots calls run at once
+    and fairness only holds between the calls of one process.
+
+    Used around LLM calls so that a tenant firing many requests at once (a
+    batch, several tabs, a script) only gets its fair share of the calls in
+    flight, and other tenants' calls don't queue behind all of them.
+    """
+
+    def __init__(self, slots):
+        self._condition = threading.Condition()
+        self._free = slots
+        self._queue = FairQueue()
+        self._granted = set()
+
+    @contextmanager
+    def slot(self, tenant=None, cost=1.0):
+        ticket = object()
+        with self._condition:
+            if self._free > 0 and not self._queue:
+                self._free -= 1
+            else:
+                self._queue.push(tenant, ticket, cost)
+                while ticket not in self._granted:
+                    self._condition.wait()
+                self._granted.discard(ticket)
+        try:
+            yield
+        finally:
+            with self._condition:
+                if self._queue:
+                    # Hand the slot straight to the next waiter in fair order
+                    self._granted.add(self._queue.pop())
+                    self._condition.notify_all()
+                else:
+                    self._free += 1
+
+    def waiting(self):
+        with self._condition:
+            return self._queue.waiting()
+
+
+_llm_limiter = None
+_llm_limiter_lock = threading.Lock()
+
+
+def llm_limiter():
+    """The process-wide limiter for LLM calls (settings.LLM_MAX_CONCURRENCY slots)."""
+    global _llm_limiter
+    with _llm_limiter_lock:
+        if _llm_limiter is None:
+            _llm_limiter = FairLimiter(settings.LLM_MAX_CONCURRENCY)
+        return _llm_limiter
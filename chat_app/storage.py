@@ -0,0 +1,171 @@
+# storage.py
+
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from .tracing import span, set_attributes
+
+# Size of the pieces streamed between storage and local files
+READ_SIZE = 64 * 1024
+
+
+def is_local(storage=None):
+    """Whether the storage keeps files on this machine's filesystem."""
+    storage = storage or default_storage
+    try:
+        storage.path('')
+    except NotImplementedError:
+        return False
+    return True
+
+
+def evict_lru(directory, max_bytes):
+    """
+    Remove the least recently used files (by mtime) of a cache directory until
+    it holds at most max_bytes. Files still being written (*.tmp) are left alone.
+    """
+    entries = []
+    total = 0
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except FileNotFoundError:
+            pass
+
+
+class ReadThroughCache:
+    """
+    Local disk cache in front of a remote storage backend.
+
+    Artifacts are written once under a unique name and never modified, so a
+    cached copy never goes stale; it only has to be evicted to bound disk use.
+    Least recently used files are removed first once max_bytes is exceeded.
+    """
+
+    def __init__(self, directory, max_bytes):
+        """
+        Args:
+            directory (str): Local directory holding the cached copies
+            max_bytes (int): Total size the cache may grow to before evicting
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _local_path(self, name):
+        digest = hashlib.sha1(name.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + os.path.splitext(name)[1])
+
+    def open(self, name, storage):
+        """
+        Open a cached copy of a storage object, downloading it on a miss.
+
+        Returns:
+            file: A binary file handle on the local copy
+        """
+        path = self._local_path(name)
+        try:
+            f = open(path, 'rb')
+            # Touch the file so eviction sees it as recently used
+            os.utime(path)
+            set_attributes(cache='hit')
+            return f
+        except FileNotFoundError:
+            set_attributes(cache='miss')
+
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as out, storage.open(name, 'rb') as src:
+                for chunk in src.chunks(READ_SIZE):
+                    out.write(chunk)
+            # Atomic, so concurrent readers never see a half-written copy
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self.evict()
+        return open(path, 'rb')
+
+    def discard(self, name):
+        """Drop the cached copy of an object that was deleted from storage."""
+        try:
+            os.remove(self._local_path(name))
+        except FileNotFoundError:
+            pass
+
+    def evict(self):
+        """Remove least recently used copies until the cache is within max_bytes."""
+        evict_lru(self.directory, self.max_bytes)
+
+
+artifact_cache = ReadThroughCache(settings.ARTIFACT_CACHE_DIR, settings.ARTIFACT_CACHE_MAX_BYTES)
+
+
+def open_artifact(name, storage=None):
+    """
+    Open a stored file for streaming reads.
+
+    Local storage is opened directly; remote storage is read through the local
+    cache, so hot artifacts are downloaded once per machine.
+
+    Args:
+        name (str): Storage name of the file (e.g. FieldFile.name)
+        storage (Storage, optional): Storage to read from, default_storage by default
+
+    Returns:
+        file: A binary file handle
+    """
+    storage = storage or default_storage
+    with span('storage.open', name=name, local=is_local(storage)):
+        if is_local(storage):
+            return storage.open(name, 'rb')
+        return artifact_cache.open(name, storage)
+
+
+def read_text(name, storage=None):
+    """Read a stored text artifact (e.g. a summary) as a string."""
+    with span('storage.read_text', name=name) as read_span:
+        with open_artifact(name, storage) as f:
+            data = f.read()
+        if read_span is not None:
+            read_span.set(bytes=len(data))
+        return data.decode('utf-8')
+
+
+def save_artifact(name, content, storage=None):
+    """
+    Save text or bytes to storage.
+
+    Returns:
+        str: The name the storage actually used, which may differ from the requested one
+    """
+    storage = storage or default_storage
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return storage.save(name, ContentFile(content))
+
+
+def delete_artifact(name, storage=None):
+    """Delete a stored file and its cached copy. Missing files are ignored."""
+    storage = storage or default_storage
+    if not name:
+        return
+    storage.delete(name)
+    artifact_cache.discard(name)
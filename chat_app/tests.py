@@ -1,3 +1,1000 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import re
+import shutil
+import tempfile
+import threading
+import unittest
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.core import mail
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from . import answers, batch, charts, chunked_upload, comparison, frames, jobs, leaderboard, outbox, routing, tracing
+from .aggregates import build_aggregates, load_aggregates_file, save_aggregates
+from .anomalies import price_anomalies, query_anomalies, robust_scores
+from .boot import parse_importtime, profile_imports
+from .data_processor import DataSummarizer
+from .groq_stub import StubConfig, make_server
+from .ingest import ExportIngester, find_exports
+from .loadtest import Recorder
+from .locations import location_kind, normalize_address
+from .models import ChunkedUpload, CustomUser, OutboundEmail, UploadedCSV
+from .profiling import GeneralProfiler, apply_roles, infer_roles
+from .prompt_encoding import CompactPromptRenderer, PromptTable, estimate_tokens
+from .quotas import QuotaExceeded, consume
+from .readers import SNIFF_SIZE, iter_chunks, read_table
+from .retention import ArtifactSweeper
+from .sampling import SampleEstimator, leading_bytes, margin_of_error, reservoir_sample
+from .scheduling import FairQueue
+from .storage import delete_artifact, read_text, save_artifact
+from .validation import BUILTIN_RULES, Rule, rule_from_spec, validate
+from .views import process_uploaded_csv
+
+
+def use_temporary_media(test):
+    """Point MEDIA_ROOT at a directory removed after the test."""
+    # Artifact names repeat across tests, so drop tables memoized under another MEDIA_ROOT
+    load_aggregates_file.cache_clear()
+    leaderboard._build.cache_clear()
+    comparison._compare.cache_clear()
+    answers.answer_index.cache_clear()
+    media = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, media, ignore_errors=True)
+    override = test.settings(MEDIA_ROOT=media)
+    override.enable()
+    test.addCleanup(override.disable)
+
+
+def approved_user(email='manager@example.com'):
+    return CustomUser.objects.create_user(email=email, password='pw', is_approved=True, company_name='Acme Limos')
+
+
+def aggregated_upload(rides, user=None):
+    """A processed upload whose aggregates are built from a standardized DataFrame."""
+    csv_file = UploadedCSV(user=user or approved_user(), is_processed=True)
+    csv_file.save()
+    save_aggregates(csv_file, build_aggregates(rides))
+    csv_file.save()
+    return csv_file
+
+
+class FakeGroq:
+    """Stands in for the Groq client: records every call and streams back reply, or one naming the model."""
+
+    def __init__(self, reply=None):
+        self.reply = reply
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **kwargs):
+        self.calls.append({'model': model, 'messages': messages})
+        delta = SimpleNamespace(content=self.reply or f'Answer from {model}')
+        return iter([SimpleNamespace(choices=[SimpleNamespace(delta=delta)])])
+
+
+class CompactPromptRendererTests(SimpleTestCase):
+    def test_table_has_one_header_row(self):
+        table = PromptTable("Chauffeurs", pd.DataFrame({'Chauffer': ['A', 'B'], 'Price': [10.5, 20.0]}),
+                            include_index=False)
+        self.assertEqual(table.render().splitlines(), ['Chauffeurs (chf=Chauffer):', 'chf|price', 'A|10.5', 'B|20'])
+
+    def test_droppable_rows_are_cut_to_fit_the_budget(self):
+        notes = pd.DataFrame({'Notes': [f'note number {i} about a long airport ride' for i in range(200)]})
+        items = ["Summary", PromptTable("Notes", notes, droppable=True, include_index=False)]
+        renderer = CompactPromptRenderer(token_budget=300)
+        text = renderer.render(items)
+        self.assertLessEqual(estimate_tokens(text), 300)
+        self.assertTrue(renderer.report['within_budget'])
+        self.assertIn('more rows omitted', text)
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.email = OutboundEmail.enqueue('Welcome', 'Hello', ['driver@example.com'])
+
+    def test_pending_email_is_sent(self):
+        self.assertEqual(outbox.send_pending(), (1, 0))
+        self.email.refresh_from_db()
+        self.assertEqual(self.email.status, OutboundEmail.STATUS_SENT)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failed_email_backs_off_then_fails(self):
+        broken = mock.Mock(**{'open.side_effect': OSError('SMTP down')})
+        with mock.patch.object(outbox, 'get_connection', return_value=broken):
+            self.assertEqual(outbox.send_pending(max_attempts=2), (0, 1))
+            self.email.refresh_from_db()
+            self.assertEqual(self.email.status, OutboundEmail.STATUS_PENDING)
+            self.assertGreater(self.email.next_attempt_at, timezone.now() + timedelta(seconds=outbox.RETRY_BASE_SECONDS - 5))
+
+            # Not due yet, so an immediate re-poll doesn't burn another attempt
+            self.assertEqual(outbox.send_pending(max_attempts=2), (0, 0))
+
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            self.assertEqual(outbox.send_pending(max_attempts=2), (0, 1))
+        self.email.refresh_from_db()
+        self.assertEqual((self.email.status, self.email.attempts), (OutboundEmail.STATUS_FAILED, 2))
+
+    def test_retry_delay_doubles_up_to_the_maximum(self):
+        self.assertEqual([outbox.retry_delay(n) for n in (1, 2, 3)], [30, 60, 120])
+        self.assertEqual(outbox.retry_delay(50), outbox.RETRY_MAX_SECONDS)
+
+
+class ChunkedUploadTests(TestCase):
+    CSV = b"Booking,Chauffer,Price\n1,Driver A,10\n2,Driver B,20\n3,Driver A,30\n"
+
+    def setUp(self):
+        use_temporary_media(self)
+        self.user = approved_user()
+
+    def start(self, **fields):
+        return ChunkedUpload.objects.create(user=self.user, filename='rides.csv', total_size=len(self.CSV), **fields)
+
+    def test_chunks_are_committed_in_order_and_retries_rejected(self):
+        upload = self.start()
+        chunked_upload.write_chunk(upload, 0, io.BytesIO(self.CSV[:30]))
+        self.assertEqual(upload.received_bytes, 30)
+        self.assertEqual(upload.header, ['Booking', 'Chauffer', 'Price'])
+
+        # A resent first chunk, and a chunk skipping ahead, are told where to resume
+        for offset in (0, 40):
+            with self.assertRaises(chunked_upload.OffsetMismatch) as raised:
+                chunked_upload.write_chunk(upload, offset, io.BytesIO(self.CSV[offset:offset + 10]))
+            self.assertEqual(raised.exception.expected, 30)
+
+        chunked_upload.write_chunk(upload, 30, io.BytesIO(self.CSV[30:]))
+        self.assertTrue(upload.is_complete)
+        self.assertEqual(upload.row_count, 3)
+        self.assertEqual(len(chunked_upload.committed_parts(upload, default_storage)), 2)
+
+        # The hash is taken once, while the parts are assembled
+        csv_file = chunked_upload.finalize(upload)
+        self.assertEqual(upload.sha256, hashlib.sha256(self.CSV).hexdigest())
+        self.assertEqual(csv_file.content_hash, upload.sha256)
+        with csv_file.raw_csv.open('rb') as assembled:
+            self.assertEqual(assembled.read(), self.CSV)
+
+    def test_short_rows_pass_the_sniff_but_extra_fields_do_not(self):
+        short = b"Booking,Chauffer,Price\n1,Driver A,10\n2,Driver B\n"
+        upload = ChunkedUpload.objects.create(user=self.user, filename='rides.csv', total_size=len(short))
+        chunked_upload.write_chunk(upload, 0, io.BytesIO(short))
+        self.assertTrue(upload.is_complete)
+
+        extra = b"Booking,Chauffer\n1,Driver A,10,x\n"
+        upload = ChunkedUpload.objects.create(user=self.user, filename='rides.csv', total_size=len(extra))
+        with self.assertRaises(chunked_upload.UploadError):
+            chunked_upload.write_chunk(upload, 0, io.BytesIO(extra))
+
+    def test_resent_final_chunk_answers_with_the_chat_url(self):
+        self.client.force_login(self.user)
+        started = self.client.post(
+            reverse('chunked_upload_start'),
+            json.dumps({'filename': 'rides.csv', 'size': len(self.CSV), 'analysis_mode': 'general'}),
+            content_type='application/json',
+        ).json()
+        url = reverse('chunked_upload_chunk', args=[started['upload_id']]) + '?offset=0'
+
+        first = self.client.post(url, self.CSV, content_type='text/csv')
+        self.assertEqual(first.status_code, 200, first.content)
+        self.assertIn('redirect', first.json())
+
+        again = self.client.post(url, self.CSV, content_type='text/csv')
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.json()['status'], ChunkedUpload.STATUS_COMPLETE)
+        self.assertEqual(again.json()['redirect'], first.json()['redirect'])
+
+    def test_failed_assembly_is_retried_by_a_resent_chunk_or_a_status_check(self):
+        self.client.force_login(self.user)
+        upload = self.start(analysis_mode='general')
+        url = reverse('chunked_upload_chunk', args=[upload.id])
+
+        with mock.patch.object(chunked_upload._PartStream, 'readinto', side_effect=OSError('storage down')):
+            failed = self.client.post(url + '?offset=0', self.CSV, content_type='text/csv')
+            self.assertEqual(failed.status_code, 503, failed.content)
+            # Resending the last chunk is accepted and retries the assembly
+            resent = self.client.post(url + '?offset=0', self.CSV, content_type='text/csv')
+            self.assertEqual(resent.status_code, 503, resent.content)
+        upload.refresh_from_db()
+        self.assertEqual((upload.status, upload.received_bytes), (ChunkedUpload.STATUS_UPLOADING, len(self.CSV)))
+        self.assertFalse(UploadedCSV.objects.exists())
+
+        status = self.client.get(url)
+        self.assertEqual(status.status_code, 200, status.content)
+        self.assertEqual(status.json()['status'], ChunkedUpload.STATUS_COMPLETE)
+        self.assertIn('redirect', status.json())
+        self.assertEqual(UploadedCSV.objects.get().content_hash, hashlib.sha256(self.CSV).hexdigest())
+
+
+class StorageTests(TestCase):
+    def setUp(self):
+        use_temporary_media(self)
+
+    def test_artifacts_round_trip_through_storage(self):
+        name = save_artifact('summaries/summary_1.txt', 'Dataset contains 3 rides — café')
+        self.assertEqual(read_text(name), 'Dataset contains 3 rides — café')
+        # Names are never reused, so cached copies can't go stale
+        self.assertNotEqual(save_artifact('summaries/summary_1.txt', 'again'), name)
+
+        delete_artifact(name)
+        self.assertFalse(default_storage.exists(name))
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        use_temporary_media(self)
+        self.user = approved_user()
+
+    def upload(self, age_hours):
+        csv_file = UploadedCSV(user=self.user, is_processed=True)
+        csv_file.raw_csv.save('rides.csv', ContentFile(b'Booking,Price\n1,10\n'), save=False)
+        csv_file.processed_csv.save('summary.txt', ContentFile(b'summary'), save=False)
+        csv_file.save()
+        UploadedCSV.objects.filter(pk=csv_file.pk).update(uploaded_at=timezone.now() - timedelta(hours=age_hours))
+        return csv_file
+
+    def test_expired_uploads_are_removed_with_their_files_and_frames(self):
+        old, recent = self.upload(age_hours=200), self.upload(age_hours=1)
+        with mock.patch('chat_app.frames.discard_frame') as discard_frame:
+            deleted = ArtifactSweeper(retention_hours={'uploads': 24}, log=lambda message: None).run()
+
+        self.assertEqual(deleted['uploads'], 1)
+        self.assertEqual(list(UploadedCSV.objects.values_list('pk', flat=True)), [recent.pk])
+        self.assertFalse(default_storage.exists(old.raw_csv.name))
+        self.assertTrue(default_storage.exists(recent.raw_csv.name))
+        self.assertEqual([call.args[0].pk for call in discard_frame.call_args_list], [old.pk])
+        self.assertEqual(discard_frame.call_args.args[0].raw_csv.name, old.raw_csv.name)
+
+
+class ChartTests(TestCase):
+    def setUp(self):
+        use_temporary_media(self)
+        override = self.settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'charts': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'chart-tests'},
+        })
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_lttb_keeps_the_endpoints_and_the_peak(self):
+        x = np.arange(1000, dtype=float)
+        y = np.sin(x / 50)
+        y[437] = 10
+        keep = charts.lttb(x, y, 100)
+        self.assertEqual(len(keep), 100)
+        self.assertEqual((keep[0], keep[-1]), (0, 999))
+        self.assertTrue((np.diff(keep) > 0).all())
+        self.assertIn(437, keep)
+        # Nothing to drop
+        self.assertEqual(list(charts.lttb(x[:50], y[:50], 100)), list(range(50)))
+
+    def test_rendered_chart_is_kept_in_the_shared_cache(self):
+        rides = pd.DataFrame({
+            'Chauffer': ['Driver A', 'Driver B', 'Driver A'],
+            'Price': [10, 20, 30],
+            'Date': ['2024-03-01', '2024-03-02', '2024-03-02'],
+        })
+        csv_file = aggregated_upload(rides)
+
+        spec = charts.chart_spec('chauffeur-earnings')
+        figure = charts.render_chart(csv_file, spec)
+        self.assertEqual(figure['data'][0]['x'], ['Driver A', 'Driver B'])
+        self.assertEqual(figure['data'][0]['y'], [40, 20])
+
+        with mock.patch.object(charts, 'load_aggregates') as load_aggregates:
+            self.assertEqual(charts.render_chart(csv_file, spec), figure)
+        load_aggregates.assert_not_called()
+        self.assertEqual(len(caches['charts']._cache), 1)
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        use_temporary_media(self)
+        self.csv_file = aggregated_upload(pd.DataFrame({
+            'Booking': [1, 2, 3, 4, 5],
+            'Chauffer': ['Driver A', 'Driver A', 'Driver A', 'Driver B', 'Driver B'],
+            'Price': [10, 50, 30, 100, None],
+        }))
+
+    def test_chauffeurs_are_ranked_with_their_extreme_rides(self):
+        board = leaderboard.leaderboard(self.csv_file, k=2)
+        self.assertEqual([(e['rank'], e['chauffeur'], e['rides'], e['revenue']) for e in board],
+                         [(1, 'Driver B', 1, 100), (2, 'Driver A', 3, 90)])
+        driver_a = board[1]
+        self.assertEqual([ride['Price'] for ride in driver_a['top_rides']], [50, 30])
+        self.assertEqual([ride['Price'] for ride in driver_a['bottom_rides']], [10, 30])
+        self.assertEqual([ride['Booking'] for ride in driver_a['top_rides']], [2, 3])
+
+        by_rides = leaderboard.leaderboard(self.csv_file, sort='rides')
+        self.assertEqual([entry['chauffeur'] for entry in by_rides], ['Driver A', 'Driver B'])
+
+    def test_out_of_range_parameters_are_rejected(self):
+        with self.assertRaises(ValueError):
+            leaderboard.leaderboard(self.csv_file, sort='name')
+        with self.assertRaises(ValueError):
+            leaderboard.leaderboard(self.csv_file, k=99)
+
+
+class GeneralProfilingTests(SimpleTestCase):
+    SAMPLE = pd.DataFrame({
+        'Invoice No': [f'{1000 + i}' for i in range(20)],
+        'Amount': [f'${i * 10},000.50' if i % 5 else f'({i + 1}.00)' for i in range(20)],
+        'Region': ['North', 'South'] * 10,
+        'Shipped': [f'2024-03-{day:02d}' for day in range(1, 21)],
+        'Comment': [f'customer asked for delivery number {i} before noon' for i in range(20)],
+        'Spare': [None] * 20,
+    })
+
+    def test_roles_are_inferred_from_the_sample(self):
+        self.assertEqual(infer_roles(self.SAMPLE), {
+            'Invoice No': 'id', 'Amount': 'monetary', 'Region': 'categorical',
+            'Shipped': 'datetime', 'Comment': 'text', 'Spare': 'empty',
+        })
+
+    def test_profile_covers_every_role(self):
+        roles = infer_roles(self.SAMPLE)
+        typed = apply_roles(self.SAMPLE, roles)
+        self.assertEqual(typed['Amount'].iloc[:2].tolist(), [-1.0, 10000.5])
+        self.assertNotIn('Spare', typed.columns)
+
+        text = CompactPromptRenderer(token_budget=6000).render(GeneralProfiler(typed, roles).profile())
+        self.assertIn('Rows: 20, columns: 6', text)
+        self.assertIn('Date column Shipped: 2024-03-01 to 2024-03-20', text)
+        self.assertIn('Identifier Invoice No: 20 unique, 0 duplicated values', text)
+        self.assertIn('Top values of Region (2 distinct)', text)
+
+
+class SamplingTests(SimpleTestCase):
+    CSV = ('Booking,Chauffer,Price\n' + ''.join(f'{i},Driver {i % 3},{i}\n' for i in range(1000))).encode('utf-8')
+
+    def test_reservoir_sample_is_one_bounded_pass(self):
+        source = io.BytesIO(self.CSV)
+        sample, total_rows = reservoir_sample(source, k=50, chunksize=64, seed=7)
+        self.assertEqual((len(sample), total_rows), (50, 1000))
+        self.assertEqual(source.tell(), 0)
+        self.assertTrue(sample['Booking'].is_monotonic_increasing)
+        self.assertEqual(sample['Booking'].nunique(), 50)
+
+        again, _ = reservoir_sample(source, k=50, chunksize=64, seed=7)
+        self.assertEqual(again['Booking'].tolist(), sample['Booking'].tolist())
+        whole, _ = reservoir_sample(io.BytesIO(self.CSV), k=5000)
+        self.assertEqual(len(whole), 1000)
+
+    def test_margins_shrink_to_zero_for_the_whole_file(self):
+        self.assertEqual(margin_of_error(10.0, 1000, 1000), 0.0)
+        self.assertGreater(margin_of_error(10.0, 100, 1000), margin_of_error(10.0, 500, 1000))
+
+        sample = pd.read_csv(io.BytesIO(self.CSV))
+        estimator = SampleEstimator(sample, total_rows=1000)
+        self.assertTrue(estimator.is_exact)
+        self.assertEqual(estimator.total(sample['Price']), (sum(range(1000)), 0.0))
+        text = CompactPromptRenderer(token_budget=6000).render(estimator.estimate())
+        self.assertIn('APPROXIMATE SUMMARY (preview)', text)
+        self.assertIn('Average Price: $499.50 ± 0.00', text)
+
+    def test_preview_of_a_large_csv_reads_only_the_leading_bytes(self):
+        source = io.BytesIO(self.CSV)
+        prefix, share = leading_bytes(source, len(self.CSV) // 4)
+        self.assertEqual(source.tell(), 0)
+        self.assertTrue(prefix.getvalue().endswith(b'\n'))
+        self.assertAlmostEqual(share, len(prefix.getvalue()) / len(self.CSV))
+        self.assertIs(leading_bytes(source, len(self.CSV))[0], source)
+
+        summarizer = DataSummarizer(io.BytesIO(self.CSV), mode='general')
+        text = summarizer.generate_preview(sample_rows=50, max_bytes=len(self.CSV) // 4)
+        self.assertIn('comes from the first 25% of the file', text)
+        # The first rows are a little shorter, so scaling by bytes lands slightly above the real 1000
+        total_rows = int(re.search(r'sample of 50 of (\d+) rows', text).group(1))
+        self.assertLess(abs(total_rows - 1000), 150)
+
+
+class ProgressiveSummaryTests(TestCase):
+    def setUp(self):
+        use_temporary_media(self)
+
+    def test_lost_refinements_are_picked_up_by_the_command(self):
+        csv_file = UploadedCSV(user=approved_user(), analysis_mode='general')
+        csv_file.raw_csv.save('rides.csv', ContentFile(SamplingTests.CSV), save=False)
+        csv_file.save()
+        with self.settings(PROGRESSIVE_SUMMARY_MIN_BYTES=1), mock.patch.object(jobs, 'submit') as submit, \
+                self.captureOnCommitCallbacks(execute=True):
+            process_uploaded_csv(csv_file)
+        self.assertTrue(submit.called)  # Queued in memory, then lost to a "restart"
+        csv_file.refresh_from_db()
+        self.assertFalse(csv_file.summary_is_exact)
+
+        out = io.StringIO()
+        call_command('refine_summaries', stdout=out)
+        self.assertIn('No previews waiting', out.getvalue())
+
+        call_command('refine_summaries', '--min-age', '0', stdout=out)
+        self.assertIn('Refined 1 summaries, 0 failed', out.getvalue())
+        csv_file.refresh_from_db()
+        self.assertTrue(csv_file.summary_is_exact)
+        self.assertEqual(csv_file.processed_csv.name, f'summaries/summary_{csv_file.id}.txt')
+
+
+class FrameCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.df = frames.prepare_frame(pd.DataFrame({
+            'Chauffer': ['Driver A', 'Driver B', 'Driver A'],
+            'Price': ['10', '20.5', 'n/a'],
+            'Date': ['2024-03-01', '2024-03-02', '2024-03-03'],
+        }), 'chauffeur')
+
+    def test_frames_get_analysis_types(self):
+        self.assertIsInstance(self.df['Chauffer'].dtype, pd.CategoricalDtype)
+        self.assertEqual(self.df['Price'].tolist()[:2], [10.0, 20.5])
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(self.df['Date']))
+
+    @unittest.skipIf(frames.pa is None, 'pyarrow is not installed')
+    def test_frame_written_by_one_worker_is_mapped_by_another(self):
+        frames.FrameCache(self.directory, 10 ** 8, 10 ** 8).put('1-abc', self.df)
+
+        other_worker = frames.FrameCache(self.directory, 10 ** 8, 10 ** 8)
+        shared = other_worker.get('1-abc')
+        self.assertEqual(shared['Price'].sum(), 30.5)
+        self.assertEqual(shared['Chauffer'].astype(str).tolist(), ['Driver A', 'Driver B', 'Driver A'])
+
+        other_worker.discard('1-abc')
+        self.assertIsNone(frames.FrameCache(self.directory, 10 ** 8, 10 ** 8).get('1-abc'))
+
+    def test_memory_budget_keeps_the_most_recent_frames(self):
+        size = int(self.df.memory_usage(deep=True).sum())
+        cache = frames.FrameCache(self.directory, 10 ** 8, int(size * 2.5))
+        with mock.patch.object(frames, 'pa', None):
+            for key in ('a', 'b', 'c'):
+                cache.put(key, self.df)
+            self.assertIsNone(cache.get('a'))
+            self.assertIs(cache.get('c'), self.df)
+
+    def test_frames_are_loaded_from_the_raw_file_on_first_use(self):
+        use_temporary_media(self)
+        csv_file = UploadedCSV(id=7, analysis_mode='general', column_names=None)
+        csv_file.raw_csv.save('rides.csv', ContentFile(b'Booking,Region\n1,North\n2,South\n'), save=False)
+        cache = frames.FrameCache(self.directory, 10 ** 8, 10 ** 8)
+        with mock.patch.object(frames, 'frame_cache', cache):
+            self.assertIsNone(cache.get(frames.frame_key(csv_file)))
+            df = frames.load_frame(csv_file)
+            self.assertEqual(len(df), 2)
+            self.assertIs(frames.load_frame(csv_file), cache.get(frames.frame_key(csv_file)))
+
+
+class BatchQuestionTests(TestCase):
+    def setUp(self):
+        use_temporary_media(self)
+        self.user = approved_user()
+        self.csv_file = UploadedCSV(user=self.user, is_processed=True, summary_is_exact=True)
+        self.csv_file.raw_csv.save('rides.csv', ContentFile(b'Booking,Price\n1,10\n'), save=False)
+        self.csv_file.processed_csv.save('summary.txt', ContentFile(b'Dataset contains 1 ride'), save=False)
+        self.csv_file.save()
+        self.client.force_login(self.user)
+
+    def submit(self, questions):
+        with mock.patch.object(jobs, 'submit') as submit:
+            response = self.client.post(reverse('batch_questions', args=[self.csv_file.id]),
+                                        json.dumps({'questions': questions}), content_type='application/json')
+        self.assertEqual(response.status_code, 202, response.content)
+        return response.json()['report_url'], submit.call_args
+
+    def test_batch_runs_as_a_job_and_the_report_is_polled(self):
+        report_url, job = self.submit(['How many rides?', 'Who drove most?'])
+        self.assertIs(job.args[0], batch.batch_job)
+        self.assertEqual(job.kwargs['cost'], 2)
+
+        waiting = self.client.get(report_url)
+        self.assertEqual(waiting.status_code, 202)
+        self.assertEqual(waiting['Retry-After'], str(batch.REPORT_POLL_SECONDS))
+
+        answers = {'results': [{'question': q, 'answer': f'Answer to {q}', 'ok': True, 'seconds': 0.1}
+                               for q in job.args[2]], 'seconds': 0.1}
+        with mock.patch.object(batch, 'answer_questions', return_value=answers):
+            job.args[0](*job.args[1:])
+
+        report = self.client.get(report_url)
+        self.assertEqual(report.status_code, 200)
+        self.assertIn('## 2. Who drove most?\n\nAnswer to Who drove most?', report.content.decode())
+
+    def test_failed_batch_stores_a_report_saying_why(self):
+        report_url, job = self.submit(['How many rides?'])
+        with mock.patch.object(batch, 'answer_questions', side_effect=RuntimeError('API down')):
+            with self.assertRaises(RuntimeError):
+                job.args[0](*job.args[1:])
+        self.assertIn('The batch failed: API down', self.client.get(report_url).content.decode())
+
+    def test_batch_of_a_deleted_upload_stores_a_report_and_is_not_polled_for(self):
+        report_url, job = self.submit(['How many rides?'])
+        UploadedCSV.objects.filter(id=self.csv_file.id).update(is_processed=False)
+        self.assertIsNone(job.args[0](*job.args[1:]))
+        self.assertIn('The batch failed: the upload was deleted', self.client.get(report_url).content.decode())
+
+        self.csv_file.delete()
+        self.assertEqual(self.client.get(report_url).status_code, 404)
+
+    def test_report_lost_with_its_job_is_missing_after_the_wait(self):
+        report_url, _ = self.submit(['How many rides?'])
+        with self.settings(BATCH_REPORT_WAIT_SECONDS=-1):
+            self.assertEqual(self.client.get(report_url).status_code, 404)
+
+
+class ExportIngestionTests(TestCase):
+    def setUp(self):
+        use_temporary_media(self)
+        self.user = approved_user()
+        self.exports = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.exports, ignore_errors=True)
+
+    def export(self, name, content):
+        with open(f'{self.exports}/{name}', 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    def test_exports_are_summarized_in_workers_and_duplicates_skipped(self):
+        self.export('march.csv', 'Region,Sales\nNorth,10\nSouth,20\n')
+        self.export('march_2.csv', 'Region,Sales\nNorth,10\nSouth,20\n')
+        self.export('april.csv', 'Region,Sales\nNorth,30\n')
+        self.export('notes.txt', 'not an export')
+        paths = find_exports(self.exports)
+        self.assertEqual(len(paths), 3)
+
+        results = ExportIngester(self.user, workers=2, mode='general', batch_size=1, log=lambda message: None).run(paths)
+        statuses = {result['path'].rsplit('/', 1)[-1]: result['status'] for result in results}
+        self.assertEqual(statuses, {
+            'april.csv': 'ingested', 'march_2.csv': 'skipped (duplicate in directory)', 'march.csv': 'ingested',
+        })
+        uploads = UploadedCSV.objects.filter(user=self.user, is_processed=True)
+        self.assertEqual(uploads.count(), 2)
+        for upload in uploads:
+            self.assertIn('General Dataset Profile', read_text(upload.processed_csv.name))
+
+        # A second run finds nothing new
+        again = ExportIngester(self.user, workers=1, mode='general', log=lambda message: None).run(paths)
+        self.assertEqual({result['status'] for result in again}, {'skipped (already uploaded)'})
+
+
+class LocationSummaryTests(SimpleTestCase):
+    def summarizer(self, df):
+        summarizer = DataSummarizer(io.BytesIO(b''), mode='chauffeur')
+        summarizer.df = df
+        summarizer.aggregates = build_aggregates(df)
+        return summarizer
+
+    def test_empty_dropoff_column_does_not_break_the_category_tables(self):
+        summarizer = self.summarizer(pd.DataFrame({
+            'Chauffer': ['Driver A', 'Driver B'],
+            'Price': [10, 20],
+            'Pickup': ['JFK', 'JFK Airport'],
+            'Dropoff': [float('nan')] * 2,
+        }))
+        self.assertIn('routes', summarizer.aggregates)
+        summarizer.analyze_categories()
+        titles = [item.title.strip() for item in summarizer.summary if isinstance(item, PromptTable)]
+        self.assertEqual(titles, ['Distribution for Chauffer'])
+
+    def test_saint_is_not_expanded_to_street(self):
+        self.assertEqual(normalize_address('The St. Regis New York'), 'saint regis new york')
+        self.assertEqual(location_kind(normalize_address('The St. Regis New York')), 'hotel')
+        self.assertEqual(normalize_address('2 St Marks Pl'), '2 saint marks place')
+        self.assertEqual(normalize_address('W 57th St'), 'west 57th street')
+        self.assertEqual(normalize_address('St'), 'street')
+
+
+class PriceAnomalyTests(SimpleTestCase):
+    def rides(self):
+        prices = [100, 105, 95, 110, 90, 100, 1000, 10] + [50, 52, 48, 51, 49]
+        return pd.DataFrame({
+            'Booking': range(1, 14),
+            'Chauffer': ['Driver A'] * 8 + ['Driver B'] * 5,
+            'Price': prices,
+        })
+
+    def test_far_prices_are_flagged_both_ways_against_their_chauffeur(self):
+        df = self.rides()
+        table, counts = price_anomalies(df, df['Price'], columns=['Booking', 'Chauffer'])
+        self.assertEqual(table['Booking'].tolist(), [7, 8])
+        self.assertEqual(table['direction'].tolist(), ['high', 'low'])
+        self.assertEqual(set(table['basis']), {'chauffeur'})
+        self.assertEqual(table['expected'].tolist(), [100.0, 100.0])
+        self.assertEqual(counts.to_dict(orient='records'),
+                         [{'chauffeur': 'Driver A', 'flagged': 2, 'high': 1, 'low': 1}])
+
+        self.assertEqual([ride['Booking'] for ride in query_anomalies(table, direction='low')], [8])
+        self.assertEqual(query_anomalies(table, chauffeur='driver b'), [])
+
+    def test_small_groups_get_no_baseline(self):
+        price = pd.Series([10.0, 1000.0, 12.0])
+        scores, _ = robust_scores(price, pd.Series(['A', 'A', 'A']))
+        self.assertTrue(scores.isna().all())
+
+
+class GroqStubTests(SimpleTestCase):
+    def serve(self, **options):
+        config = StubConfig(latency=0, jitter=0, tokens_per_second=0, reply_tokens=5, seed=1, **options)
+        server = make_server(config, port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        from groq import Groq
+        from .Chatbot import Chatbot
+
+        client = Groq(api_key='stub', base_url=f'http://127.0.0.1:{server.server_port}', max_retries=0)
+        return config, Chatbot(context_text='Dataset contains 3 rides', client=client)
+
+    def test_stub_answers_chat_and_column_standardization(self):
+        config, chatbot = self.serve()
+        self.assertEqual(chatbot.generate_response('How many rides?'), 'Looking at the summary, Driver')
+        self.assertEqual(chatbot.generate_response('Standardize these columns: ["Driver", "Fare"]'),
+                         '["Driver", "Fare"]')
+        self.assertEqual(config.requests, 2)
+
+    def test_stub_injects_errors(self):
+        config, chatbot = self.serve(error_rate=1.0, error_status=503)
+        self.assertTrue(chatbot.generate_response('How many rides?').startswith('Error: '))
+        self.assertEqual(config.errors, 1)
+
+
+class LoadTestRecorderTests(SimpleTestCase):
+    def test_report_has_percentiles_per_endpoint(self):
+        recorder = Recorder()
+        for ms in range(1, 101):
+            recorder.add('chat', ms / 1000, ok=ms != 100)
+        [row] = recorder.report(elapsed=10)
+        self.assertEqual((row['requests'], row['errors'], row['max'], row['rps']), (100, 1, 100, 10))
+        self.assertAlmostEqual(row['p50'], 50.5)
+
+
+class BootImportTests(SimpleTestCase):
+    def test_importtime_rows_know_who_imported_them(self):
+        rows = parse_importtime(
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       300 |        300 |     numpy\n'
+            'import time:       200 |        500 |   pandas\n'
+            'import time:       100 |        600 | chat_app.charts\n'
+        )
+        self.assertEqual([row['module'] for row in rows], ['numpy', 'pandas', 'chat_app.charts'])
+        self.assertEqual(rows[0]['importers'], ['chat_app.charts', 'pandas'])
+        self.assertEqual((rows[1]['self_ms'], rows[1]['cumulative_ms']), (0.2, 0.5))
+
+    def test_booting_the_app_imports_no_heavy_package(self):
+        profile = profile_imports()
+        self.assertEqual(profile['heavy'], {})
+        self.assertIn('chat_app.views', {row['module'] for row in profile['imports']})
+
+
+class FairQueueTests(SimpleTestCase):
+    def test_busy_tenant_alternates_with_others(self):
+        queue = FairQueue()
+        for i in range(4):
+            queue.push('Acme Limos', f'acme-{i}')
+        queue.push('Budget Cars', 'budget-0')
+        queue.push('Budget Cars', 'budget-1')
+        order = [queue.pop() for _ in range(len(queue))]
+        self.assertEqual(order, ['acme-0', 'budget-0', 'acme-1', 'budget-1', 'acme-2', 'acme-3'])
+
+    def test_weights_and_costs_set_the_share(self):
+        queue = FairQueue()
+        with self.settings(TENANT_WEIGHTS={'Acme Limos': 2}):
+            for i in range(4):
+                queue.push('Acme Limos', f'acme-{i}')
+                queue.push('Budget Cars', f'budget-{i}')
+            queue.push('Solo', 'large', cost=10)
+            order = [queue.pop() for _ in range(len(queue))]
+        # Acme gets two items through for every one of Budget's; the costly item waits its turn
+        self.assertEqual(order, ['acme-0', 'budget-0', 'acme-1', 'acme-2', 'budget-1', 'acme-3',
+                                 'budget-2', 'budget-3', 'large'])
+        self.assertEqual(queue.waiting(), {})
+
+
+class QuotaTests(TestCase):
+    QUOTAS = {
+        'chat': {'user': (2, 3600), 'company': (0, 0)},
+        'ingest': {'user': (0, 0), 'company': (0, 0)},
+    }
+
+    def test_bucket_refills_over_time(self):
+        user = approved_user()
+        start = timezone.now()
+        with self.settings(TENANT_QUOTAS=self.QUOTAS), mock.patch('chat_app.quotas.timezone.now') as now:
+            now.return_value = start
+            consume(user, 'chat')
+            consume(user, 'chat')
+            with self.assertRaises(QuotaExceeded) as raised:
+                consume(user, 'chat')
+            self.assertAlmostEqual(raised.exception.retry_after, 1.0)
+
+            # One token per second comes back, up to the burst of 2
+            now.return_value = start + timedelta(seconds=1)
+            consume(user, 'chat')
+            now.return_value = start + timedelta(hours=1)
+            consume(user, 'chat', cost=2)
+            with self.assertRaises(QuotaExceeded):
+                consume(user, 'chat')
+
+
+class TracingTests(SimpleTestCase):
+    def test_spans_nest_and_export_as_otlp(self):
+        with self.settings(TRACING_EXPORT='', TRACING_SLOW_REQUEST_MS=1):
+            with mock.patch.object(tracing, '_finish_trace') as finish:
+                with tracing.trace('GET /chat/1/', tenant='Acme Limos') as root:
+                    with tracing.span('storage.read', name='summary.txt') as read:
+                        tracing.set_attributes(bytes=120)
+                    with self.assertRaises(ValueError):
+                        with tracing.span('llm.call'):
+                            raise ValueError('bad reply')
+        finish.assert_called_once_with(root)
+        self.assertEqual([(depth, span.name) for depth, span in root.walk()],
+                         [(0, 'GET /chat/1/'), (1, 'storage.read'), (1, 'llm.call')])
+        self.assertEqual(read.attributes, {'name': 'summary.txt', 'bytes': 120})
+
+        spans = tracing.to_otlp(root)['resourceSpans'][0]['scopeSpans'][0]['spans']
+        self.assertEqual({span['traceId'] for span in spans}, {root.trace_id})
+        self.assertEqual(spans[1]['parentSpanId'], root.span_id)
+        self.assertEqual(spans[2]['status'], {'code': 2, 'message': "ValueError('bad reply')"})
+        self.assertIn({'key': 'bytes', 'value': {'intValue': '120'}}, spans[1]['attributes'])
+
+    def test_nothing_is_recorded_when_tracing_is_off(self):
+        with self.settings(TRACING_EXPORT='', TRACING_SLOW_REQUEST_MS=0):
+            with tracing.trace('GET /') as root, tracing.span('child') as child:
+                self.assertIsNone(tracing.current_span())
+        self.assertEqual((root, child), (None, None))
+
+
+class ComparisonTests(TestCase):
+    def test_tables_are_joined_with_deltas_and_growth(self):
+        before = pd.DataFrame({'chauffeur': ['Driver A', 'Driver B'], 'rides': [10, 4], 'revenue': [1000.0, 0.0]})
+        after = pd.DataFrame({'chauffeur': ['Driver A', 'Driver C'], 'rides': [12, 3], 'revenue': [1500.0, 300.0]})
+        table = comparison.compare_tables(before, after, ['chauffeur'], ['rides', 'revenue'])
+        rows = table.set_index('chauffeur')
+        self.assertEqual(rows['status'].to_dict(), {'Driver A': 'both', 'Driver B': 'gone', 'Driver C': 'new'})
+        self.assertEqual(rows['rides_delta'].to_dict(), {'Driver A': 2, 'Driver B': -4, 'Driver C': 3})
+        self.assertEqual(rows['rides_delta'].dtype, 'int64')
+        self.assertEqual(rows.loc['Driver A', 'revenue_growth'], 50.0)
+        # No growth rate from nothing
+        self.assertTrue(pd.isna(rows.loc['Driver C', 'revenue_growth']))
+
+    def test_uploads_are_compared_from_their_aggregates(self):
+        use_temporary_media(self)
+        user = approved_user()
+        march = aggregated_upload(pd.DataFrame({
+            'Chauffer': ['Driver A', 'Driver B', 'Driver A'],
+            'Price': [100, 50, 100],
+            'Date': ['2024-03-04', '2024-03-05', '2024-03-06'],
+        }), user)
+        april = aggregated_upload(pd.DataFrame({
+            'Chauffer': ['Driver A', 'Driver B', 'Driver B'],
+            'Price': [100, 80, 80],
+            'Date': ['2024-04-01', '2024-04-02', '2024-04-07'],
+        }), user)
+        tables = comparison.compare(march, april)
+
+        self.assertEqual(tables['chauffeurs']['chauffeur'].tolist(), ['Driver B', 'Driver A'])
+        self.assertEqual(tables['weekday']['day'].tolist()[:3], ['Monday', 'Tuesday', 'Wednesday'])
+        self.assertEqual(tables['daily']['date_after'].tolist()[:2], ['2024-04-01', '2024-04-02'])
+        totals = tables['totals'].set_index('metric')
+        self.assertEqual((totals.loc['revenue', 'before'], totals.loc['revenue', 'after']), (250, 260))
+
+        text = comparison.comparison_summary(march, april)
+        self.assertIn('2024-03-04 to 2024-03-06', text)
+
+
+class TableReaderTests(SimpleTestCase):
+    RAGGED = b"Booking,Price,Chauffer,Minutes,Notes\n1,a,Al,90,vip\n2,b,Al,120\n"
+    DATED = b"Booking,Date,Pickup time,Price\n1,2024-03-01,2024-03-01 08:00:00,10\n2,,2024-03-02 09:30:00,20\n"
+
+    def read(self, content, engine):
+        with self.settings(CSV_READER_ENGINE=engine):
+            return read_table(io.BytesIO(content))
+
+    def test_short_rows_are_padded_by_every_engine(self):
+        for engine in ('auto', 'c'):
+            with self.subTest(engine=engine):
+                frame = self.read(self.RAGGED, engine)
+                self.assertEqual(frame.shape, (2, 5))
+                self.assertTrue(pd.isna(frame.loc[1, 'Notes']))
+                self.assertEqual(frame['Minutes'].tolist(), [90, 120])
+
+    def test_dates_stay_text_whatever_the_engine(self):
+        frames = [self.read(self.DATED, engine) for engine in ('auto', 'c')]
+        pd.testing.assert_frame_equal(*frames)
+        self.assertEqual(frames[0]['Date'].tolist()[0], '2024-03-01')
+
+    def test_bytes_past_the_sniffed_block_that_do_not_decode_are_replaced(self):
+        rows = b''.join(b'%d,Driver A,10\n' % i for i in range(8000))
+        content = b'Booking,Chauffer,Price\n' + rows + b'8000,Caf\xe9 Driver,12\n'
+        self.assertGreater(len(content) - len(b'Caf\xe9 Driver,12\n'), SNIFF_SIZE)
+        for engine in ('auto', 'c'):
+            with self.subTest(engine=engine):
+                frame = self.read(content, engine)
+                self.assertEqual(frame['Chauffer'].tolist()[-2:], ['Driver A', 'Caf\ufffd Driver'])
+                self.assertEqual(frame['Price'].sum(), 80012)
+        with self.settings(CSV_READER_ENGINE='c'):
+            chunks = list(iter_chunks(io.BytesIO(content), 5000))
+        self.assertEqual(chunks[-1]['Chauffer'].iloc[-1], 'Caf\ufffd Driver')
+
+
+class ValidationTests(SimpleTestCase):
+    RIDES = pd.DataFrame({
+        'Booking': [1, 2, 2, 3, 4, 5],
+        'Chauffer': ['Driver A', 'Driver B', 'Driver A', ' ', 'Driver A', 'Driver B'],
+        'Price': ['10', 'ten', '30', '-5', '7000', '40'],
+        'Date': ['2024-03-01', '2024-03-02', 'soon', '2024-03-03', '2099-01-01', '2024-03-04'],
+    })
+
+    def test_builtin_rules_flag_and_exclude_rows(self):
+        with self.settings(VALIDATION_RULES=[]):
+            result = validate(self.RIDES)
+        issues = result.issues.set_index('rule')
+        self.assertEqual(issues['rows'].to_dict(), {
+            'duplicate_booking': 1, 'invalid_price': 1, 'non_positive_price': 1,
+            'missing_chauffeur': 1, 'invalid_date': 1, 'future_date': 1,
+        })
+        self.assertEqual(issues.loc['invalid_price', 'examples'], '2')
+        self.assertEqual(result.issues['severity'].tolist()[:3], ['error'] * 3)
+        # Invalid prices and unreadable dates are reported but the rows are kept
+        self.assertEqual(result.excluded.tolist(), [False, False, True, True, True, False])
+        self.assertEqual(result.invalid.tolist(), [False, True, True, True, True, False])
+
+    def test_rules_declared_in_settings_run_after_the_builtin_ones(self):
+        spec = {'name': 'price_over_5000', 'column': 'Price', 'op': '>', 'value': 5000, 'exclude': True}
+        with self.settings(VALIDATION_RULES=[spec]):
+            result = validate(self.RIDES)
+        flagged = result.issues.set_index('rule').loc['price_over_5000']
+        self.assertEqual((flagged['rows'], flagged['examples'], flagged['description']), (1, '4', 'Price > 5000'))
+
+        for bad in ({'name': 'x', 'column': 'Price', 'op': '~', 'value': 1}, {'name': 'x', 'op': 'missing'}):
+            with self.assertRaises(ValueError):
+                rule_from_spec(bad)
+
+    def test_dates_with_a_utc_offset_are_checked_for_the_future(self):
+        zoned = pd.DataFrame({
+            'Booking': [1, 2, 3],
+            'Date': ['2024-03-01T10:00:00Z', '2099-03-02T10:00:00Z', '2024-03-05T09:00:00+01:00'],
+        })
+        with self.settings(VALIDATION_RULES=[]):
+            issues = validate(zoned).issues.set_index('rule')
+        self.assertEqual(issues['rows'].to_dict(), {'future_date': 1})
+        self.assertEqual(issues.loc['future_date', 'examples'], '2')
+
+        csv = (b"Booking,Chauffer,Price,Date\n1,Driver A,10,2024-03-01T10:00:00Z\n"
+               b"2,Driver B,20,2099-03-02T10:00:00Z\n3,Driver A,30,2024-03-05T09:00:00Z\n")
+        summarizer = DataSummarizer(io.BytesIO(csv), mode='chauffeur', column_names=['Booking', 'Chauffer', 'Price', 'Date'])
+        with self.settings(VALIDATION_RULES=[]):
+            text = summarizer.generate_summary()
+        self.assertIn('future_date', text)
+
+    def test_a_failing_rule_is_reported_without_stopping_the_others(self):
+        broken = Rule('broken', 'Never runs', lambda rows: 1 / 0, columns=['Price'])
+        result = validate(self.RIDES, rules=[broken] + BUILTIN_RULES)
+        issues = result.issues.set_index('rule')
+        self.assertEqual(issues.loc['broken', 'severity'], 'error')
+        self.assertEqual(issues.loc['broken', 'rows'], 0)
+        self.assertIn('Rule could not run: division by zero', issues.loc['broken', 'description'])
+        self.assertEqual(issues.loc['future_date', 'rows'], 1)
+        self.assertEqual(result.rule_errors, {'broken': 'division by zero'})
+
+
+class QuestionRoutingTests(SimpleTestCase):
+    def test_questions_are_routed_by_shape(self):
+        cases = {
+            'How many rides are in this file?': ('small', 'lookup'),
+            'Which driver earned the most?': ('small', 'lookup'),
+            'Why did revenue drop in March?': ('large', 'asks to why'),
+            'Compare Driver A and Driver B': ('large', 'asks to compare'),
+            'How many rides? Who drove most?': ('large', 'several questions'),
+            'Driver A': ('large', 'not a recognized lookup'),
+        }
+        with self.settings(ROUTER_CLASSIFIER_MODEL=''):
+            for question, route in cases.items():
+                with self.subTest(question=question):
+                    self.assertEqual(routing.classify(question), route)
+
+    def test_unplaced_questions_go_to_the_classifier_model(self):
+        with self.settings(ROUTER_CLASSIFIER_MODEL='classifier'):
+            self.assertEqual(routing.classify('Driver A', FakeGroq('Simple')), ('small', 'classifier'))
+            self.assertEqual(routing.classify('Driver A', FakeGroq('Analytical')), ('large', 'classifier'))
+
+    def test_lookups_get_a_trimmed_summary_on_the_small_model(self):
+        summary = '\n\n'.join(['Ride Summary', 'Dataset contains 3 rides'] +
+                                [f'Pickup section {i}: ' + 'airport ' * 200 for i in range(10)] +
+                                ['Chauffer Performance: Driver A 2 rides'])
+        client = FakeGroq()
+        with self.settings(ROUTER_ENABLED=True, ROUTER_SMALL_MODEL='small', ROUTER_SMALL_CONTEXT_TOKENS=200):
+            answer = routing.ask(summary, 'How many rides did each chauffeur drive?', client=client)
+        self.assertEqual(answer, 'Answer from small')
+        system = client.calls[0]['messages'][0]['content']
+        self.assertIn('Chauffer Performance', system)
+        self.assertNotIn('Pickup section', system)
+
+
+class BatchAnswerTests(TestCase):
+    def setUp(self):
+        use_temporary_media(self)
+        rides = pd.DataFrame({'Chauffer': ['Driver A', 'Driver B', 'Driver A'], 'Price': [100, 50, 100]})
+        aggregates = build_aggregates(rides)
+        aggregates['answers'] = answers.precompute_answers(aggregates)
+        self.csv_file = aggregated_upload(rides)
+        save_aggregates(self.csv_file, aggregates)
+        self.csv_file.processed_csv.save('summary.txt', ContentFile(b'Dataset contains 3 rides'), save=False)
+        self.csv_file.save()
+
+    def test_every_question_is_answered_on_one_shared_client(self):
+        client = FakeGroq()
+        questions = ['Who made the most money?', 'How many rides are there?', 'Why is Driver B behind?']
+        with mock.patch('chat_app.Chatbot.Groq', return_value=client) as groq, \
+                self.settings(ROUTER_ENABLED=True, ROUTER_CLASSIFIER_MODEL='', PRECOMPUTED_ANSWER_PHRASING=False,
+                              ROUTER_SMALL_MODEL='small', ROUTER_LARGE_MODEL='large'):
+            result = batch.answer_questions(self.csv_file, questions, max_workers=3)
+
+        groq.assert_called_once()
+        self.assertEqual([r['question'] for r in result['results']], questions)
+        self.assertEqual([r['answer'] for r in result['results']], [
+            'Driver A made the most money: $200.00 from 2 rides.', 'Answer from small', 'Answer from large',
+        ])
+        self.assertTrue(all(r['ok'] for r in result['results']))
+        # The precomputed answer needed no API call
+        self.assertEqual(sorted(call['model'] for call in client.calls), ['large', 'small'])
+        for call in client.calls:
+            self.assertIn('Dataset contains 3 rides', call['messages'][0]['content'])
+
+
+class PrecomputedAnswerTests(TestCase):
+    RIDES = pd.DataFrame({
+        'Chauffer': ['Driver A', 'Driver 3', 'Driver A', "O'Brien"],
+        'Price': [100, 50, 100, 75],
+        'Date': ['2024-02-27', '2024-03-01', '2024-03-04', '2024-03-05'],
+    })
+
+    def setUp(self):
+        use_temporary_media(self)
+        aggregates = build_aggregates(self.RIDES)
+        self.answers = answers.precompute_answers(aggregates)
+        aggregates['answers'] = self.answers
+        self.csv_file = aggregated_upload(self.RIDES)
+        save_aggregates(self.csv_file, aggregates)
+        self.csv_file.save()
+
+    def test_answers_survive_the_aggregates_round_trip(self):
+        index = answers.answer_index(self.csv_file.aggregates.name)
+        self.assertEqual(len(self.answers), sum(len(keyed) for keyed in index.values()))
+        self.assertEqual(index['chauffeur_rides']['obrien'], "O'Brien completed 1 rides in total.")
+
+    def test_questions_match_their_template_and_key(self):
+        index = answers.answer_index(self.csv_file.aggregates.name)
+        cases = {
+            'Who made the most money?': ('top_earner', 'Driver A made the most money: $200.00 from 2 rides.'),
+            'Can you tell me how many rides did driver 3 do last month, please?': (
+                'chauffeur_rides_last_month',
+                'Driver 3 completed 1 rides in March 2024, the last month in the data, for $50.00.',
+            ),
+            "How much did O'Brien earn?": (
+                'chauffeur_revenue', "O'Brien earned $75.00 in total from 1 rides ($75.00 per ride on average).",
+            ),
+            'What is the busiest day?': ('busiest_weekday', 'Tuesday is the busiest day of the week, with 2 rides for $175.00.'),
+        }
+        for question, expected in cases.items():
+            with self.subTest(question=question):
+                self.assertEqual(answers.match_answer(question, index), expected)
+        self.assertIsNone(answers.match_answer('How much did Driver Z earn?', index))
+        self.assertIsNone(answers.match_answer('Why is Driver A ahead?', index))
+
+    def test_chat_answer_skips_the_llm_for_template_questions(self):
+        with self.settings(PRECOMPUTED_ANSWERS=True, PRECOMPUTED_ANSWER_PHRASING=False):
+            self.assertEqual(answers.precomputed_answer(self.csv_file, 'Which driver earned the most?'),
+                             'Driver A made the most money: $200.00 from 2 rides.')
+            self.assertIsNone(answers.precomputed_answer(self.csv_file, 'Summarize the month'))
+        with self.settings(PRECOMPUTED_ANSWERS=True, PRECOMPUTED_ANSWER_PHRASING=True):
+            reply = answers.precomputed_answer(self.csv_file, 'Who made the most money?', FakeGroq('Driver A, with $200.'))
+        self.assertEqual(reply, 'Driver A, with $200.')
@@ -0,0 +1,254 @@
+# tracing.py
+
+import functools
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Span the current request or job is in (None outside a trace)
+_current_span = ContextVar('current_span', default=None)
+
+# Spans kept per trace; deeper loops stop adding spans past this
+MAX_SPANS_PER_TRACE = 1000
+
+
+class Span:
+    """One timed operation. Spans nest; the root span of a trace is the request or job."""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent', 'attributes', 'children', 'start_ns', 'end_ns',
+                 'error', '_start', '_duration', '_count')
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.attributes = dict(attributes or {})
+        self.children = []
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+        self._start = time.perf_counter()
+        self._duration = None
+        # Spans in the trace so far, counted on the root
+        self._count = [1] if parent is None else parent._count
+
+    def finish(self):
+        self._duration = time.perf_counter() - self._start
+        self.end_ns = self.start_ns + int(self._duration * 1e9)
+
+    @property
+    def duration_ms(self):
+        seconds = self._duration if self._duration is not None else time.perf_counter() - self._start
+        return seconds * 1000
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def walk(self, depth=0):
+        """(depth, span) of this span and every descendant, depth first."""
+        yield depth, self
+        for child in self.children:
+            yield from child.walk(depth + 1)
+
+    def tree(self):
+        """The span tree as indented text, one line per span, for logs."""
+        lines = []
+        for depth, span in self.walk():
+            attributes = ' '.join(f'{key}={value}' for key, value in span.attributes.items())
+            error = f' ERROR {span.error}' if span.error else ''
+            lines.append(f"{'  ' * depth}{span.duration_ms:9.1f} ms  {span.name}  {attributes}{error}".rstrip())
+        return '\n'.join(lines)
+
+
+def enabled():
+    """Whether requests and jobs are traced: an exporter or the slow-request log is configured."""
+    return bool(settings.TRACING_EXPORT) or settings.TRACING_SLOW_REQUEST_MS > 0
+
+
+def current_span():
+    return _current_span.get()
+
+
+def set_attributes(**attributes):
+    """Add attributes to the current span, if any."""
+    span = _current_span.get()
+    if span is not None:
+        span.set(**attributes)
+
+
+@contextmanager
+def trace(name, /, **attributes):
+    """
+    Start a trace (a root span) for a request, job or command.
+
+    When the root span ends, the trace is exported and, if it took longer than
+    TRACING_SLOW_REQUEST_MS, its span tree is printed. Yields None when tracing is off.
+    """
+    if not enabled():
+        yield None
+        return
+    root = Span(name, attributes=attributes)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except Exception as e:
+        root.error = repr(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        root.finish()
+        _finish_trace(root)
+
+
+@contextmanager
+def span(name, /, **attributes):
+    """
+    Time the block as a child of the current span. Does nothing outside a trace.
+
+    Yields:
+        Span: The new span (None outside a trace), for attributes known only later
+    """
+    parent = _current_span.get()
+    if parent is None or parent._count[0] >= MAX_SPANS_PER_TRACE:
+        yield None
+        return
+    child = Span(name, parent, attributes)
+    parent._count[0] += 1
+    parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.error = repr(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        child.finish()
+
+
+def traced(name=None):
+    """Decorator: run the function inside span(name), by default its qualified name."""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _finish_trace(root):
+    threshold = settings.TRACING_SLOW_REQUEST_MS
+    if threshold > 0 and root.duration_ms >= threshold:
+        print(f"Slow trace {root.trace_id} ({root.duration_ms:.0f} ms >= {threshold} ms):\n{root.tree()}")
+    if settings.TRACING_EXPORT:
+        _exporter().put(root)
+
+
+def to_otlp(root):
+    """A finished trace as an OTLP/HTTP JSON export request (ExportTraceServiceRequest)."""
+    def value(v):
+        if isinstance(v, bool):
+            return {'boolValue': v}
+        if isinstance(v, int):
+            return {'intValue': str(v)}
+        if isinstance(v, float):
+            return {'doubleValue': v}
+        return {'stringValue': str(v)}
+
+    spans = []
+    for _, span_ in root.walk():
+        item = {
+            'traceId': span_.trace_id,
+            'spanId': span_.span_id,
+            'name': span_.name,
+            'kind': 2 if span_.parent is None else 1,  # SERVER for the root, INTERNAL below
+            'startTimeUnixNano': str(span_.start_ns),
+            'endTimeUnixNano': str(span_.end_ns),
+            'attributes': [{'key': k, 'value': value(v)} for k, v in span_.attributes.items()],
+            'status': {'code': 2, 'message': span_.error} if span_.error else {'code': 1},
+        }
+        if span_.parent is not None:
+            item['parentSpanId'] = span_.parent.span_id
+        spans.append(item)
+    return {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': settings.TRACING_SERVICE_NAME}}]},
+        'scopeSpans': [{'scope': {'name': 'chat_app.tracing'}, 'spans': spans}],
+    }]}
+
+
+class TraceExporter:
+    """
+    Writes finished traces from a background thread, so requests never wait for it.
+
+    'file' appends one OTLP JSON document per line to TRACING_FILE; 'otlp' POSTs
+    them to an OTLP/HTTP collector (TRACING_OTLP_ENDPOINT, e.g.
+    http://localhost:4318/v1/traces). Traces are dropped, not queued without
+    bound, if the exporter falls behind.
+    """
+
+    def __init__(self, mode, max_queue=1000):
+        self.mode = mode
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def put(self, root):
+        with self._lock:
+            if self._thread is None:
+                # Started on first use, so nothing runs in a preloading master
+                self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait(root)
+        except queue.Full:
+            pass
+
+    def _run(self):
+        while True:
+            root = self._queue.get()
+            try:
+                self.export(root)
+            except Exception as e:
+                print(f"Trace export failed: {e}")
+
+    def export(self, root):
+        payload = json.dumps(to_otlp(root))
+        if self.mode == 'file':
+            directory = os.path.dirname(settings.TRACING_FILE)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(settings.TRACING_FILE, 'a', encoding='utf-8') as f:
+                f.write(payload + '\n')
+        elif self.mode == 'otlp':
+            request = urllib.request.Request(
+                settings.TRACING_OTLP_ENDPOINT,
+                data=payload.encode('utf-8'),
+                headers={'Content-Type': 'application/json'},
+                method='POST',
+            )
+            with urllib.request.urlopen(request, timeout=10):
+                pass
+
+
+_exporter_instance = None
+_exporter_lock = threading.Lock()
+
+
+def _exporter():
+    global _exporter_instance
+    with _exporter_lock:
+        if _exporter_instance is None:
+            _exporter_instance = TraceExporter(settings.TRACING_EXPORT)
+        return _exporter_instance
@@ -0,0 +1,281 @@
+# validation.py
+
+import operator
+import re
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .aggregates import parse_dates
+
+SEVERITIES = ('error', 'warning')
+
+# Operators of the rules declared in settings.VALIDATION_RULES
+COMPARISONS = {
+    '<': operator.lt, '<=': operator.le, '>': operator.gt,
+    '>=': operator.ge, '==': operator.eq, '!=': operator.ne,
+}
+OPERATORS = (*COMPARISONS, 'missing', 'in', 'not_in', 'matches')
+
+# Row references listed per rule in the issues table
+EXAMPLES_PER_RULE = 3
+
+# Dates more than this far ahead of the upload are flagged as in the future
+FUTURE_DATE_TOLERANCE = pd.Timedelta(days=1)
+
+
+class RowData:
+    """
+    The rows being validated, with the parsed columns rules share.
+
+    Prices and dates are parsed once, on first use, however many rules look at them.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._parsed = {}
+
+    def has(self, *columns):
+        return all(col in self.df.columns for col in columns)
+
+    def _parse(self, key, parse):
+        if key not in self._parsed:
+            self._parsed[key] = parse()
+        return self._parsed[key]
+
+    def numeric(self, column):
+        """The column as numbers (NaN where a value is missing or not a number)."""
+        return self._parse(('numeric', column), lambda: pd.to_numeric(self.df[column], errors='coerce'))
+
+    def dates(self, column):
+        """The column as timestamps (NaT where a value is missing or not a date)."""
+        return self._parse(('dates', column), lambda: parse_dates(self.df[column]))
+
+    def future(self, column):
+        """Whether each date is more than FUTURE_DATE_TOLERANCE ahead of now."""
+        dates = self.dates(column)
+        # Dates with a UTC offset (e.g. 2024-03-01T10:00:00Z) are compared in UTC
+        now = pd.Timestamp.now(tz='UTC') if dates.dt.tz is not None else pd.Timestamp.now()
+        return dates > now + FUTURE_DATE_TOLERANCE
+
+    def blank(self, column):
+        """Whether each value is missing or only whitespace."""
+        def parse():
+            values = self.df[column]
+            if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_datetime64_any_dtype(values):
+                return values.isna()
+            return values.isna() | (values.astype(str).str.strip() == '')
+        return self._parse(('blank', column), parse)
+
+
+class Rule:
+    """
+    A data-quality check: a vectorized test that marks every bad row at once.
+
+    Rules whose columns are missing from the data are skipped.
+    """
+
+    def __init__(self, name, description, check, columns=(), severity='warning', exclude=False):
+        """
+        Args:
+            name (str): Short identifier shown in the issues table
+            description (str): What a flagged row is wrong about
+            check (callable): RowData -> boolean array or Series, True for bad rows
+            columns (sequence): Columns the rule needs
+            severity (str): 'error' (the row's figures are wrong) or 'warning' (suspicious)
+            exclude (bool): Whether flagged rows are left out of the figures when
+                settings.VALIDATION_EXCLUDE_INVALID is on
+        """
+        if severity not in SEVERITIES:
+            raise ValueError(f"Rule {name}: severity must be one of {', '.join(SEVERITIES)}")
+        self.name = name
+        self.description = description
+        self.check = check
+        self.columns = tuple(columns)
+        self.severity = severity
+        self.exclude = exclude
+
+    def applies_to(self, rows):
+        return rows.has(*self.columns)
+
+    def mask(self, rows):
+        return np.asarray(self.check(rows), dtype=bool)
+
+
+BUILTIN_RULES = [
+    Rule(
+        'duplicate_booking', "Booking number already used by an earlier row",
+        lambda rows: rows.df['Booking'].duplicated(keep='first') & rows.df['Booking'].notna(),
+        columns=['Booking'], severity='error', exclude=True,
+    ),
+    Rule(
+        'invalid_price', "Price is not a number",
+        lambda rows: rows.numeric('Price').isna() & ~rows.blank('Price'),
+        columns=['Price'], severity='error',
+    ),
+    Rule(
+        'non_positive_price', "Price is zero or negative",
+        lambda rows: rows.numeric('Price') <= 0,
+        columns=['Price'], severity='error', exclude=True,
+    ),
+    Rule(
+        'missing_chauffeur', "No chauffeur on the ride",
+        lambda rows: rows.blank('Chauffer'),
+        columns=['Chauffer'], severity='warning', exclude=True,
+    ),
+    Rule(
+        'invalid_date', "Date can't be read",
+        lambda rows: rows.dates('Date').isna() & ~rows.blank('Date'),
+        columns=['Date'], severity='warning',
+    ),
+    Rule(
+        'future_date', "Date is in the future",
+        lambda rows: rows.future('Date'),
+        columns=['Date'], severity='warning', exclude=True,
+    ),
+]
+
+# Rules added in code with register_rule
+_registered_rules = []
+
+
+def register_rule(rule):
+    """Add a rule to every validation run (e.g. from an AppConfig.ready)."""
+    _registered_rules.append(rule)
+
+
+def rule_from_spec(spec):
+    """
+    Build a rule from a declarative spec, as listed in settings.VALIDATION_RULES.
+
+    Example: {"name": "price_over_5000", "column": "Price", "op": ">", "value": 5000,
+    "severity": "warning", "exclude": false, "description": "Unusually expensive ride"}.
+    Comparisons with a number compare the column as numbers; 'missing' takes no
+    value, 'in' and 'not_in' take a list and 'matches' a regular expression.
+
+    Raises:
+        ValueError: If the spec is incomplete or uses an unknown operator
+    """
+    try:
+        name, column, op = str(spec['name']), spec['column'], spec['op']
+    except (KeyError, TypeError):
+        raise ValueError(f"Validation rule needs name, column and op: {spec!r}")
+    if op not in OPERATORS:
+        raise ValueError(f"Rule {name}: op must be one of {', '.join(OPERATORS)}")
+    value = spec.get('value')
+    if op != 'missing' and value is None:
+        raise ValueError(f"Rule {name}: op {op} needs a value")
+
+    if op == 'missing':
+        check = lambda rows: rows.blank(column)
+    elif op in ('in', 'not_in'):
+        values = [str(v) for v in value]
+        inside = lambda rows: rows.df[column].astype(str).str.strip().isin(values)
+        check = inside if op == 'in' else (lambda rows: ~inside(rows) & ~rows.blank(column))
+    elif op == 'matches':
+        pattern = re.compile(str(value))
+        check = lambda rows: rows.df[column].astype(str).str.contains(pattern, na=False) & ~rows.blank(column)
+    else:
+        numeric = isinstance(value, (int, float)) and not isinstance(value, bool)
+
+        def check(rows):
+            values = rows.numeric(column) if numeric else rows.df[column].astype(str).str.strip()
+            # Missing values never match a comparison
+            return COMPARISONS[op](values, value) & ~rows.blank(column)
+
+    default_description = f"{column} is missing" if op == 'missing' else f"{column} {op} {value}"
+    return Rule(
+        name,
+        spec.get('description') or default_description,
+        check,
+        columns=[column],
+        severity=spec.get('severity', 'warning'),
+        exclude=bool(spec.get('exclude', False)),
+    )
+
+
+def active_rules():
+    """The built-in rules, those registered in code and those declared in settings, in that order."""
+    return BUILTIN_RULES + _registered_rules + [rule_from_spec(spec) for spec in settings.VALIDATION_RULES]
+
+
+class ValidationResult:
+    """
+    Outcome of a validation run: a row x rule matrix of failures, summarized.
+
+    Attributes:
+        issues (DataFrame): One row per rule that flagged anything or could not run (see validate)
+        rule_errors (dict): Error message per rule that raised; it flags no rows
+        invalid (ndarray): Whether each row failed any rule
+        excluded (ndarray): Whether each row failed a rule that excludes rows
+    """
+
+    def __init__(self, rules, failures, row_labels, rule_errors=None):
+        self.rules = rules
+        self.rule_errors = rule_errors or {}
+        self.failures = failures
+        counts = failures.sum(axis=0)
+        self.invalid = failures.any(axis=1)
+        exclusions = np.array([rule.exclude for rule in rules], dtype=bool)
+        self.excluded = failures[:, exclusions].any(axis=1) if exclusions.any() else np.zeros(len(failures), dtype=bool)
+
+        rows = max(len(failures), 1)
+        records = []
+        for position in np.flatnonzero(counts):
+            rule = rules[position]
+            examples = row_labels[failures[:, position]][:EXAMPLES_PER_RULE]
+            records.append({
+                'rule': rule.name,
+                'severity': rule.severity,
+                'rows': int(counts[position]),
+                'pct': round(counts[position] / rows * 100, 4),
+                'excludable': rule.exclude,
+                'examples': ', '.join(str(label) for label in examples),
+                'description': rule.description,
+            })
+        for name, error in self.rule_errors.items():
+            records.append({
+                'rule': name, 'severity': 'error', 'rows': 0, 'pct': 0.0, 'excludable': False,
+                'examples': '', 'description': f"Rule could not run: {error}",
+            })
+        self.issues = pd.DataFrame(
+            records, columns=['rule', 'severity', 'rows', 'pct', 'excludable', 'examples', 'description'],
+        ).sort_values(['severity', 'rows'], ascending=[True, False], kind='stable').reset_index(drop=True)
+
+
+def validate(df, rules=None):
+    """
+    Check every row against every rule.
+
+    Each rule yields one boolean mask over all rows; the masks are stacked into
+    a row x rule matrix, so flagged rows per rule, rows failing anything and
+    rows to exclude are each one reduction over it. Columns that several rules
+    read (prices, dates) are parsed once. A rule that raises flags no rows and
+    is listed in the issues as an error, so one broken rule (e.g. a custom one
+    that doesn't fit the data) never stops an upload from being summarized.
+
+    Args:
+        df (DataFrame): The loaded data, with standardized column names where they apply
+        rules (list, optional): Rules to run; active_rules() by default
+
+    Returns:
+        ValidationResult: The issues table and the invalid and excluded row masks
+    """
+    rows = RowData(df)
+    rules = [rule for rule in (active_rules() if rules is None else rules) if rule.applies_to(rows)]
+    failures = np.zeros((len(df), len(rules)), dtype=bool)
+    rule_errors = {}
+    for position, rule in enumerate(rules):
+        try:
+            failures[:, position] = rule.mask(rows)
+        except Exception as e:
+            print(f"Validation rule {rule.name} failed: {e}")
+            rule_errors[rule.name] = str(e)
+
+    # Rows are referred to by booking number where there is one, else by line in the file
+    if 'Booking' in df.columns:
+        row_labels = df['Booking'].to_numpy()
+    else:
+        row_labels = np.arange(2, len(df) + 2)
+    return ValidationResult(rules, failures, row_labels, rule_errors)
@@ -1,15 +1,32 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import user_passes_test
-from django.http import JsonResponse
-from .models import UploadedCSV
+from django.http import JsonResponse, HttpResponse, Http404
+from django.db import transaction
+from django.urls import reverse
+from django.views.decorators.http import require_POST
+from django.conf import settings
+from django.utils import timezone
+from .models import UploadedCSV, ANALYSIS_MODE_CHOICES
 from django.contrib import messages
-from .data_processor import DataSummarizer
-from .Chatbot import Chatbot
 from django.contrib.auth import authenticate, login
 from django.views import View
-from .models import CustomUser
+from .models import CustomUser, ChunkedUpload
 from .forms import CustomUserRegistrationForm
-import os
+from .storage import open_artifact, read_text, delete_artifact
+from .batch import batch_job, parse_questions, report_name, report_submitted_at, REPORT_DIRECTORY, REPORT_POLL_SECONDS
+from django.core.paginator import Paginator, EmptyPage
+from . import chunked_upload
+from . import jobs
+from .quotas import consume, QuotaExceeded
+from .scheduling import tenant_of
+from django.core.files.base import ContentFile
+import json
+import math
+
+# The analysis stack (pandas, numpy, pyarrow) and the LLM client (groq) are imported
+# inside the views that use them, so booting a worker, running manage.py or serving
+# the login page doesn't pay for them. Under gunicorn with preload_app they are
+# imported once in the master instead (see chat_app/boot.py).
 
 def is_approved(user):
     """
@@ -65,42 +82,263 @@ class CustomLoginView(View): # We build on the View class thats built in Django
         # If anything fails, render the login page again
         return render(request, self.template_name)
 
+# UploadedCSV fields written when a summary is stored
+SUMMARY_FIELDS = ['processed_csv', 'aggregates', 'analysis_mode', 'column_names', 'summary_is_exact', 'is_processed']
+
+def process_uploaded_csv(csv_file):
+    """
+    Generate the summary for an UploadedCSV and mark it as processed.
+    The upload is deleted again if processing fails.
+
+    Large uploads get a sample-based preview summary first, so the user can
+    start chatting right away; the exact summary replaces it from a background
+    job (see refine_summary).
+
+    Args:
+        csv_file (UploadedCSV): A saved upload whose raw_csv is in storage
+    """
+    try:
+        if csv_file.raw_csv.size >= settings.PROGRESSIVE_SUMMARY_MIN_BYTES:
+            summarizer = _save_preview_summary(csv_file)
+            # Start refining only once the preview is committed, so the job sees the row
+            transaction.on_commit(lambda: jobs.submit(
+                refine_summary, csv_file.id, summarizer.mode, summarizer.column_names,
+                tenant=tenant_of(csv_file.user), cost=csv_file.raw_csv.size / 1e6,
+            ))
+        else:
+            _save_exact_summary(csv_file)
+    except Exception as e:
+        print(f"Error processing file: {e}")
+        csv_file.delete()  # Clean up if processing fails
+        raise
+
+def _save_exact_summary(csv_file, column_names=None):
+    """Summarize every row of the upload and store the summary and aggregates."""
+    from .aggregates import save_aggregates
+    from .data_processor import DataSummarizer
+
+    # Generate summary using DataSummarizer, streaming the upload from storage
+    with open_artifact(csv_file.raw_csv.name, csv_file.raw_csv.storage) as raw_file:
+        summarizer = DataSummarizer(
+            raw_file,
+            token_budget=settings.SUMMARY_TOKEN_BUDGET,
+            mode=csv_file.analysis_mode,
+            column_names=column_names,
+        )
+        summary_text = summarizer.generate_summary()
+
+    # Keep the aggregates so charts and APIs never need the raw rows again
+    save_aggregates(csv_file, summarizer.aggregates)
+
+    # Store the summary next to the upload; it ends up at summaries/summary_<id>.txt
+    csv_file.processed_csv.save(
+        f'summary_{csv_file.id}.txt',
+        ContentFile(summary_text.encode('utf-8')),
+        save=False,
+    )
+    csv_file.analysis_mode = summarizer.mode  # 'auto' resolves to the mode that was used
+    csv_file.column_names = summarizer.column_names
+    csv_file.summary_is_exact = True
+    csv_file.is_processed = True
+    # Only update: a refine job must not re-create an upload deleted in the meantime
+    csv_file.save(update_fields=SUMMARY_FIELDS)
+    return summarizer
+
+def _save_preview_summary(csv_file):
+    """Store an approximate summary estimated from a sample of the upload."""
+    from .data_processor import DataSummarizer
+
+    with open_artifact(csv_file.raw_csv.name, csv_file.raw_csv.storage) as raw_file:
+        summarizer = DataSummarizer(
+            raw_file,
+            token_budget=settings.SUMMARY_TOKEN_BUDGET,
+            mode=csv_file.analysis_mode,
+        )
+        summary_text = summarizer.generate_preview()
+
+    csv_file.processed_csv.save(
+        f'summary_{csv_file.id}_preview.txt',
+        ContentFile(summary_text.encode('utf-8')),
+        save=False,
+    )
+    csv_file.analysis_mode = summarizer.mode
+    csv_file.column_names = summarizer.column_names
+    csv_file.summary_is_exact = False
+    csv_file.is_processed = True
+    csv_file.save(update_fields=SUMMARY_FIELDS)
+    return summarizer
+
+def refine_summary(csv_file_id, mode, column_names):
+    """
+    Background job: replace an upload's preview summary with the exact one.
+    Reuses the mode and standardized columns of the preview, so the LLM is not asked again.
+    If this fails, the preview stays in place.
+    """
+    csv_file = UploadedCSV.objects.filter(id=csv_file_id, summary_is_exact=False).first()
+    if csv_file is None:
+        return  # Deleted (chat ended) or already refined
+    preview_name = csv_file.processed_csv.name
+    csv_file.analysis_mode = mode
+    _save_exact_summary(csv_file, column_names)
+    delete_artifact(preview_name, csv_file.processed_csv.storage)
+
 @approved_user_required
 def upload_view(request): #This is the view for the upload page
     if request.method == 'POST': #Upon the customer pressing the submit button
         if 'csv_file' in request.FILES:
             file = request.FILES['csv_file']
+            try:
+                consume(request.user, 'ingest', cost=file.size / 1e6)
+            except QuotaExceeded as e:
+                return render(request, 'chat_app/error.html', {'error': str(e)}, status=429)
 
             #Generate a UploadedCSV object for that user
             csv_file = UploadedCSV( 
                 raw_csv=file,
                 user=request.user,
+                analysis_mode=_analysis_mode(request.POST.get('analysis_mode')),
             )
             csv_file.save()
             
             try:
-                # Generate summary using DataSummarizer
-                summarizer = DataSummarizer(csv_file.raw_csv.path)
-
-                # summary_path is where we want the summary to be stored
-                summary_path = f'summaries/summary_{csv_file.id}.txt'
-                full_summary_path = os.path.join('media', summary_path)
-                
-                # Generate the summary
-                summarizer.generate_summary(full_summary_path)
-                
-                # Update the model with processed file path
-                csv_file.processed_csv = summary_path
-                csv_file.is_processed = True
-                csv_file.save()
-                
+                process_uploaded_csv(csv_file)
                 return redirect('chat', id=csv_file.id) # Upon a successful processing redirect the user to the chat url
             except Exception as e:
-                print(f"Error processing file: {e}")
-                csv_file.delete()  # Clean up if processing fails
                 return render(request, 'chat_app/error.html', {'error': str(e)})
                 
-    return render(request, 'chat_app/upload.html')
+    return render(request, 'chat_app/upload.html', {
+        'chunk_size': settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+        'analysis_modes': ANALYSIS_MODE_CHOICES,
+    })
+
+def _quota_exceeded(error):
+    """429 response for a QuotaExceeded, telling the client when to retry."""
+    retry_after = max(1, math.ceil(error.retry_after))
+    response = JsonResponse({'error': str(error), 'retry_after': retry_after}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+def _analysis_mode(value):
+    """The requested analysis mode, or 'auto' if missing or unknown."""
+    return value if value in dict(ANALYSIS_MODE_CHOICES) else 'auto'
+
+
+def _upload_status(upload):
+    """JSON body describing where a chunked upload stands, with the chat URL once it is processed."""
+    body = {
+        'upload_id': str(upload.id),
+        'filename': upload.filename,
+        'offset': upload.received_bytes,
+        'total_size': upload.total_size,
+        'chunk_size': settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+        'status': upload.status,
+        'header': upload.header,
+        'error': upload.error,
+    }
+    csv_file = upload.uploaded_csv
+    if upload.status == ChunkedUpload.STATUS_COMPLETE and csv_file is not None and csv_file.is_processed:
+        body['redirect'] = reverse('chat', args=[csv_file.id])
+    return body
+
+@approved_user_required
+@require_POST
+def chunked_upload_start(request):
+    """
+    Start a resumable upload. Expects JSON: {"filename": ..., "size": ...} with optional
+    "sha256" and "analysis_mode".
+    The client then POSTs the file in chunks to chunked_upload_chunk.
+    """
+    try:
+        data = json.loads(request.body)
+        filename = str(data['filename'])
+        size = int(data['size'])
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Expected JSON with filename and size'}, status=400)
+
+    if size <= 0 or size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+        return JsonResponse({'error': 'File is empty or too large'}, status=413)
+    try:
+        consume(request.user, 'ingest', cost=size / 1e6)
+    except QuotaExceeded as e:
+        return _quota_exceeded(e)
+
+    upload = ChunkedUpload.objects.create(
+        user=request.user,
+        filename=filename[:255],
+        total_size=size,
+        expected_sha256=str(data.get('sha256') or '')[:64],
+        analysis_mode=_analysis_mode(data.get('analysis_mode')),
+    )
+    return JsonResponse(_upload_status(upload), status=201)
+
+@approved_user_required
+def chunked_upload_chunk(request, upload_id):
+    """
+    GET returns the committed offset so an interrupted upload can resume from it.
+    POST appends the request body at ?offset=N. When the last chunk is committed
+    the file is ingested straight away and the response carries the chat URL.
+    If assembling the file failed, a GET or a resent last chunk retries it.
+    """
+    if request.method == 'GET':
+        upload = get_object_or_404(ChunkedUpload, id=upload_id, user=request.user)
+        if not (upload.status == ChunkedUpload.STATUS_UPLOADING and upload.is_complete):
+            return JsonResponse(_upload_status(upload))
+        offset = None
+    elif request.method == 'POST':
+        try:
+            offset = int(request.GET.get('offset', ''))
+        except ValueError:
+            return JsonResponse({'error': 'offset query parameter is required'}, status=400)
+    else:
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    error = None
+    csv_file = None
+    # Lock the row so concurrent retries of the same chunk cannot interleave
+    with transaction.atomic():
+        upload = get_object_or_404(
+            ChunkedUpload.objects.select_for_update(),
+            id=upload_id,
+            user=request.user,
+        )
+        try:
+            if offset is not None:
+                chunked_upload.write_chunk(upload, offset, request)
+                upload.save()
+            if upload.status == ChunkedUpload.STATUS_UPLOADING and upload.is_complete:
+                # Every byte is in: assemble under the lock so only one request does it
+                with transaction.atomic():
+                    csv_file = chunked_upload.finalize(upload)
+        except chunked_upload.AlreadyComplete:
+            # The client lost the response to its last chunk; answer it again
+            return JsonResponse(_upload_status(upload))
+        except (chunked_upload.OffsetMismatch, chunked_upload.UploadStateError) as e:
+            # Includes a failed assembly, which the next request retries
+            error = e
+        except chunked_upload.UploadError as e:
+            # The data itself is bad; resuming cannot fix it
+            error = e
+            upload.status = ChunkedUpload.STATUS_FAILED
+            upload.error = str(e)
+            chunked_upload.discard(upload)
+            upload.save()
+
+    if error is not None:
+        body = {'error': str(error)}
+        if isinstance(error, chunked_upload.OffsetMismatch):
+            body['offset'] = error.expected
+        return JsonResponse(body, status=error.status)
+
+    if csv_file is None:
+        return JsonResponse(_upload_status(upload))
+
+    # Last chunk committed and assembled: ingest right away
+    try:
+        process_uploaded_csv(csv_file)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse(_upload_status(upload))
 
 
 
@@ -117,14 +355,24 @@ def chat_view(request, id):
         
         if request.method == 'POST': 
             user_message = request.POST.get('message') #Upon the user pressing send
-            
-            # Initialize chatbot with the summary
-            chatbot = Chatbot(
-                context_file=csv_file.processed_csv.path,
+            try:
+                consume(request.user, 'chat')
+            except QuotaExceeded as e:
+                return _quota_exceeded(e)
+            from .answers import precomputed_answer
+            from .routing import ask
+
+            # Common questions were answered at ingest
+            response = precomputed_answer(csv_file, user_message)
+            if response is not None:
+                return JsonResponse({'response': response})
+
+            # Answer from the summary, read through the storage cache, on the model the question needs
+            response = ask(
+                read_text(csv_file.processed_csv.name, csv_file.processed_csv.storage),
+                user_message,
+                general=csv_file.analysis_mode == 'general',
             )
-            
-            # Get response from chatbot
-            response = chatbot.generate_response(user_message)
             return JsonResponse({'response': response})
             
         if request.method == "GET":
@@ -135,6 +383,180 @@ def chat_view(request, id):
     except UploadedCSV.DoesNotExist:
         return redirect('upload')
 
+@approved_user_required
+def chart_view(request, id, kind):
+    """
+    Return a Plotly figure for one of the upload's charts as JSON.
+    Optional query parameters: points (time series resolution) and limit (number of bars).
+    """
+    from . import charts
+
+    csv_file = get_object_or_404(UploadedCSV, id=id, user=request.user, is_processed=True)
+    if kind not in charts.CHARTS:
+        return JsonResponse({'error': f'Unknown chart: {kind}'}, status=404)
+
+    try:
+        spec = charts.chart_spec(kind, request.GET.get('points'), request.GET.get('limit'))
+        figure = charts.render_chart(csv_file, spec)
+    except ValueError:
+        return JsonResponse({'error': 'points and limit must be integers'}, status=400)
+    except charts.ChartUnavailable as e:
+        return JsonResponse({'error': str(e)}, status=404)
+    return JsonResponse(figure)
+
+@approved_user_required
+def leaderboard_view(request, id):
+    """
+    Chauffeur leaderboard with each chauffeur's most and least earned rides, as JSON.
+    Query parameters: sort (revenue, rides or avg_price), k (rides per side), page and page_size.
+    """
+    from .leaderboard import leaderboard
+
+    csv_file = get_object_or_404(UploadedCSV, id=id, user=request.user, is_processed=True)
+    try:
+        entries = leaderboard(
+            csv_file,
+            sort=request.GET.get('sort', 'revenue'),
+            k=int(request.GET.get('k', 3)),
+        )
+        page_size = max(1, min(int(request.GET.get('page_size', 20)), 100))
+        paginator = Paginator(entries, page_size)
+        page = paginator.page(int(request.GET.get('page', 1)))
+    except (ValueError, EmptyPage) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'count': paginator.count,
+        'page': page.number,
+        'num_pages': paginator.num_pages,
+        'results': list(page.object_list),
+    })
+
+@approved_user_required
+def anomalies_view(request, id):
+    """
+    Rides flagged at ingest as unusually priced for their chauffeur or route, as JSON.
+    Query parameters: min_score, chauffeur, direction (high or low) and limit.
+    """
+    from .aggregates import load_aggregates
+    from .anomalies import query_anomalies
+
+    csv_file = get_object_or_404(UploadedCSV, id=id, user=request.user, is_processed=True)
+    aggregates = load_aggregates(csv_file)
+    table = aggregates.get('anomalies')
+    if table is None:
+        return JsonResponse({'flagged': 0, 'results': []})
+    try:
+        results = query_anomalies(
+            table,
+            min_score=float(request.GET.get('min_score', 0)),
+            chauffeur=request.GET.get('chauffeur'),
+            direction=request.GET.get('direction'),
+            limit=max(1, min(int(request.GET.get('limit', 20)), 100)),
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'flagged': int(aggregates['anomaly_counts']['flagged'].sum()),
+        'results': results,
+    })
+
+@approved_user_required
+def compare_view(request, before_id, after_id):
+    """
+    Period-over-period comparison of two of the user's uploads, built from their aggregates.
+
+    GET returns the comparison tables as JSON. Query parameters: table (one of
+    comparison.COMPARISON_TABLES, all by default) and limit (rows per table).
+    POST with a message asks the chatbot about the comparison.
+    """
+    from .comparison import compare, comparison_records, comparison_summary, COMPARISON_TABLES
+
+    before_file = get_object_or_404(UploadedCSV, id=before_id, user=request.user, is_processed=True)
+    after_file = get_object_or_404(UploadedCSV, id=after_id, user=request.user, is_processed=True)
+    tables = compare(before_file, after_file)
+    if not tables:
+        return JsonResponse({'error': 'These uploads have no figures in common to compare.'}, status=400)
+
+    if request.method == 'POST':
+        try:
+            consume(request.user, 'chat')
+        except QuotaExceeded as e:
+            return _quota_exceeded(e)
+        from .Chatbot import Chatbot
+
+        chatbot = Chatbot(context_text=comparison_summary(before_file, after_file, settings.SUMMARY_TOKEN_BUDGET))
+        return JsonResponse({'response': chatbot.generate_response(request.POST.get('message'))})
+
+    name = request.GET.get('table')
+    if name is not None and name not in COMPARISON_TABLES:
+        return JsonResponse({'error': f"table must be one of {', '.join(COMPARISON_TABLES)}"}, status=400)
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 50)), 1000))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'before': before_file.id,
+        'after': after_file.id,
+        'tables': comparison_records(tables, [name] if name else COMPARISON_TABLES, limit),
+    })
+
+@approved_user_required
+@require_POST
+def batch_questions_view(request, id):
+    """
+    Queue a list of questions about an upload as a background job that stores a report.
+    Expects JSON {"questions": [...]} or a plain text body with one question per line,
+    with at most BATCH_MAX_QUESTIONS questions. Answers 202 with the report URL to poll.
+    """
+    csv_file = get_object_or_404(UploadedCSV, id=id, user=request.user, is_processed=True)
+    try:
+        data = json.loads(request.body)
+        questions = [str(question).strip() for question in data['questions'] if str(question).strip()]
+    except (ValueError, KeyError, TypeError):
+        questions = parse_questions(request.body.decode('utf-8', errors='replace'))
+    if not questions:
+        return JsonResponse({'error': 'No questions given'}, status=400)
+    if len(questions) > settings.BATCH_MAX_QUESTIONS:
+        return JsonResponse({'error': f'At most {settings.BATCH_MAX_QUESTIONS} questions per batch'}, status=400)
+    try:
+        consume(request.user, 'chat', cost=len(questions))
+    except QuotaExceeded as e:
+        return _quota_exceeded(e)
+
+    name = report_name(csv_file)
+    jobs.submit(batch_job, csv_file.id, questions, name, tenant=tenant_of(request.user), cost=len(questions))
+    return JsonResponse({
+        'status': 'running',
+        'questions': len(questions),
+        'report_url': reverse('batch_report', args=[csv_file.id, name.rsplit('/', 1)[-1]]),
+    }, status=202)
+
+@approved_user_required
+def batch_report_view(request, id, name):
+    """
+    Download a batch report of one of the user's uploads as Markdown.
+    While its batch is still running, answers 202 with a Retry-After header.
+    """
+    csv_file = get_object_or_404(UploadedCSV, id=id, user=request.user)
+    if not name.startswith(f'report_{csv_file.id}_') or '/' in name:
+        raise Http404('No such report')
+    try:
+        report = read_text(f'{REPORT_DIRECTORY}/{name}')
+    except FileNotFoundError:
+        # The job runs in whichever worker took the batch, so its report in storage is all we can see
+        submitted = report_submitted_at(name)
+        if submitted is None or (timezone.now() - submitted).total_seconds() > settings.BATCH_REPORT_WAIT_SECONDS:
+            raise Http404('No such report')
+        response = JsonResponse({'status': 'running'}, status=202)
+        response['Retry-After'] = str(REPORT_POLL_SECONDS)
+        return response
+    response = HttpResponse(report, content_type='text/markdown; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{name}"'
+    return response
+
 @approved_user_required
 def end_chat(request, id):
     try:
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
+import json
+import tempfile
 import dj_database_url
 from dotenv import load_dotenv
 load_dotenv()
@@ -57,13 +59,72 @@ AUTH_USER_MODEL = 'chat_app.CustomUser'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# File storage for uploads and generated artifacts. With STORAGE_BACKEND=s3 they live in an
+# S3-compatible bucket (AWS S3, or MinIO locally via AWS_S3_ENDPOINT_URL) so every dyno sees them.
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'local')
+if STORAGE_BACKEND == 's3':
+    DEFAULT_FILE_STORAGE_CONFIG = {
+        'BACKEND': 'storages.backends.s3.S3Storage',
+        'OPTIONS': {
+            'bucket_name': os.getenv('AWS_STORAGE_BUCKET_NAME'),
+            'endpoint_url': os.getenv('AWS_S3_ENDPOINT_URL'),
+            'access_key': os.getenv('AWS_ACCESS_KEY_ID'),
+            'secret_key': os.getenv('AWS_SECRET_ACCESS_KEY'),
+            'region_name': os.getenv('AWS_S3_REGION_NAME'),
+            'addressing_style': os.getenv('AWS_S3_ADDRESSING_STYLE'),  # 'path' for MinIO
+            'file_overwrite': False,
+            'default_acl': None,
+            'querystring_auth': True,
+        },
+    }
+else:
+    DEFAULT_FILE_STORAGE_CONFIG = {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    }
+
+STORAGES = {
+    'default': DEFAULT_FILE_STORAGE_CONFIG,
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Local read-through cache for artifacts kept in remote storage
+ARTIFACT_CACHE_DIR = os.getenv('ARTIFACT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'rideinsight-cache'))
+ARTIFACT_CACHE_MAX_BYTES = int(os.getenv('ARTIFACT_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+
+# Typed DataFrames of uploads, shared by the workers of a machine as memory-mapped Arrow files.
+# MAX_BYTES bounds the files on disk, MEMORY_BYTES the frames each worker keeps referenced.
+FRAME_CACHE_DIR = os.getenv('FRAME_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'rideinsight-frames'))
+FRAME_CACHE_MAX_BYTES = int(os.getenv('FRAME_CACHE_MAX_BYTES', str(2 * 1024 * 1024 * 1024)))
+FRAME_CACHE_MEMORY_BYTES = int(os.getenv('FRAME_CACHE_MEMORY_BYTES', str(1024 * 1024 * 1024)))
+
+# Rendered charts (chat_app/charts.py), in a cache every worker shares: a directory on
+# this machine by default, or Redis at CHART_CACHE_REDIS_URL to share them across machines.
+CHART_CACHE_REDIS_URL = os.getenv('CHART_CACHE_REDIS_URL')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'charts': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CHART_CACHE_REDIS_URL,
+    } if CHART_CACHE_REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CHART_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'rideinsight-charts')),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CHART_CACHE_MAX_ENTRIES', '5000'))},
+    },
+}
+
 MIDDLEWARE = [
+    'chat_app.middleware.TracingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware', 
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'chat_app.middleware.TenantMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -161,4 +222,96 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv('HOST_EMAIL')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_APP_PASSWORD')  
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL')
-ADMIN_EMAIL = os.getenv('ADMIN_EMAIL')
\ No newline at end of file
+ADMIN_EMAIL = os.getenv('ADMIN_EMAIL')
+
+# Maximum number of prompt tokens a generated CSV summary may use
+SUMMARY_TOKEN_BUDGET = int(os.getenv('SUMMARY_TOKEN_BUDGET', '6000'))
+
+# Data-quality rules checked on every upload on top of the built-in ones (chat_app/validation.py),
+# as a JSON list, e.g. [{"name": "price_over_5000", "column": "Price", "op": ">", "value": 5000}]
+VALIDATION_RULES = json.loads(os.getenv('VALIDATION_RULES', '[]'))
+# Leave rows that fail an excluding rule (duplicate bookings, prices <= 0, ...) out of the summary figures
+VALIDATION_EXCLUDE_INVALID = os.getenv('VALIDATION_EXCLUDE_INVALID', 'False') == 'True'
+
+# pd.read_csv engine for uploads: 'auto' uses the multithreaded pyarrow engine when it is
+# installed and the file allows it (see chat_app/readers.py), 'c' always uses the C engine
+CSV_READER_ENGINE = os.getenv('CSV_READER_ENGINE', 'auto')
+
+# Resumable chunked uploads: size of each chunk the browser sends, and the largest accepted file
+CHUNKED_UPLOAD_CHUNK_SIZE = int(os.getenv('CHUNKED_UPLOAD_CHUNK_SIZE', str(5 * 1024 * 1024)))
+CHUNKED_UPLOAD_MAX_SIZE = int(os.getenv('CHUNKED_UPLOAD_MAX_SIZE', str(1024 * 1024 * 1024)))
+
+# Uploads at least this large first get a sample-based preview summary, refined in the background
+PROGRESSIVE_SUMMARY_MIN_BYTES = int(os.getenv('PROGRESSIVE_SUMMARY_MIN_BYTES', str(20 * 1024 * 1024)))
+# The preview samples only this many leading bytes of a CSV, so the request never reads a whole huge file
+PREVIEW_MAX_BYTES = int(os.getenv('PREVIEW_MAX_BYTES', str(16 * 1024 * 1024)))
+
+# Threads per process for background jobs (see chat_app/jobs.py). The fair job queue is per process too,
+# so with N gunicorn workers a company can get up to N times its share
+BACKGROUND_JOB_WORKERS = int(os.getenv('BACKGROUND_JOB_WORKERS', '2'))
+
+# Batch questions: questions sent to the LLM at once, and the most accepted per API request
+BATCH_QUESTION_WORKERS = int(os.getenv('BATCH_QUESTION_WORKERS', '20'))
+BATCH_MAX_QUESTIONS = int(os.getenv('BATCH_MAX_QUESTIONS', '50'))
+# Batches run as background jobs; a report still missing this long after submission was lost (e.g. to a restart)
+BATCH_REPORT_WAIT_SECONDS = int(os.getenv('BATCH_REPORT_WAIT_SECONDS', '900'))
+
+# Token-bucket quotas per user and per company (company_name): (burst, refill per hour).
+# Chat buckets count chat calls (every question of a batch counts); ingest buckets count MB uploaded.
+# A burst or rate of 0 turns that bucket off. See chat_app/quotas.py.
+TENANT_QUOTAS = {
+    'chat': {
+        'user': (int(os.getenv('CHAT_QUOTA_USER_BURST', '20')), float(os.getenv('CHAT_QUOTA_USER_PER_HOUR', '300'))),
+        'company': (int(os.getenv('CHAT_QUOTA_COMPANY_BURST', '60')), float(os.getenv('CHAT_QUOTA_COMPANY_PER_HOUR', '1200'))),
+    },
+    'ingest': {
+        'user': (int(os.getenv('INGEST_QUOTA_USER_BURST_MB', '500')), float(os.getenv('INGEST_QUOTA_USER_MB_PER_HOUR', '2000'))),
+        'company': (int(os.getenv('INGEST_QUOTA_COMPANY_BURST_MB', '1000')), float(os.getenv('INGEST_QUOTA_COMPANY_MB_PER_HOUR', '5000'))),
+    },
+}
+
+# Throughput share of companies in the fair queues, as JSON ({"Acme Limos": 2}); others get 1
+TENANT_WEIGHTS = json.loads(os.getenv('TENANT_WEIGHTS', '{}'))
+
+# LLM calls in flight at once per process; further calls wait in weighted fair order (chat_app/scheduling.py).
+# Limits and fairness are per process: N gunicorn workers allow N times as many calls in flight
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '20'))
+
+# Question routing (chat_app/routing.py): lookups ("how many rides?") go to the small model with the
+# summary trimmed to ROUTER_SMALL_CONTEXT_TOKENS, other questions to the large model with all of it.
+# ROUTER_CLASSIFIER_MODEL (e.g. llama-3.1-8b-instant) decides questions the local heuristics can't; '' sends them to the large model.
+ROUTER_ENABLED = os.getenv('ROUTER_ENABLED', 'True') == 'True'
+ROUTER_SMALL_MODEL = os.getenv('ROUTER_SMALL_MODEL', 'llama-3.1-8b-instant')
+ROUTER_LARGE_MODEL = os.getenv('ROUTER_LARGE_MODEL', 'llama-3.3-70b-versatile')
+ROUTER_SMALL_CONTEXT_TOKENS = int(os.getenv('ROUTER_SMALL_CONTEXT_TOKENS', '1500'))
+ROUTER_CLASSIFIER_MODEL = os.getenv('ROUTER_CLASSIFIER_MODEL', '')
+
+# Precomputed answers (chat_app/answers.py): common questions ("Who made the most money?") are answered
+# at ingest from the aggregates, and matching chat questions get those answers without the full LLM call.
+# PRECOMPUTED_ANSWER_TEMPLATES adds templates as a JSON list; PRECOMPUTED_ANSWER_PHRASING has the small model word them.
+PRECOMPUTED_ANSWERS = os.getenv('PRECOMPUTED_ANSWERS', 'True') == 'True'
+PRECOMPUTED_ANSWER_TEMPLATES = json.loads(os.getenv('PRECOMPUTED_ANSWER_TEMPLATES', '[]'))
+PRECOMPUTED_ANSWER_PHRASING = os.getenv('PRECOMPUTED_ANSWER_PHRASING', 'False') == 'True'
+
+# Tracing (chat_app/tracing.py): one trace per request and background job.
+# TRACING_EXPORT is '' (off), 'file' (OTLP JSON lines in TRACING_FILE) or 'otlp' (POST to an OTLP/HTTP collector)
+TRACING_EXPORT = os.getenv('TRACING_EXPORT', '')
+TRACING_FILE = os.getenv('TRACING_FILE', os.path.join(tempfile.gettempdir(), 'rideinsight-traces.jsonl'))
+TRACING_OTLP_ENDPOINT = os.getenv('TRACING_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces')
+TRACING_SERVICE_NAME = os.getenv('TRACING_SERVICE_NAME', 'rideinsight')
+# Requests slower than this print their span tree (0 turns the slow-request log off)
+TRACING_SLOW_REQUEST_MS = int(os.getenv('TRACING_SLOW_REQUEST_MS', '10000'))
+
+# How long stored artifacts are kept, in hours (swept by `manage.py sweep_artifacts`)
+ARTIFACT_RETENTION_HOURS = {
+    # Processed uploads with their summaries, counted from the upload time
+    'uploads': int(os.getenv('RETENTION_UPLOADS_HOURS', str(7 * 24))),
+    # Uploads whose processing never finished
+    'unprocessed_uploads': int(os.getenv('RETENTION_UNPROCESSED_HOURS', '6')),
+    # Chunked uploads, counted from the last chunk received
+    'chunked_uploads': int(os.getenv('RETENTION_CHUNKED_UPLOADS_HOURS', '24')),
+    # Grace period before a file no database row refers to is treated as an orphan
+    'orphans': int(os.getenv('RETENTION_ORPHANS_HOURS', '6')),
+    # Batch question reports, counted from when they were written
+    'reports': int(os.getenv('RETENTION_REPORTS_HOURS', str(7 * 24))),
+}
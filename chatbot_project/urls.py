@@ -25,6 +25,9 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('login/', views.CustomLoginView.as_view(), name='login'),
     path('', views.upload_view, name='upload'),  # Changed from 'upload/' to '' to make it the main page
+    # Resumable chunked uploads
+    path('uploads/', views.chunked_upload_start, name='chunked_upload_start'),
+    path('uploads/<uuid:upload_id>/', views.chunked_upload_chunk, name='chunked_upload_chunk'),
 
     path('register/', views.register, name='register'), # Registration page 
     path('approval_pending/', views.pending_view, name = 'pending'),
@@ -32,6 +35,17 @@ urlpatterns = [
 
     # Chat view (after file upload)
     path('chat/<int:id>/', views.chat_view, name='chat'),
+    # Charts built from the upload's precomputed aggregates
+    path('chat/<int:id>/charts/<slug:kind>/', views.chart_view, name='chart'),
+    # Chauffeur leaderboard with top and bottom rides
+    path('chat/<int:id>/leaderboard/', views.leaderboard_view, name='leaderboard'),
+    # Rides flagged as unusually priced at ingest
+    path('chat/<int:id>/anomalies/', views.anomalies_view, name='anomalies'),
+    # Period-over-period comparison of two uploads (JSON on GET, chatbot on POST)
+    path('compare/<int:before_id>/<int:after_id>/', views.compare_view, name='compare'),
+    # Batch questions with a consolidated report
+    path('chat/<int:id>/batch/', views.batch_questions_view, name='batch_questions'),
+    path('chat/<int:id>/reports/<str:name>', views.batch_report_view, name='batch_report'),
     # End chat endpoint
     path('end-chat/<int:id>/', views.end_chat, name='end_chat'),
 
@@ -0,0 +1,17 @@
+# gunicorn.conf.py - read automatically by gunicorn from the working directory
+
+import os
+
+# Load the app once in the master and fork workers from it. Heavy imports and other
+# shared read-only state are initialized there once (chat_app.boot.preload), so a
+# worker boots in milliseconds and shares those pages copy-on-write with the others.
+# Set GUNICORN_PRELOAD=False to load the app in every worker instead.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before any worker is forked
+    if preload_app:
+        from chat_app.boot import preload
+        preload()
+        server.log.info("Preloaded shared state for workers")